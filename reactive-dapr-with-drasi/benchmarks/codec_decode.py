@@ -0,0 +1,76 @@
+"""
+Microbenchmark for decoding state query values.
+
+Decodes the same rows with the previous query_items path (str decode,
+json.loads, then a base64 attempt guarded by try/except) and with
+common.codec.decode_value, for raw JSON rows, base64-wrapped rows (as
+written by the Drasi sync reaction) and a mix of both.
+
+No sidecar is needed:
+
+    python codec_decode.py --rows 100000
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services"))
+from common import codec  # noqa: E402
+
+
+def legacy_decode(raw):
+    """The decoding previously inlined in DaprStateStore.query_items."""
+    value_str = raw.decode('UTF-8') if hasattr(raw, 'decode') else raw
+    value = json.loads(value_str)
+    if isinstance(value, str):
+        try:
+            value = json.loads(base64.b64decode(value).decode('utf-8'))
+        except Exception:
+            pass
+    return value
+
+
+def make_rows(count: int, wrapped_ratio: float) -> list:
+    rows = []
+    for i in range(count):
+        doc = json.dumps({
+            "product_id": i,
+            "product_name": f"Product {i}",
+            "product_description": "A reasonably long product description used for benchmarking",
+            "avg_rating": 4.25,
+            "review_count": i % 50,
+        })
+        if (i % 100) < wrapped_ratio * 100:
+            rows.append(json.dumps(base64.b64encode(doc.encode()).decode()).encode())
+        else:
+            rows.append(doc.encode())
+    return rows
+
+
+def timed(decode, rows) -> float:
+    start = time.perf_counter()
+    for raw in rows:
+        decode(raw)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000)
+    args = parser.parse_args()
+
+    print(f"JSON parser: {codec._loads.__module__}")
+    print(f"{'rows':<10} {'legacy ms':>10} {'codec ms':>10} {'speedup':>8}")
+    for label, ratio in (("raw", 0.0), ("base64", 1.0), ("mixed", 0.5)):
+        rows = make_rows(args.rows, ratio)
+        assert all(legacy_decode(raw) == codec.decode_value(raw) for raw in rows[:1000])
+        legacy = timed(legacy_decode, rows)
+        fast = timed(codec.decode_value, rows)
+        print(f"{label:<10} {legacy * 1000:>10.1f} {fast * 1000:>10.1f} {legacy / fast:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+ID allocation benchmark at high keyspace fill.
+
+Fills --fill of the legacy order keyspace (3001-999999) in an in-memory
+stand-in store that adds --latency-ms per sidecar call, then creates
+--creates orders at --concurrency two ways:
+
+  probe      random.randint plus get_item until a free ID is found, then
+             save_item (the previous create path)
+  allocator  common.ids.IdAllocator leasing blocks of --block-size IDs
+             from an ETag-guarded counter, then save_item
+
+Reports sidecar calls per create, wall time, and duplicate IDs handed
+out to concurrent creates. No sidecar is needed:
+
+    python id_allocation.py --fill 0.9 --creates 5000 --concurrency 50
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services"))
+from common.ids import IdAllocator  # noqa: E402
+from common.state import ETagMismatchError  # noqa: E402
+
+FIRST_ID = 3001
+LAST_ID = 999999
+
+
+class MemoryStore:
+    """Stand-in for DaprStateStore holding items in a dict, with a fixed delay per call."""
+
+    store_name = "memory"
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.items = {}
+        self.etags = {}
+        self.calls = 0
+
+    async def _call(self) -> None:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+
+    async def get_item(self, key: str):
+        await self._call()
+        return self.items.get(key)
+
+    async def get_item_with_etag(self, key: str):
+        await self._call()
+        return self.items.get(key), self.etags.get(key)
+
+    async def save_item(self, key: str, data: dict, etag=None) -> None:
+        await self._call()
+        if etag is not None and self.etags.get(key) != etag:
+            raise ETagMismatchError(key)
+        self.items[key] = data
+        self.etags[key] = str(self.calls)
+
+    async def insert_item(self, key: str, data: dict) -> bool:
+        await self._call()
+        if key in self.items:
+            return False
+        self.items[key] = data
+        self.etags[key] = str(self.calls)
+        return True
+
+
+def fill(store: MemoryStore, ratio: float) -> None:
+    order = {"status": "PENDING"}
+    for order_id in random.sample(range(FIRST_ID, LAST_ID + 1), int((LAST_ID - FIRST_ID + 1) * ratio)):
+        store.items[str(order_id)] = order
+
+
+async def probe_create(store: MemoryStore, allocator) -> int:
+    order_id = random.randint(FIRST_ID, LAST_ID)
+    while await store.get_item(str(order_id)):
+        order_id = random.randint(FIRST_ID, LAST_ID)
+    await store.save_item(str(order_id), {"status": "PENDING"})
+    return order_id
+
+
+async def allocator_create(store: MemoryStore, allocator: IdAllocator) -> int:
+    order_id = await allocator.next_id()
+    await store.save_item(str(order_id), {"status": "PENDING"})
+    return order_id
+
+
+async def run(create, args) -> tuple[float, float, int]:
+    store = MemoryStore(args.latency_ms / 1000)
+    fill(store, args.fill)
+    allocator = IdAllocator(store, block_size=args.block_size)
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def one():
+        async with semaphore:
+            return await create(store, allocator)
+
+    start = time.perf_counter()
+    ids = await asyncio.gather(*(one() for _ in range(args.creates)))
+    elapsed = time.perf_counter() - start
+    duplicates = sum(count - 1 for count in Counter(ids).values())
+    return store.calls / args.creates, elapsed, duplicates
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--fill", type=float, default=0.9, help="Fraction of the legacy keyspace already in use")
+    parser.add_argument("--creates", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--block-size", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=1.0, help="Simulated sidecar round trip")
+    args = parser.parse_args()
+
+    print(f"{args.creates} creates at {args.fill:.0%} fill, concurrency {args.concurrency}")
+    print(f"{'strategy':<10} {'calls/create':>12} {'seconds':>8} {'duplicates':>10}")
+    for name, create in (("probe", probe_create), ("allocator", allocator_create)):
+        calls, elapsed, duplicates = await run(create, args)
+        print(f"{name:<10} {calls:>12.2f} {elapsed:>8.2f} {duplicates:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,81 @@
+"""
+Filter pushdown benchmark for list endpoints.
+
+Seeds an orders store with --rows orders, then looks up one customer's
+orders and all orders in one status two ways:
+
+  fetch-all  empty-filter query, filtered in Python (the old behaviour)
+  pushdown   Dapr state query filter evaluated by the state store
+
+Run it next to a Dapr sidecar with a queryable state store (e.g. the
+PostgreSQL store used by the services):
+
+    dapr run --app-id bench --resources-path ../services/orders/k8s/dapr -- \
+        python list_pushdown.py --store orders-store --rows 1000000 --seed
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services"))
+from common.query import build_query  # noqa: E402
+from common.state import DaprStateStore  # noqa: E402
+
+STATUSES = ["PENDING", "PAID", "PROCESSING", "SHIPPED", "DELIVERED", "CANCELLED"]
+
+
+async def seed(store: DaprStateStore, rows: int, customers: int) -> None:
+    batch = {}
+    for order_id in range(1, rows + 1):
+        batch[str(order_id)] = {
+            "order_id": order_id,
+            "customer_id": random.randint(1, customers),
+            "items": [{"product_id": 1001, "quantity": 1}],
+            "status": random.choice(STATUSES),
+        }
+        if len(batch) == 10000:
+            await store.save_items(batch)
+            batch = {}
+    if batch:
+        await store.save_items(batch)
+
+
+async def fetch_all(store: DaprStateStore, field: str, value) -> int:
+    results, _ = await store.query_items({"filter": {}})
+    return sum(1 for result in results if result["value"].get(field) == value)
+
+
+async def pushdown(store: DaprStateStore, field: str, value) -> int:
+    results, _ = await store.query_items(build_query({field: value}))
+    return len(results)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=os.getenv("DAPR_STORE_NAME", "orders-store"))
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--customers", type=int, default=10000)
+    parser.add_argument("--seed", action="store_true", help="Write --rows orders before measuring")
+    args = parser.parse_args()
+
+    store = DaprStateStore(args.store)
+    if args.seed:
+        start = time.perf_counter()
+        await seed(store, args.rows, args.customers)
+        print(f"Seeded {args.rows} orders in {time.perf_counter() - start:.1f}s")
+
+    print(f"{'lookup':<22} {'strategy':<10} {'matches':>8} {'ms':>10}")
+    for field, value in (("customer_id", 42), ("status", "SHIPPED")):
+        for name, strategy in (("fetch-all", fetch_all), ("pushdown", pushdown)):
+            start = time.perf_counter()
+            matches = await strategy(store, field, value)
+            elapsed = (time.perf_counter() - start) * 1000
+            print(f"{field + '=' + str(value):<22} {name:<10} {matches:>8} {elapsed:>10.1f}")
+    await store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,10 @@
+"""
+Load test for the FastAPI services.
+
+Drives a service's endpoints with a weighted mix of operations at a fixed
+concurrency, picking item keys from a uniform or Zipfian distribution, and
+reports throughput and p50/p95/p99 latency per operation. By default each
+service runs in-process over ASGI against the memory state backend (see
+common.backends), so no sidecar, database or network is involved; --url
+points it at a running service instead. See __main__.py for usage.
+"""
@@ -0,0 +1,170 @@
+"""
+Load test the FastAPI services and record throughput and latency.
+
+Each service in --services is seeded with --keys items and then driven by
+--concurrency workers for --duration seconds (after --warmup seconds that
+are not recorded). Item keys follow a Zipfian distribution with exponent
+--skew (0 is uniform). Results are printed and written to --output as JSON
+together with the commit and settings, and --baseline compares them with a
+previous results file.
+
+By default every service runs in-process over ASGI against the memory
+state backend, so this measures the services' Python overhead only:
+
+    cd benchmarks
+    python -m loadtest --services products,orders --concurrency 50 --duration 10 --skew 1.1
+
+--backend sqlite uses the SQLite backend instead. --url load tests one
+running service, for example behind a sidecar; data is seeded through
+its API, except for the catalogue, which must already hold --keys items:
+
+    python -m loadtest --services orders --url http://localhost/orders-service
+"""
+import argparse
+import asyncio
+import datetime
+import importlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+from contextlib import asynccontextmanager
+
+import httpx
+
+from .runner import run
+from .scenarios import HEALTH_PATHS, SCENARIOS
+
+SERVICES = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "..", "services"))
+
+
+def load_service(service: str):
+    """
+    Import a service's main module.
+
+    Every service has a main.py, models.py and dapr_client.py, so the
+    previously loaded service's modules are dropped from sys.modules first.
+    """
+    code = os.path.join(SERVICES, service, "code")
+    for name, module in list(sys.modules.items()):
+        if os.path.dirname(getattr(module, "__file__", None) or "").startswith(SERVICES + os.sep) and \
+                not name.startswith("common"):
+            del sys.modules[name]
+    sys.path[:] = [path for path in sys.path if not path.startswith(SERVICES + os.sep)]
+    sys.path.insert(0, code)
+    if SERVICES not in sys.path:
+        sys.path.insert(1, SERVICES)
+    return importlib.import_module("main")
+
+
+@asynccontextmanager
+async def in_process_client(service: str):
+    """Yield an ASGI client for the service, with its lifespan running, and its state store."""
+    main = load_service(service)
+    async with main.app.router.lifespan_context(main.app):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=60) as client:
+            yield client, main.state_store
+
+
+@asynccontextmanager
+async def remote_client(service: str, url: str):
+    """Yield a client for a running service after checking its health endpoint."""
+    async with httpx.AsyncClient(base_url=url, timeout=60) as client:
+        (await client.get(HEALTH_PATHS[service])).raise_for_status()
+        yield client, None
+
+
+async def load_test(service: str, args) -> dict:
+    rng = random.Random(args.seed)
+    client_context = remote_client(service, args.url) if args.url else in_process_client(service)
+    async with client_context as (client, store):
+        operations = await SCENARIOS[service](client, store, args.keys, args.skew, rng)
+        if args.warmup > 0:
+            await run(client, operations, args.concurrency, args.warmup, rng)
+        return await run(client, operations, args.concurrency, args.duration, rng)
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(__file__)
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_results(service: str, result: dict, baseline: dict) -> None:
+    print(f"{'operation':<24} {'requests':>9} {'errors':>7} {'req/s':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+          + (f" {'req/s Δ':>8} {'p99 Δ':>8}" if baseline else ""))
+    rows = [(f"{service}/{name}", stats, baseline.get("operations", {}).get(name))
+            for name, stats in result["operations"].items()]
+    rows.append((f"{service} (all)", result, baseline or None))
+    for label, stats, before in rows:
+        line = (f"{label:<24} {stats['requests']:>9} {stats['errors']:>7} {stats['throughput']:>9.1f} "
+                f"{stats['p50Ms']:>8.2f} {stats['p95Ms']:>8.2f} {stats['p99Ms']:>8.2f}")
+        if before:
+            line += f" {change(before['throughput'], stats['throughput']):>8} {change(before['p99Ms'], stats['p99Ms']):>8}"
+        print(line)
+
+
+def change(before: float, after: float) -> str:
+    return f"{(after - before) / before:+.0%}" if before else "n/a"
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--services", default=",".join(SCENARIOS), help="Comma-separated services to load test")
+    parser.add_argument("--concurrency", type=int, default=50, help="Concurrent workers")
+    parser.add_argument("--duration", type=float, default=10.0, help="Measured seconds per service")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Unrecorded seconds before measuring")
+    parser.add_argument("--keys", type=int, default=1000, help="Items seeded per service")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent of key popularity; 0 is uniform")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], default="memory", help="State backend in-process")
+    parser.add_argument("--url", help="Base URL of one running service instead of running it in-process")
+    parser.add_argument("--log-level", default="WARNING", help="LOG_LEVEL of in-process services")
+    parser.add_argument("--output", default="loadtest-results.json", help="Results file to write")
+    parser.add_argument("--baseline", help="Previous results file to compare with")
+    args = parser.parse_args()
+
+    services = [service.strip() for service in args.services.split(",") if service.strip()]
+    unknown = [service for service in services if service not in SCENARIOS]
+    if unknown:
+        parser.error(f"Unknown services: {', '.join(unknown)}. Supported: {', '.join(SCENARIOS)}")
+    if args.url and len(services) != 1:
+        parser.error("--url load tests one service; pass exactly one in --services")
+
+    # Read by the services and common.backends when they are first imported
+    os.environ["STATE_BACKEND"] = args.backend
+    os.environ["LOG_LEVEL"] = args.log_level
+
+    baseline = {}
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["services"]
+
+    target = args.url or f"in-process, {args.backend} backend"
+    print(f"{args.concurrency} workers, {args.duration:g}s per service, {args.keys} keys, skew {args.skew:g}, {target}")
+    results = {}
+    for service in services:
+        results[service] = await load_test(service, args)
+        print()
+        print_results(service, results[service], baseline.get(service, {}))
+
+    with open(args.output, "w") as f:
+        json.dump({
+            "timestamp": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "settings": {key: value for key, value in vars(args).items() if key not in ("output", "baseline")},
+            "services": results,
+        }, f, indent=2)
+    print(f"\nWrote {args.output}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,28 @@
+import bisect
+import itertools
+import random
+from typing import Sequence
+
+
+class KeyChooser:
+    """
+    Picks keys from a fixed list, uniformly or with Zipfian skew.
+
+    With skew s > 0 the key at rank r (0-based, in list order) is chosen
+    with probability proportional to 1 / (r + 1) ** s, so the first keys
+    of the list are the hot ones. s = 0 is uniform.
+    """
+
+    def __init__(self, keys: Sequence, skew: float, rng: random.Random):
+        self.keys = list(keys)
+        self.rng = rng
+        self._cumulative = list(itertools.accumulate(1 / (rank + 1) ** skew for rank in range(len(self.keys))))
+
+    def choose(self):
+        """Return one key."""
+        point = self.rng.random() * self._cumulative[-1]
+        return self.keys[min(bisect.bisect_left(self._cumulative, point), len(self.keys) - 1)]
+
+    def hottest_share(self, count: int = 1) -> float:
+        """Fraction of picks expected to hit the count hottest keys."""
+        return self._cumulative[min(count, len(self.keys)) - 1] / self._cumulative[-1]
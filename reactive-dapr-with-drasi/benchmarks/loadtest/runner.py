@@ -0,0 +1,75 @@
+import asyncio
+import math
+import random
+import time
+from typing import Awaitable, Callable, Dict, List, NamedTuple
+
+import httpx
+
+
+class Operation(NamedTuple):
+    """One kind of request in a scenario's mix."""
+    name: str
+    weight: float
+    call: Callable[[httpx.AsyncClient], Awaitable[httpx.Response]]
+
+
+def percentile(sorted_values: List[float], fraction: float) -> float:
+    """Nearest-rank percentile of an ascending list; 0 for an empty one."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(fraction * len(sorted_values)) - 1)]
+
+
+def summarize(latencies: List[float], errors: int, seconds: float) -> Dict[str, float]:
+    """Throughput and latency percentiles (milliseconds) of one operation or of the whole mix."""
+    latencies = sorted(latencies)
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput": round(len(latencies) / seconds, 1) if seconds else 0.0,
+        "p50Ms": round(percentile(latencies, 0.50), 3),
+        "p95Ms": round(percentile(latencies, 0.95), 3),
+        "p99Ms": round(percentile(latencies, 0.99), 3),
+        "maxMs": round(latencies[-1], 3) if latencies else 0.0,
+    }
+
+
+async def run(client: httpx.AsyncClient, operations: List[Operation], concurrency: int,
+              duration: float, rng: random.Random) -> dict:
+    """
+    Run the operation mix from concurrency workers for duration seconds.
+
+    Each worker picks an operation by weight, awaits it and records its
+    latency, then picks the next. Responses with status 400 and above and
+    exceptions count as errors; their latency is recorded too.
+
+    Returns:
+        Summary of the whole mix, with a summary per operation under "operations"
+    """
+    weights = [operation.weight for operation in operations]
+    latencies = {operation.name: [] for operation in operations}
+    errors = {operation.name: 0 for operation in operations}
+    deadline = time.perf_counter() + duration
+
+    async def worker():
+        while time.perf_counter() < deadline:
+            operation, = rng.choices(operations, weights)
+            start = time.perf_counter()
+            try:
+                response = await operation.call(client)
+                failed = response.status_code >= 400
+            except Exception:
+                failed = True
+            latencies[operation.name].append((time.perf_counter() - start) * 1000)
+            if failed:
+                errors[operation.name] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    seconds = time.perf_counter() - start
+
+    result = summarize([latency for values in latencies.values() for latency in values], sum(errors.values()), seconds)
+    result["seconds"] = round(seconds, 3)
+    result["operations"] = {name: summarize(latencies[name], errors[name], seconds) for name in latencies}
+    return result
@@ -0,0 +1,157 @@
+"""
+Operation mixes per service.
+
+Each scenario seeds --keys items through the service's batch endpoints
+and returns its weighted operations. Item keys for reads and writes are
+drawn from a KeyChooser, so with --skew above zero a few hot items take
+most of the traffic (for products, most stock decrements hit the same
+few products).
+"""
+import itertools
+import random
+from typing import Awaitable, Callable, Dict, List, Optional
+
+import httpx
+
+from .keys import KeyChooser
+from .runner import Operation
+
+# Items sent per batch request while seeding
+SEED_BATCH_SIZE = 1000
+
+STATUS_STEPS = ["PAID", "PROCESSING", "SHIPPED"]
+
+TIERS = ["BRONZE", "SILVER", "GOLD"]
+
+
+async def _seed(client: httpx.AsyncClient, path: str, items: List[dict], created_field: Optional[str] = "created") -> List[int]:
+    """POST items to a batch endpoint in chunks, returning the created IDs."""
+    created = []
+    for start in range(0, len(items), SEED_BATCH_SIZE):
+        response = await client.post(path, json={"items": items[start:start + SEED_BATCH_SIZE]})
+        response.raise_for_status()
+        if created_field:
+            created.extend(response.json()[created_field])
+    return created
+
+
+async def products(client: httpx.AsyncClient, store, count: int, skew: float, rng: random.Random) -> List[Operation]:
+    await _seed(client, "/products:batch", [
+        {
+            "productId": product_id,
+            "productName": f"Product {product_id}",
+            "productDescription": "Load test product",
+            "stockOnHand": 10 ** 9,
+            "lowStockThreshold": 10
+        }
+        for product_id in range(1, count + 1)
+    ])
+    product_ids = KeyChooser(range(1, count + 1), skew, rng)
+
+    return [
+        Operation("get", 5, lambda c: c.get(f"/products/{product_ids.choose()}")),
+        Operation("decrement", 3, lambda c: c.put(f"/products/{product_ids.choose()}/decrement", json={"quantity": 1})),
+        Operation("list", 1, lambda c: c.get("/products", params={"limit": 50})),
+    ]
+
+
+async def orders(client: httpx.AsyncClient, store, count: int, skew: float, rng: random.Random) -> List[Operation]:
+    customers = max(1, count // 10)
+    order_ids = KeyChooser(await _seed(client, "/orders:batch", [
+        {"customerId": rng.randint(1, customers), "items": [{"productId": rng.randint(1, 100), "quantity": 1}]}
+        for _ in range(count)
+    ]), skew, rng)
+    customer_ids = KeyChooser(range(1, customers + 1), skew, rng)
+
+    return [
+        Operation("create", 2, lambda c: c.post("/orders", json={
+            "customerId": customer_ids.choose(),
+            "items": [{"productId": rng.randint(1, 100), "quantity": 1}]
+        })),
+        Operation("get", 4, lambda c: c.get(f"/orders/{order_ids.choose()}")),
+        Operation("status", 2, lambda c: c.put(f"/orders/{order_ids.choose()}/status", json={"status": rng.choice(STATUS_STEPS)})),
+        Operation("customer_orders", 1, lambda c: c.get(f"/customers/{customer_ids.choose()}/orders", params={"limit": 20})),
+        Operation("summary", 1, lambda c: c.get("/orders/summary")),
+    ]
+
+
+async def reviews(client: httpx.AsyncClient, store, count: int, skew: float, rng: random.Random) -> List[Operation]:
+    product_count = max(1, count // 20)
+    review_ids = KeyChooser(await _seed(client, "/reviews:batch", [
+        {"productId": rng.randint(1, product_count), "customerId": rng.randint(1, 1000), "rating": rng.randint(1, 5)}
+        for _ in range(count)
+    ]), skew, rng)
+    product_ids = KeyChooser(range(1, product_count + 1), skew, rng)
+
+    return [
+        Operation("create", 1, lambda c: c.post("/reviews", json={
+            "productId": product_ids.choose(),
+            "customerId": rng.randint(1, 1000),
+            "rating": rng.randint(1, 5),
+            "reviewText": "Load test review"
+        })),
+        Operation("get", 2, lambda c: c.get(f"/reviews/{review_ids.choose()}")),
+        Operation("product_reviews", 3, lambda c: c.get(f"/products/{product_ids.choose()}/reviews", params={"limit": 20})),
+        Operation("summary", 3, lambda c: c.get(f"/reviews/summary/{product_ids.choose()}")),
+    ]
+
+
+async def customers(client: httpx.AsyncClient, store, count: int, skew: float, rng: random.Random) -> List[Operation]:
+    created = await _seed(client, "/customers:batch", [
+        {"customerName": f"Customer {i}", "email": f"customer{i}@example.com", "loyaltyTier": rng.choice(TIERS)}
+        for i in range(count)
+    ])
+    customer_ids = KeyChooser(created, skew, rng)
+    emails = KeyChooser([f"customer{i}@example.com" for i in range(count)], skew, rng)
+    new_emails = (f"new{i}-{rng.getrandbits(32)}@example.com" for i in itertools.count())
+
+    return [
+        Operation("get", 4, lambda c: c.get(f"/customers/{customer_ids.choose()}")),
+        Operation("by_email", 3, lambda c: c.get(f"/customers/by-email/{emails.choose()}")),
+        Operation("update", 1, lambda c: c.put(f"/customers/{customer_ids.choose()}", json={"loyaltyTier": rng.choice(TIERS)})),
+        Operation("create", 1, lambda c: c.post("/customers", json={"customerName": "New customer", "email": next(new_emails)})),
+    ]
+
+
+async def catalogue(client: httpx.AsyncClient, store, count: int, skew: float, rng: random.Random) -> List[Operation]:
+    # The catalogue is written by Drasi, not through the API, so it can only be seeded in-process
+    if store is not None:
+        await store.save_items({
+            str(product_id): {
+                "product_id": product_id,
+                "product_name": f"Product {product_id}",
+                "product_description": "Load test product",
+                "avg_rating": round(rng.uniform(1, 5), 2),
+                "review_count": rng.randint(0, 500)
+            }
+            for product_id in range(1, count + 1)
+        })
+        # The service serves reads from memory, so pick up the seeded items now
+        (await client.post("/api/catalogue:rescan")).raise_for_status()
+    product_ids = KeyChooser(range(1, count + 1), skew, rng)
+
+    return [
+        Operation("get", 5, lambda c: c.get(f"/api/catalogue/{product_ids.choose()}")),
+        Operation("list", 1, lambda c: c.get("/api/catalogue", params={"limit": 50})),
+        Operation("top_rated", 1, lambda c: c.get("/api/catalogue", params={"sort": "avgRating", "order": "desc", "limit": 50})),
+        Operation("lookup", 2, lambda c: c.get("/api/catalogue", params={"ids": ",".join(str(product_ids.choose()) for _ in range(10))})),
+        Operation("search", 2, lambda c: c.get("/api/catalogue/search", params={"q": f"product {product_ids.choose()}"})),
+    ]
+
+
+SCENARIOS: Dict[str, Callable[..., Awaitable[List[Operation]]]] = {
+    "products": products,
+    "orders": orders,
+    "reviews": reviews,
+    "customers": customers,
+    "catalogue": catalogue,
+}
+
+# Health endpoint of each service, polled before seeding a running service
+HEALTH_PATHS = {
+    "products": "/health",
+    "orders": "/health",
+    "reviews": "/health",
+    "customers": "/health",
+    "catalogue": "/api/health",
+}
@@ -0,0 +1,79 @@
+"""Tests for the load test's key distribution, statistics and runner."""
+import asyncio
+import collections
+import random
+
+import httpx
+import pytest
+
+from .keys import KeyChooser
+from .runner import Operation, percentile, run, summarize
+
+
+def test_uniform_chooser_spreads_picks_evenly():
+    chooser = KeyChooser(range(10), 0, random.Random(1))
+    picks = collections.Counter(chooser.choose() for _ in range(10000))
+
+    assert set(picks) == set(range(10))
+    assert max(picks.values()) - min(picks.values()) < 200
+    assert chooser.hottest_share() == pytest.approx(0.1)
+
+
+def test_skewed_chooser_favours_the_first_keys():
+    chooser = KeyChooser(["hot", "warm", "cold"], 1, random.Random(1))
+    picks = collections.Counter(chooser.choose() for _ in range(10000))
+
+    # Weights 1, 1/2 and 1/3 out of 11/6
+    assert chooser.hottest_share() == pytest.approx(6 / 11)
+    assert chooser.hottest_share(5) == pytest.approx(1)
+    assert picks["hot"] > picks["warm"] > picks["cold"]
+    assert picks["hot"] / 10000 == pytest.approx(6 / 11, abs=0.02)
+
+
+def test_percentile_uses_the_nearest_rank():
+    values = [float(value) for value in range(1, 101)]
+
+    assert percentile(values, 0.5) == 50
+    assert percentile(values, 0.99) == 99
+    assert percentile([3.0], 0.95) == 3
+    assert percentile([], 0.5) == 0
+
+
+def test_summarize_reports_throughput_and_percentiles():
+    summary = summarize([4.0, 1.0, 3.0, 2.0], errors=1, seconds=2)
+
+    assert summary == {
+        "requests": 4,
+        "errors": 1,
+        "throughput": 2.0,
+        "p50Ms": 2.0,
+        "p95Ms": 4.0,
+        "p99Ms": 4.0,
+        "maxMs": 4.0,
+    }
+    assert summarize([], errors=0, seconds=0)["throughput"] == 0
+
+
+def test_run_counts_error_responses_and_exceptions_per_operation():
+    def handle(request):
+        if request.url.path == "/broken":
+            raise httpx.ConnectError("refused")
+        return httpx.Response(404 if request.url.path == "/missing" else 200)
+
+    async def load():
+        transport = httpx.MockTransport(handle)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await run(client, [
+                Operation("ok", 1, lambda c: c.get("/ok")),
+                Operation("missing", 1, lambda c: c.get("/missing")),
+                Operation("broken", 1, lambda c: c.get("/broken")),
+            ], concurrency=4, duration=0.05, rng=random.Random(1))
+
+    result = asyncio.run(load())
+    operations = result["operations"]
+
+    assert result["requests"] == sum(operation["requests"] for operation in operations.values())
+    assert operations["ok"]["requests"] > 0 and operations["ok"]["errors"] == 0
+    assert operations["missing"]["errors"] == operations["missing"]["requests"] > 0
+    assert operations["broken"]["errors"] == operations["broken"]["requests"] > 0
+    assert result["errors"] == operations["missing"]["errors"] + operations["broken"]["errors"]
@@ -0,0 +1,122 @@
+"""
+Benchmark for list response serialization.
+
+Serves the same decoded rows from two FastAPI routes and fetches each
+in-process over ASGI:
+
+  models     from_db_dict -> *Item -> *Response -> *ListResponse, then
+             FastAPI validates and serializes it against response_model
+             (the previous path)
+  fast       *Response.dict_from_db -> common.responses.list_response
+
+The products (flat rows) and orders (nested items) models are used.
+No sidecar is needed:
+
+    python response_serialization.py --rows 10000
+"""
+import argparse
+import asyncio
+import importlib.util
+import os
+import sys
+import time
+
+import httpx
+from fastapi import FastAPI
+
+SERVICES = os.path.join(os.path.dirname(__file__), "..", "services")
+sys.path.insert(0, SERVICES)
+from common.responses import list_response  # noqa: E402
+
+
+def load_models(service: str):
+    """Import a service's models.py without clashing with the other services' modules of the same name."""
+    spec = importlib.util.spec_from_file_location(f"{service}_models", os.path.join(SERVICES, service, "code", "models.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def product_rows(count: int) -> list:
+    return [{
+        "product_id": i,
+        "product_name": f"Product {i}",
+        "product_description": "A reasonably long product description used for benchmarking",
+        "stock_on_hand": i % 200,
+        "low_stock_threshold": 20,
+        "is_low_stock": i % 200 <= 20,
+    } for i in range(count)]
+
+
+def order_rows(count: int) -> list:
+    return [{
+        "order_id": i,
+        "customer_id": i % 1000,
+        "items": [{"product_id": 1000 + j, "quantity": j + 1} for j in range(3)],
+        "status": "PAID",
+    } for i in range(count)]
+
+
+def build_app(rows: list, list_model, to_model, to_dict) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/models", response_model=list_model)
+    async def models_path():
+        items = [to_model(row) for row in rows]
+        return list_model(items=items, total=len(items), nextCursor=None)
+
+    @app.get("/fast", response_model=list_model)
+    async def fast_path():
+        return list_response([to_dict(row) for row in rows], None)
+
+    return app
+
+
+async def measure(app: FastAPI, path: str, repeat: int) -> tuple[float, int]:
+    """Return the best request time in ms and the body size."""
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            response = await client.get(path)
+            best = min(best, time.perf_counter() - start)
+    return best * 1000, len(response.content)
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    products = load_models("products")
+    orders = load_models("orders")
+    cases = {
+        "products": build_app(
+            product_rows(args.rows),
+            products.ProductListResponse,
+            lambda row: products.ProductResponse.from_product_item(products.ProductItem.from_db_dict(row)),
+            products.ProductResponse.dict_from_db,
+        ),
+        "orders": build_app(
+            order_rows(args.rows),
+            orders.OrderListResponse,
+            lambda row: orders.OrderResponse.from_order(orders.Order.from_db_dict(row)),
+            orders.OrderResponse.dict_from_db,
+        ),
+    }
+
+    print(f"{args.rows} rows per response, best of {args.repeat}")
+    print(f"{'list':<10} {'models ms':>10} {'fast ms':>10} {'speedup':>8} {'bytes':>10}")
+    for name, app in cases.items():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            assert (await client.get("/models")).json() == (await client.get("/fast")).json()
+        slow, _ = await measure(app, "/models", args.repeat)
+        fast, size = await measure(app, "/fast", args.repeat)
+        print(f"{name:<10} {slow:>10.1f} {fast:>10.1f} {slow / fast:>7.2f}x {size:>10}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Hot-product contention benchmark for stock decrements.
+
+Fires concurrent single-unit decrements at one product and compares:
+
+  naive     read-modify-write with no concurrency token (the old behaviour)
+  etag      ETag-guarded read-modify-write with bounded retries
+  combiner  per-product request combiner (one write per queued batch)
+
+For each strategy it reports throughput, how many decrements succeeded,
+and how many units were oversold (successful decrements that are missing
+from the stored stock level because another writer overwrote them).
+
+Run it next to a Dapr sidecar whose state store supports ETags, e.g.:
+
+    dapr run --app-id bench --resources-path ../services/products/k8s/dapr -- \
+        python stock_contention.py --store products-store
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "products", "code"))
+from dapr_client import DaprStateStore  # noqa: E402
+from models import ProductItem  # noqa: E402
+from stock import StockUpdateCombiner, update_stock  # noqa: E402
+
+
+async def naive_decrement(store: DaprStateStore, product_id: int) -> None:
+    data = await store.get_item(str(product_id))
+    product_item = ProductItem.from_db_dict(data)
+    if product_item.stockOnHand < 1:
+        raise ValueError("Insufficient stock")
+    product_item.stockOnHand -= 1
+    await store.save_item(str(product_id), product_item.to_db_dict())
+
+
+async def run_strategy(store: DaprStateStore, name: str, product_id: int, stock: int,
+                       requests: int, concurrency: int) -> dict:
+    await store.save_item(str(product_id), ProductItem(
+        productId=product_id,
+        productName="Benchmark product",
+        productDescription="Hot SKU used by stock_contention.py",
+        stockOnHand=stock,
+        lowStockThreshold=0
+    ).to_db_dict())
+
+    combiner = StockUpdateCombiner(store)
+    strategies = {
+        "naive": lambda: naive_decrement(store, product_id),
+        "etag": lambda: update_stock(store, product_id, -1),
+        "combiner": lambda: combiner.update(product_id, -1),
+    }
+    decrement = strategies[name]
+    outcomes = Counter()
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            try:
+                await decrement()
+                outcomes["ok"] += 1
+            except Exception as e:
+                outcomes[type(e).__name__] += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    final = ProductItem.from_db_dict(await store.get_item(str(product_id))).stockOnHand
+    return {
+        "strategy": name,
+        "throughput": requests / elapsed,
+        "succeeded": outcomes["ok"],
+        "oversold": outcomes["ok"] - (stock - final),
+        "errors": {k: v for k, v in outcomes.items() if k != "ok"},
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=os.getenv("DAPR_STORE_NAME", "products-store"))
+    parser.add_argument("--product-id", type=int, default=999001)
+    parser.add_argument("--stock", type=int, default=1000, help="Initial stock; set below --requests to test sell-out")
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    args = parser.parse_args()
+
+    store = DaprStateStore(args.store)
+    print(f"{'strategy':<10} {'req/s':>8} {'succeeded':>10} {'oversold':>9}  errors")
+    for name in ("naive", "etag", "combiner"):
+        result = await run_strategy(store, name, args.product_id, args.stock, args.requests, args.concurrency)
+        print(f"{result['strategy']:<10} {result['throughput']:>8.0f} {result['succeeded']:>10} "
+              f"{result['oversold']:>9}  {result['errors']}")
+    await store.delete_item(str(args.product_id))
+    await store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
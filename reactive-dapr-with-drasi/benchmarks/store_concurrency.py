@@ -0,0 +1,91 @@
+"""
+Concurrency vs latency benchmark for DaprStateStore.
+
+Compares the previous behaviour (async methods wrapping the blocking
+DaprClient, which serialises every call on the event loop) with the
+asyncio-based DaprStateStore used by the services.
+
+Run it next to a Dapr sidecar that has a state store configured, e.g.:
+
+    dapr run --app-id bench --resources-path ../services/products/k8s/dapr -- \
+        python store_concurrency.py --store products-store
+"""
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import sys
+import time
+
+from dapr.clients import DaprClient
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services"))
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "services", "products", "code"))
+from dapr_client import DaprStateStore  # noqa: E402
+
+
+class BlockingStateStore:
+    """The pre-asyncio store: declared async but blocks the loop on each call."""
+
+    def __init__(self, store_name: str):
+        self.store_name = store_name
+        self.client = DaprClient()
+
+    async def get_item(self, key: str):
+        response = self.client.get_state(store_name=self.store_name, key=key)
+        return json.loads(response.data) if response.data else None
+
+    async def close(self):
+        self.client.close()
+
+
+async def run_level(store, key: str, concurrency: int, requests: int) -> dict:
+    latencies = []
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            await store.get_item(key)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    return {
+        "concurrency": concurrency,
+        "throughput": requests / elapsed,
+        "p50": statistics.median(latencies),
+        "p99": latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--store", default=os.getenv("DAPR_STORE_NAME", "products-store"))
+    parser.add_argument("--key", default="benchmark-key")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--levels", default="1,10,50,100,200,500")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.levels.split(",")]
+    stores = {
+        "blocking": BlockingStateStore(args.store),
+        "asyncio": DaprStateStore(args.store),
+    }
+    await stores["asyncio"].save_item(args.key, {"benchmark": True})
+
+    print(f"{'client':<10} {'concurrency':>11} {'req/s':>10} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, store in stores.items():
+        for level in levels:
+            result = await run_level(store, args.key, level, args.requests)
+            print(f"{name:<10} {result['concurrency']:>11} {result['throughput']:>10.0f} "
+                  f"{result['p50']:>8.2f} {result['p99']:>8.2f}")
+        await store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
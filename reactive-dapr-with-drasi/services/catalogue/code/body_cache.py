@@ -0,0 +1,51 @@
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Optional
+
+from common.responses import EncodedBody
+
+
+class BodyCache:
+    """
+    Serialized response bodies for one version of the catalogue.
+
+    Bodies are keyed by the request parameters that shaped them and built
+    on a miss. The snapshot version changes with every catalogue change;
+    asking for a different version than the cached one drops every body,
+    so a body is never served after the catalogue changed under it.
+    """
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._version: Optional[int] = None
+        self._bodies: "OrderedDict[Hashable, EncodedBody]" = OrderedDict()
+        self._hits = 0
+        self._misses = 0
+
+    def get(self, version: int, key: Hashable, build: Callable[[], Any]) -> EncodedBody:
+        """Return the body for key at version, calling build for its content on a miss."""
+        if version != self._version:
+            self._bodies.clear()
+            self._version = version
+
+        body = self._bodies.get(key)
+        if body is not None:
+            self._hits += 1
+            self._bodies.move_to_end(key)
+            return body
+
+        self._misses += 1
+        body = EncodedBody(build())
+        if self.max_entries > 0:
+            self._bodies[key] = body
+            if len(self._bodies) > self.max_entries:
+                self._bodies.popitem(last=False)
+        return body
+
+    def stats(self) -> dict:
+        """Hit and miss counts and size, for the metrics endpoint."""
+        return {
+            "entries": len(self._bodies),
+            "bytes": sum(len(body.body) for body in self._bodies.values()),
+            "hits": self._hits,
+            "misses": self._misses,
+        }
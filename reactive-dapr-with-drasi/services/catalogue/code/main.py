@@ -1,15 +1,22 @@
+import asyncio
 import logging
 import os
 import time
 from contextlib import asynccontextmanager
 from typing import Optional, List
 
-from fastapi import FastAPI, HTTPException, Depends, status, Query
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Request, Body
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from models import CatalogueItem, CatalogueResponse, CatalogueListResponse
+from models import CatalogueResponse, CatalogueListResponse, CatalogueLookupRequest, CatalogueLookupResponse
 from dapr_client import DaprStateStore
+from snapshot import CatalogueSnapshot
+from search import SearchIndex
+from sorted_index import SortedIndex
+from body_cache import BodyCache
+from common.query import resolve_sort
+from common.responses import conditional_response, encoded_response, json_response, list_content, list_response, ndjson_line
 
 # Configure logging
 logging.basicConfig(
@@ -21,16 +28,73 @@ logger = logging.getLogger(__name__)
 # Global state store instance
 state_store = None
 
+# In-memory copy of the catalogue that every read is served from
+snapshot = CatalogueSnapshot()
+
+# Full-text index over the snapshot's names and descriptions
+search_index = SearchIndex()
+snapshot.add_listener(search_index.on_change)
+
+# Orders the list endpoint can sort by, each kept current with the snapshot
+sorted_indexes = {field: SortedIndex(field) for field in ("avgRating", "reviewCount")}
+for sorted_index in sorted_indexes.values():
+    snapshot.add_listener(sorted_index.on_change)
+
+# List sort parameter to the index serving it
+SORT_FIELDS = {field: field for field in sorted_indexes}
+
+# Serialized and compressed list pages, reused until the catalogue changes
+body_cache = BodyCache(int(os.getenv("CATALOGUE_BODY_CACHE_SIZE", "64")))
+
+# Largest page a client may request from a list endpoint
+MAX_PAGE_SIZE = 1000
+
+# Most product IDs one lookup may ask for
+MAX_LOOKUP_IDS = 1000
+
+# Dapr pub/sub component and topic carrying Drasi's catalogue change events; no pub/sub name disables the subscription
+CATALOGUE_PUBSUB_NAME = os.getenv("CATALOGUE_PUBSUB_NAME", "")
+CATALOGUE_TOPIC = os.getenv("CATALOGUE_TOPIC", "catalogue-changes")
+
+# Seconds between full rescans of the catalogue store after the initial load; 0 disables them
+CATALOGUE_RESCAN_INTERVAL = float(os.getenv("CATALOGUE_RESCAN_INTERVAL", "30"))
+
+# Seconds to wait before retrying a failed initial load, e.g. while the Dapr sidecar starts
+LOAD_RETRY_DELAY = 2.0
+
+
+async def _keep_snapshot_current(store: DaprStateStore):
+    """Load the catalogue snapshot, retrying until it succeeds, then rescan it every CATALOGUE_RESCAN_INTERVAL seconds."""
+    while not snapshot.loaded:
+        try:
+            await snapshot.load(store)
+            logger.info(f"Loaded {len(snapshot)} catalogue items")
+        except Exception as e:
+            logger.warning(f"Failed to load catalogue, retrying: {str(e)}")
+            await asyncio.sleep(LOAD_RETRY_DELAY)
+
+    while CATALOGUE_RESCAN_INTERVAL > 0:
+        await asyncio.sleep(CATALOGUE_RESCAN_INTERVAL)
+        try:
+            changed = await snapshot.load(store)
+            if changed:
+                logger.info(f"Catalogue rescan applied {changed} changes")
+        except Exception as e:
+            logger.error(f"Error rescanning catalogue: {str(e)}")
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
     global state_store
     state_store = DaprStateStore()
+    loader = asyncio.create_task(_keep_snapshot_current(state_store))
     logger.info("Catalogue service started")
     yield
     # Shutdown
     logger.info("Catalogue service shutting down")
+    loader.cancel()
+    await state_store.close()
 
 
 # Create FastAPI app
@@ -52,6 +116,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 
@@ -65,36 +130,147 @@ def get_state_store() -> DaprStateStore:
     return state_store
 
 
+def get_snapshot() -> CatalogueSnapshot:
+    """Dependency to get the catalogue snapshot once its initial load has finished."""
+    if not snapshot.loaded:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="Catalogue not loaded yet"
+        )
+    return snapshot
+
+
 @app.get("/api/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": "catalogue"}
 
 
+@app.get("/api/metrics")
+async def store_metrics(store: DaprStateStore = Depends(get_state_store)):
+    """State store call counts, errors and latency for this worker, and the catalogue snapshot's size and lag."""
+    return {**store.metrics.snapshot(), "catalogue": {**snapshot.stats(), "bodyCache": body_cache.stats()}}
+
+
+@app.get("/dapr/subscribe")
+async def dapr_subscriptions():
+    """Pub/sub subscriptions Dapr should deliver to this app."""
+    if not CATALOGUE_PUBSUB_NAME:
+        return []
+    return [{
+        "pubsubname": CATALOGUE_PUBSUB_NAME,
+        "topic": CATALOGUE_TOPIC,
+        "route": "/api/catalogue-changes"
+    }]
+
+
+@app.post("/api/catalogue-changes")
+async def handle_catalogue_change(event_data: dict = Body(...)):
+    """
+    Apply a change to the product-catalogue query result, published by Drasi.
+
+    Malformed events are dropped; the next rescan repairs whatever they
+    would have changed.
+    """
+    try:
+        # Dapr wraps the Drasi event in a CloudEvent
+        changed = snapshot.apply_event(event_data.get('data', event_data))
+        logger.debug(f"Applied catalogue change event (changed: {changed})")
+        return {"status": "SUCCESS"}
+    except Exception as e:
+        logger.error(f"Failed to apply catalogue change event: {str(e)}")
+        # DROP acknowledges the message so that Dapr does not redeliver it
+        return {"status": "DROP"}
+
+
+@app.post("/api/catalogue:rescan")
+async def rescan_catalogue(store: DaprStateStore = Depends(get_state_store)):
+    """Rescan the catalogue store now and apply any differences to the snapshot."""
+    start_time = time.time()
+    
+    try:
+        changed = await snapshot.load(store)
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Rescanned {len(snapshot)} catalogue items ({changed} changes) in {elapsed:.2f}ms")
+        
+        return {"items": len(snapshot), "changes": changed}
+        
+    except Exception as e:
+        logger.error(f"Error rescanning catalogue: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to rescan catalogue: {str(e)}"
+        )
+
+
+@app.get("/api/catalogue/search", response_model=CatalogueListResponse)
+async def search_catalogue(
+    request: Request,
+    q: str = Query(..., min_length=1, description="Words to find in product names and descriptions; the last may be a prefix"),
+    limit: int = Query(20, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of catalogue items to return"),
+    cursor: Optional[str] = Query(None, description="nextCursor from a previous page"),
+    catalogue: CatalogueSnapshot = Depends(get_snapshot)
+):
+    """
+    Search product names and descriptions, best match first.
+
+    Every word must match, ignoring case; the last word also matches as a
+    prefix. Results are ranked with BM25, with name matches counting double.
+    """
+    start_time = time.time()
+    
+    try:
+        offset = 0
+        if cursor:
+            try:
+                offset = int(cursor)
+            except ValueError:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=f"Invalid cursor '{cursor}'"
+                )
+        
+        product_ids, next_offset = search_index.search(q, limit, offset)
+        items = [catalogue.get(product_id) for product_id in product_ids]
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Found {len(items)} catalogue items for '{q}' in {elapsed:.2f}ms")
+        
+        return list_response(items, str(next_offset) if next_offset is not None else None, request)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error searching catalogue: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to search catalogue: {str(e)}"
+        )
+
+
 @app.get("/api/catalogue/{product_id}", response_model=CatalogueResponse)
 async def get_product_catalogue(
     product_id: int,
-    store: DaprStateStore = Depends(get_state_store)
+    request: Request,
+    catalogue: CatalogueSnapshot = Depends(get_snapshot)
 ):
     """Get catalogue information for a specific product."""
     start_time = time.time()
     
     try:
-        # Drasi uses the productId as the key in the state store
-        data = await store.get_item(str(product_id))
+        item = catalogue.get(product_id)
         
-        if not data:
+        if not item:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"Product {product_id} not found in catalogue"
             )
         
-        catalogue_item = CatalogueItem.from_db_dict(data)
-        
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Retrieved catalogue data for product {product_id} in {elapsed:.2f}ms")
         
-        return CatalogueResponse.from_catalogue_item(catalogue_item)
+        return conditional_response(request, item)
         
     except HTTPException:
         raise
@@ -106,42 +282,138 @@ async def get_product_catalogue(
         )
 
 
+async def _lookup(store: DaprStateStore, product_ids: List[int]) -> dict:
+    """
+    Resolve product IDs to catalogue entries, split into found items and missing IDs.
+
+    Served from the snapshot once it is loaded; until then, with one bulk
+    read of the catalogue store.
+    """
+    if snapshot.loaded:
+        found = {product_id: snapshot.get(product_id) for product_id in product_ids}
+    else:
+        stored = await store.get_items([str(product_id) for product_id in product_ids])
+        found = {product_id: CatalogueResponse.dict_from_db(stored[str(product_id)])
+                 for product_id in product_ids if str(product_id) in stored}
+    return {
+        "items": [found[product_id] for product_id in product_ids if found.get(product_id)],
+        "missing": [product_id for product_id in product_ids if not found.get(product_id)]
+    }
+
+
+def _parse_ids(ids: str) -> List[int]:
+    """Parse a comma-separated ids parameter, dropping duplicates."""
+    try:
+        product_ids = list(dict.fromkeys(int(product_id) for product_id in ids.split(",") if product_id.strip()))
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Invalid ids '{ids}'; expected comma-separated product IDs"
+        )
+    if not product_ids or len(product_ids) > MAX_LOOKUP_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"ids must list between 1 and {MAX_LOOKUP_IDS} product IDs"
+        )
+    return product_ids
+
+
+@app.post("/api/catalogue:lookup", response_model=CatalogueLookupResponse)
+async def lookup_catalogue_items(
+    lookup: CatalogueLookupRequest,
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """Get the catalogue entries of several products at once, reporting the IDs not found."""
+    start_time = time.time()
+    
+    try:
+        result = await _lookup(store, list(dict.fromkeys(lookup.productIds)))
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Looked up {len(lookup.productIds)} catalogue items ({len(result['missing'])} missing) in {elapsed:.2f}ms")
+        
+        return json_response(result)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error looking up catalogue items: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to look up catalogue items: {str(e)}"
+        )
+
+
+def _stream_catalogue_items(items: List[dict]):
+    """Yield catalogue items as NDJSON lines."""
+    for item in items:
+        yield ndjson_line(item)
+
+
 @app.get("/api/catalogue", response_model=CatalogueListResponse)
 async def list_catalogue_items(
+    request: Request,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of catalogue items to return"),
+    cursor: Optional[str] = Query(None, description="nextCursor from a previous page"),
+    stream: bool = Query(False, description="Stream every catalogue item from the cursor on as NDJSON"),
+    sort: Optional[str] = Query(None, description="Field to sort by: " + ", ".join(SORT_FIELDS)),
+    sort_order: str = Query("asc", alias="order", pattern="^(asc|desc)$", description="Sort direction"),
+    ids: Optional[str] = Query(None, description=f"Comma-separated product IDs to look up (at most {MAX_LOOKUP_IDS}) instead of listing"),
     store: DaprStateStore = Depends(get_state_store)
 ):
     """
-    Get all catalogue items using Dapr state query API with an empty filter.
+    Get catalogue items from the in-memory snapshot, in product ID order by default.
+
+    Pass sort=avgRating or sort=reviewCount with order=desc for best rated
+    or most reviewed first; these orders are kept as maintained indexes, so
+    a page costs no sort. Pass limit/cursor to page through the catalogue,
+    or stream=true to receive every item as NDJSON.
+
+    Pass ids=1001,1002,... to get just those products instead; the response
+    then lists the entries found and the IDs missing (see
+    POST /api/catalogue:lookup).
+
+    Pages are serialized once per catalogue version and sent gzip or
+    brotli compressed when the client's Accept-Encoding allows.
     """
     start_time = time.time()
     
     try:
-        # Simple query with empty filter to get all items
-        query = {
-            "filter": {}
-        }
+        if ids is not None:
+            product_ids = _parse_ids(ids)
+            result = await _lookup(store, product_ids)
+            
+            elapsed = (time.time() - start_time) * 1000
+            logger.info(f"Looked up {len(product_ids)} catalogue items ({len(result['missing'])} missing) in {elapsed:.2f}ms")
+            
+            return conditional_response(request, result)
         
-        # Execute the query
-        results, _ = await store.query_items(query)
+        catalogue = get_snapshot()
+        sorted_index = sorted_indexes[resolve_sort(sort, SORT_FIELDS)] if sort else None
         
-        # Convert results to CatalogueResponse objects
-        items = []
-        for result in results:
-            try:
-                catalogue_item = CatalogueItem.from_db_dict(result['value'])
-                items.append(CatalogueResponse.from_catalogue_item(catalogue_item))
-            except Exception as e:
-                logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
-                continue
+        def select(page_limit: Optional[int]):
+            if sorted_index is None:
+                return catalogue.page(page_limit, cursor)
+            product_ids, next_cursor = sorted_index.page(sort_order == "desc", page_limit, cursor)
+            return [catalogue.get(product_id) for product_id in product_ids], next_cursor
         
-        elapsed = (time.time() - start_time) * 1000
-        logger.info(f"Retrieved {len(items)} catalogue items in {elapsed:.2f}ms")
+        if stream:
+            items, _ = select(None)
+            return StreamingResponse(_stream_catalogue_items(items), media_type="application/x-ndjson")
         
-        return CatalogueListResponse(
-            items=items,
-            total=len(items)
+        body = body_cache.get(
+            catalogue.version,
+            (sort, sort_order if sort else None, limit, cursor),
+            lambda: list_content(*select(limit))
         )
         
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Retrieved catalogue list ({len(body.body)} bytes) in {elapsed:.2f}ms")
+        
+        return encoded_response(request, body)
+        
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error listing catalogue items: {str(e)}")
         raise HTTPException(
@@ -161,6 +433,12 @@ async def root():
             "health": "/api/health",
             "get_product": "/api/catalogue/{product_id}",
             "list_products": "/api/catalogue",
+            "search_products": "/api/catalogue/search?q={query}",
+            "lookup_products": "/api/catalogue?ids={id},{id}",
+            "lookup_products_post": "/api/catalogue:lookup",
+            "rescan": "/api/catalogue:rescan",
+            "change_events": "/api/catalogue-changes",
+            "metrics": "/api/metrics",
             "docs": "/api/docs",
             "redoc": "/api/redoc"
         }
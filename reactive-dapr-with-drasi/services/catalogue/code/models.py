@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import List, Optional
 
 
 class CatalogueItem(BaseModel):
@@ -38,7 +38,33 @@ class CatalogueResponse(BaseModel):
             reviewCount=item.reviewCount
         )
 
+    @staticmethod
+    def dict_from_db(data: dict) -> dict:
+        """
+        Validate a stored catalogue item and map it to its response JSON shape.
+
+        The row is validated as a CatalogueItem, so a malformed one raises
+        rather than being served. The snapshot maps each row once, when it
+        is loaded or changes, and serves the resulting dict to every request
+        without validating it again.
+
+        Raises:
+            KeyError: The row lacks a field
+            pydantic.ValidationError: A field of the row is invalid
+        """
+        return CatalogueResponse.from_catalogue_item(CatalogueItem.from_db_dict(data)).model_dump(mode="json")
+
 
 class CatalogueListResponse(BaseModel):
     items: list[CatalogueResponse]
-    total: int
\ No newline at end of file
+    total: int
+    nextCursor: Optional[str] = Field(None, description="Cursor for the next page, if more items may exist")
+
+
+class CatalogueLookupRequest(BaseModel):
+    productIds: List[int] = Field(..., min_items=1, max_items=1000, description="Products to look up")
+
+
+class CatalogueLookupResponse(BaseModel):
+    items: List[CatalogueResponse] = Field(..., description="Catalogue entries found, in request order")
+    missing: List[int] = Field(..., description="Requested product IDs not in the catalogue, in request order")
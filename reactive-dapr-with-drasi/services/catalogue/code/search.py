@@ -0,0 +1,248 @@
+import heapq
+import math
+import os
+import re
+from bisect import bisect_left, insort
+from collections import Counter, OrderedDict
+from itertools import islice
+from typing import Dict, Iterator, List, Optional, Tuple
+
+# BM25 term frequency saturation and document length normalization
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Each occurrence in productName counts this many times as much as one in productDescription
+NAME_WEIGHT = 2
+
+# Most indexed terms a prefix expands to; the shortest are kept
+MAX_PREFIX_TERMS = 50
+
+# Rankings kept for repeated queries and later pages, dropped whenever the index changes
+SEARCH_CACHE_SIZE = int(os.getenv("CATALOGUE_SEARCH_CACHE_SIZE", "256"))
+
+TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+STOP_WORDS = frozenset({
+    "a", "an", "and", "are", "as", "at", "be", "by", "for", "from", "in", "is",
+    "it", "of", "on", "or", "that", "the", "this", "to", "with",
+})
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase words, dropping stop words."""
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOP_WORDS]
+
+
+class _Ranking:
+    """Product IDs of one query in rank order, produced from an iterator as far as pages need them."""
+
+    def __init__(self, ordered: Iterator[int]):
+        self._ordered = ordered
+        self._ids: List[int] = []
+
+    def page(self, offset: int, limit: int) -> Tuple[List[int], Optional[int]]:
+        end = offset + limit
+        # One extra ID tells whether there is a next page
+        if len(self._ids) <= end:
+            self._ids.extend(islice(self._ordered, end + 1 - len(self._ids)))
+        return self._ids[offset:end], end if len(self._ids) > end else None
+
+
+class SearchIndex:
+    """
+    Inverted index over productName and productDescription, ranked with BM25.
+
+    Register it with CatalogueSnapshot.add_listener; it then reindexes a
+    product whenever its name or description changes. The sorted
+    vocabulary is used to expand the last query word as a prefix, so that
+    results appear while the user is still typing.
+
+    Every query word must match (the last one as a prefix). Scores are the
+    BM25 sum over the query words, where a prefix counts as its best
+    scoring expansion in each product; ties go to the lower product ID.
+
+    Besides product to term frequency, each term's postings are grouped by
+    (term frequency, product length). All products in a group score the
+    same, so a one-word query is answered by scoring the groups and merging
+    them, touching only the products on the requested pages, however many
+    products match. Queries of several words score the products matching
+    the rarest word that match the others too.
+    """
+
+    def __init__(self):
+        self._postings: Dict[str, Dict[int, int]] = {}
+        self._groups: Dict[str, Dict[Tuple[int, int], List[int]]] = {}
+        self._terms: List[str] = []
+        self._documents: Dict[int, Counter] = {}
+        self._lengths: Dict[int, int] = {}
+        self._total_length = 0
+        self._rankings: "OrderedDict[Tuple[str, ...], _Ranking]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def on_change(self, product_id: int, old: Optional[dict], new: Optional[dict]) -> None:
+        """Snapshot listener: reindex a product whose text changed."""
+        if old and new and (old["productName"], old["productDescription"]) == (new["productName"], new["productDescription"]):
+            return
+        if old:
+            self._remove(product_id)
+        if new:
+            self._add(product_id, new)
+        self._rankings.clear()
+
+    def _add(self, product_id: int, item: dict) -> None:
+        terms = Counter()
+        for token in tokenize(item["productName"]):
+            terms[token] += NAME_WEIGHT
+        for token in tokenize(item["productDescription"]):
+            terms[token] += 1
+        length = sum(terms.values())
+        for term, frequency in terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                self._groups[term] = {}
+                self._terms.insert(bisect_left(self._terms, term), term)
+            postings[product_id] = frequency
+            insort(self._groups[term].setdefault((frequency, length), []), product_id)
+        self._documents[product_id] = terms
+        self._lengths[product_id] = length
+        self._total_length += length
+
+    def _remove(self, product_id: int) -> None:
+        terms = self._documents.pop(product_id, None)
+        if terms is None:
+            return
+        length = self._lengths.pop(product_id)
+        self._total_length -= length
+        for term, frequency in terms.items():
+            postings = self._postings[term]
+            del postings[product_id]
+            groups = self._groups[term]
+            group = groups[(frequency, length)]
+            del group[bisect_left(group, product_id)]
+            if not group:
+                del groups[(frequency, length)]
+            if not postings:
+                del self._postings[term]
+                del self._groups[term]
+                del self._terms[bisect_left(self._terms, term)]
+
+    def _expand(self, prefix: str) -> List[str]:
+        """Indexed terms starting with prefix, at most MAX_PREFIX_TERMS of them."""
+        start = bisect_left(self._terms, prefix)
+        end = bisect_left(self._terms, prefix + "\U0010ffff", start)
+        if end - start <= MAX_PREFIX_TERMS:
+            return self._terms[start:end]
+        return heapq.nsmallest(MAX_PREFIX_TERMS, self._terms[start:end], key=len)
+
+    def _weights(self, term: str) -> Tuple[float, float, float]:
+        """Constants of BM25 for term: score = gain * tf / (tf + norm + scale * length)."""
+        count = len(self._documents)
+        matches = len(self._postings[term])
+        idf = math.log(1 + (count - matches + 0.5) / (matches + 0.5))
+        return idf * (BM25_K1 + 1), BM25_K1 * (1 - BM25_B), BM25_K1 * BM25_B * count / self._total_length
+
+    def _merge_groups(self, terms: List[str]) -> Iterator[Tuple[float, int]]:
+        """(score, product ID) of the products holding any of terms, best first, scored by their best term."""
+        streams = []
+        for term in terms:
+            gain, norm, scale = self._weights(term)
+            for (frequency, length), ids in self._groups[term].items():
+                streams.append((-gain * frequency / (frequency + norm + scale * length), ids))
+        if len(terms) == 1:
+            # One term holds each product once, so its groups can simply be read best first
+            streams.sort(key=lambda stream: stream[0])
+            for score, ids in streams:
+                for product_id in ids:
+                    yield -score, product_id
+            return
+        heap = [(score, ids[0], stream, 0) for stream, (score, ids) in enumerate(streams)]
+        heapq.heapify(heap)
+        seen = set()
+        while heap:
+            score, product_id, stream, position = heap[0]
+            ids = streams[stream][1]
+            if position + 1 < len(ids):
+                heapq.heapreplace(heap, (score, ids[position + 1], stream, position + 1))
+            else:
+                heapq.heappop(heap)
+            # A product's first appearance carries its best score
+            if product_id not in seen:
+                seen.add(product_id)
+                yield -score, product_id
+
+    def _combine(self, words: List[List[str]]) -> Iterator[int]:
+        """Products holding one of the terms of every word, by their total score."""
+        # The word matching the fewest products drives; the others are looked up per product
+        words = sorted(words, key=lambda terms: sum(len(self._postings[term]) for term in terms))
+        lookups = []
+        bound = 0.0
+        for terms in words[1:]:
+            options = []
+            for term in terms:
+                gain, norm, scale = self._weights(term)
+                scores = {
+                    (frequency, length): gain * frequency / (frequency + norm + scale * length)
+                    for frequency, length in self._groups[term]
+                }
+                options.append((self._postings[term], scores))
+            lookups.append(options)
+            bound += max(max(scores.values()) for _, scores in options)
+
+        lengths = self._lengths
+        pending: List[Tuple[float, int]] = []
+        for score, product_id in self._merge_groups(words[0]):
+            # No product still to come can total more than score + bound
+            while pending and -pending[0][0] > score + bound:
+                yield heapq.heappop(pending)[1]
+            total = score
+            for options in lookups:
+                best = 0.0
+                for postings, scores in options:
+                    frequency = postings.get(product_id)
+                    if frequency is not None and scores[(frequency, lengths[product_id])] > best:
+                        best = scores[(frequency, lengths[product_id])]
+                if not best:
+                    break
+                total += best
+            else:
+                heapq.heappush(pending, (-total, product_id))
+        while pending:
+            yield heapq.heappop(pending)[1]
+
+    def _rank(self, words: Tuple[str, ...]) -> Iterator[int]:
+        # Each word becomes the indexed terms it matches: itself, or the expansions of the prefix
+        matched = [[word] if word in self._postings else [] for word in words[:-1]]
+        matched.append(self._expand(words[-1]))
+        if not all(matched):
+            return iter(())
+        if len(matched) == 1:
+            return (product_id for _, product_id in self._merge_groups(matched[0]))
+        return self._combine(matched)
+
+    def search(self, query: str, limit: int, offset: int) -> Tuple[List[int], Optional[int]]:
+        """
+        Return one page of product IDs matching query, best first.
+
+        Args:
+            query: Free text; matching ignores case and stop words
+            limit: Maximum number of IDs
+            offset: Number of results to skip
+
+        Returns:
+            Tuple of (IDs, offset of the next page or None on the last page)
+        """
+        words = tuple(tokenize(query))
+        if not words or not self._documents:
+            return [], None
+
+        ranking = self._rankings.get(words)
+        if ranking is None:
+            ranking = self._rankings[words] = _Ranking(self._rank(words))
+            if len(self._rankings) > SEARCH_CACHE_SIZE:
+                self._rankings.popitem(last=False)
+        else:
+            self._rankings.move_to_end(words)
+        return ranking.page(offset, limit)
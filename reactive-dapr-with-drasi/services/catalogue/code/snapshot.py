@@ -0,0 +1,176 @@
+import asyncio
+import logging
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from models import CatalogueResponse
+from dapr_client import DaprStateStore
+from common.indexes import page_ids
+
+logger = logging.getLogger(__name__)
+
+# Called with (product_id, old entry, new entry) on every change; None means absent
+ChangeListener = Callable[[int, Optional[dict], Optional[dict]], None]
+
+
+class CatalogueSnapshot:
+    """
+    The whole catalogue held in memory, kept current from a change feed.
+
+    Items are kept as response dicts keyed by product ID, plus the sorted
+    product IDs for paging. The snapshot is filled by a paged scan of the
+    catalogue store (load) and then updated two ways:
+
+      - apply_event applies a Drasi change event for one product as soon as
+        it is published (see main.py for the pub/sub subscription)
+      - load, called again periodically, rescans the store and applies the
+        differences, which also repairs missed events
+
+    A rescan does not touch products that received an event after the scan
+    started, since the scan may have read them before the change.
+
+    Derived in-memory indexes register with add_listener and are told about
+    every entry that changes, whichever way the change arrived.
+    """
+
+    def __init__(self):
+        self._items: Dict[int, dict] = {}
+        self._ids: List[int] = []
+        # Monotonic time each product last changed through an event
+        self._event_times: Dict[int, float] = {}
+        # Bumped on every change, so derived data can tell whether it is current
+        self.version = 0
+        self.loaded = False
+        self._synced_at: Optional[float] = None
+        self._last_sync_ms = 0.0
+        self._event_lag_ms: Optional[float] = None
+        self._events_applied = 0
+        self._rescan_changes = 0
+        self._load_lock = asyncio.Lock()
+        self._listeners: List[ChangeListener] = []
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    def add_listener(self, listener: ChangeListener) -> None:
+        """Call listener for every entry already loaded and for every later change."""
+        for product_id in self._ids:
+            listener(product_id, None, self._items[product_id])
+        self._listeners.append(listener)
+
+    def get(self, product_id: int) -> Optional[dict]:
+        """Return a product's catalogue entry, or None if it is not in the catalogue."""
+        return self._items.get(product_id)
+
+    def page(self, limit: Optional[int], cursor: Optional[str]) -> Tuple[List[dict], Optional[str]]:
+        """
+        Return one page of entries in product ID order.
+
+        Args:
+            limit: Maximum number of entries, or None for all remaining
+            cursor: nextCursor of the previous page (the last product ID it held)
+
+        Returns:
+            Tuple of (entries, nextCursor or None on the last page)
+        """
+        ids, next_cursor = page_ids({"ids": self._ids}, limit, cursor)
+        return [self._items[product_id] for product_id in ids], next_cursor
+
+    def _put(self, product_id: int, item: Optional[dict]) -> bool:
+        """Store or remove one entry; False if nothing changed."""
+        current = self._items.get(product_id)
+        if current == item:
+            return False
+        if item is None:
+            del self._items[product_id]
+            del self._ids[bisect_left(self._ids, product_id)]
+        else:
+            if current is None:
+                self._ids.insert(bisect_left(self._ids, product_id), product_id)
+            self._items[product_id] = item
+        self.version += 1
+        for listener in self._listeners:
+            listener(product_id, current, item)
+        return True
+
+    async def load(self, store: DaprStateStore) -> int:
+        """
+        Scan the catalogue store page by page and apply the differences.
+
+        Concurrent calls are serialized.
+
+        Returns:
+            Number of entries added, changed or removed
+        """
+        async with self._load_lock:
+            started = time.monotonic()
+            scanned = {}
+            async for result in store.iter_items({"filter": {}}):
+                try:
+                    item = CatalogueResponse.dict_from_db(result['value'])
+                    scanned[item["productId"]] = item
+                except Exception as e:
+                    logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
+                    continue
+
+            changed = 0
+            for product_id in set(scanned) | set(self._items):
+                # An event newer than the scan wins over what the scan read
+                if self._event_times.get(product_id, 0.0) >= started:
+                    continue
+                changed += self._put(product_id, scanned.get(product_id))
+            # Events so far predate the next scan, so they no longer matter
+            self._event_times.clear()
+
+            if self.loaded:
+                self._rescan_changes += changed
+            self.loaded = True
+            self._synced_at = time.monotonic()
+            self._last_sync_ms = (self._synced_at - started) * 1000
+            return changed
+
+    def apply_event(self, event: Dict[str, Any]) -> bool:
+        """
+        Apply one Drasi change event for the product-catalogue query.
+
+        The event is in Drasi's unpacked format: op is i, u or d and payload
+        holds the query result row before and after the change.
+
+        Returns:
+            Whether the snapshot changed
+
+        Raises:
+            ValueError: The event is not a catalogue change
+        """
+        op = event.get("op")
+        payload = event.get("payload") or {}
+        if op in ("i", "u"):
+            item = CatalogueResponse.dict_from_db(payload["after"])
+            product_id = item["productId"]
+        elif op == "d":
+            item = None
+            product_id = payload["before"]["product_id"]
+        else:
+            raise ValueError(f"Unexpected operation type: {op}")
+
+        self._event_times[product_id] = time.monotonic()
+        self._events_applied += 1
+        if event.get("ts_ms"):
+            self._event_lag_ms = max(0.0, time.time() * 1000 - event["ts_ms"])
+        return self._put(product_id, item)
+
+    def stats(self) -> dict:
+        """Size and freshness of the snapshot, for the metrics endpoint."""
+        return {
+            "loaded": self.loaded,
+            "items": len(self._items),
+            "version": self.version,
+            # Time from a change in Drasi to its event being applied here, for the latest event
+            "eventLagMs": round(self._event_lag_ms, 1) if self._event_lag_ms is not None else None,
+            # Time since the last full scan finished; bounds the lag of changes whose events were missed
+            "sinceLastScanMs": round((time.monotonic() - self._synced_at) * 1000, 1) if self._synced_at else None,
+            "lastScanMs": round(self._last_sync_ms, 1),
+            "eventsApplied": self._events_applied,
+            "rescanChanges": self._rescan_changes,
+        }
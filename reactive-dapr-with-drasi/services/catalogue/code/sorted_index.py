@@ -0,0 +1,69 @@
+from bisect import bisect_left, bisect_right, insort
+from typing import List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+
+class SortedIndex:
+    """
+    Product IDs ordered by one catalogue field, kept in order as the snapshot changes.
+
+    Register it with CatalogueSnapshot.add_listener. Entries are (value,
+    product ID) tuples in a sorted list, so a change is two binary searches
+    plus a list insert and delete, and a page is a slice. Ties are in
+    product ID order, reversed when descending. The cursor is the last
+    entry of the previous page, so pages stay consistent while products
+    move around the order.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self._entries: List[Tuple[float, int]] = []
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def on_change(self, product_id: int, old: Optional[dict], new: Optional[dict]) -> None:
+        """Snapshot listener: move a product whose value of the field changed."""
+        if old and new and old[self.field] == new[self.field]:
+            return
+        if old:
+            del self._entries[bisect_left(self._entries, (old[self.field], product_id))]
+        if new:
+            insort(self._entries, (new[self.field], product_id))
+
+    def _position(self, cursor: str) -> Tuple[float, int]:
+        try:
+            value, product_id = cursor.rsplit(":", 1)
+            return float(value), int(product_id)
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid cursor '{cursor}'"
+            )
+
+    def page(self, descending: bool, limit: Optional[int], cursor: Optional[str]) -> Tuple[List[int], Optional[str]]:
+        """
+        Select one page of product IDs in field order.
+
+        Args:
+            descending: Highest values first
+            limit: Maximum number of IDs, or None for all remaining
+            cursor: nextCursor of the previous page
+
+        Returns:
+            Tuple of (IDs, nextCursor or None on the last page)
+        """
+        entries = self._entries
+        if descending:
+            end = bisect_left(entries, self._position(cursor)) if cursor else len(entries)
+            start = 0 if limit is None else max(0, end - limit)
+            page = entries[start:end][::-1]
+            more = start > 0
+        else:
+            start = bisect_right(entries, self._position(cursor)) if cursor else 0
+            end = len(entries) if limit is None else start + limit
+            page = entries[start:end]
+            more = end < len(entries)
+        next_cursor = f"{page[-1][0]}:{page[-1][1]}" if page and more else None
+        return [product_id for _, product_id in page], next_cursor
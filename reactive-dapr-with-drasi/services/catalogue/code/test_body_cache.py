@@ -0,0 +1,52 @@
+"""Tests for the catalogue's serialized body cache."""
+from body_cache import BodyCache
+from common.codec import decode_value
+
+
+def test_bodies_are_built_once_per_version():
+    cache = BodyCache(8)
+    builds = []
+
+    def build(content):
+        def build_body():
+            builds.append(content)
+            return content
+        return build_body
+
+    first = cache.get(1, "page", build({"items": [1]}))
+    assert cache.get(1, "page", build({"items": [2]})) is first
+    assert decode_value(first.body) == {"items": [1]}
+
+    changed = cache.get(2, "page", build({"items": [2]}))
+    assert decode_value(changed.body) == {"items": [2]}
+    assert builds == [{"items": [1]}, {"items": [2]}]
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 2
+
+
+def test_new_version_drops_every_body():
+    cache = BodyCache(8)
+    cache.get(1, "a", lambda: 1)
+    cache.get(1, "b", lambda: 2)
+    cache.get(2, "a", lambda: 3)
+
+    assert cache.stats()["entries"] == 1
+
+
+def test_least_recently_used_body_is_evicted():
+    cache = BodyCache(2)
+    cache.get(1, "a", lambda: "a")
+    cache.get(1, "b", lambda: "b")
+    cache.get(1, "a", lambda: "stale")
+    cache.get(1, "c", lambda: "c")
+
+    assert decode_value(cache.get(1, "a", lambda: "rebuilt").body) == "a"
+    assert decode_value(cache.get(1, "b", lambda: "rebuilt").body) == "rebuilt"
+
+
+def test_size_zero_caches_nothing():
+    cache = BodyCache(0)
+    cache.get(1, "a", lambda: "a")
+
+    assert decode_value(cache.get(1, "a", lambda: "b").body) == "b"
+    assert cache.stats()["entries"] == 0
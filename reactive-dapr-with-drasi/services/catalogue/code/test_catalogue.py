@@ -0,0 +1,70 @@
+"""Tests for the catalogue service's lookup endpoints."""
+import asyncio
+
+import pytest
+
+import main
+from body_cache import BodyCache
+from snapshot import CatalogueSnapshot
+
+
+def _row(product_id, avg_rating=4.0):
+    return {
+        "product_id": product_id,
+        "product_name": f"Product {product_id}",
+        "product_description": "A product",
+        "avg_rating": avg_rating,
+        "review_count": 2,
+    }
+
+
+@pytest.fixture
+def seeded_store(app_store, monkeypatch):
+    """The app store holding products 1-3, behind an empty snapshot and body cache."""
+    asyncio.run(app_store.save_items({str(product_id): _row(product_id) for product_id in (1, 2, 3)}))
+    monkeypatch.setattr(main, "snapshot", CatalogueSnapshot())
+    monkeypatch.setattr(main, "body_cache", BodyCache(8))
+    return app_store
+
+
+def test_lookup_keeps_request_order_and_reports_missing_ids(seeded_store, app_requests):
+    asyncio.run(main.snapshot.load(seeded_store))
+    response, = asyncio.run(app_requests(("POST", "/api/catalogue:lookup", {"productIds": [3, 9, 1, 3, 7]})))
+
+    assert response.status_code == 200
+    assert [item["productId"] for item in response.json()["items"]] == [3, 1]
+    assert response.json()["missing"] == [9, 7]
+
+
+def test_lookup_reads_the_store_until_the_snapshot_is_loaded(seeded_store, app_requests):
+    response, = asyncio.run(app_requests(("POST", "/api/catalogue:lookup", {"productIds": [2, 4]})))
+    assert [item["productId"] for item in response.json()["items"]] == [2]
+    assert response.json()["missing"] == [4]
+
+    # Once loaded, lookups come from the snapshot rather than the store
+    asyncio.run(main.snapshot.load(seeded_store))
+    asyncio.run(seeded_store.save_item("4", _row(4)))
+    response, = asyncio.run(app_requests(("GET", "/api/catalogue?ids=4,2", None)))
+    assert [item["productId"] for item in response.json()["items"]] == [2]
+    assert response.json()["missing"] == [4]
+
+
+def test_ids_lookup_matches_the_post_lookup(seeded_store, app_requests):
+    asyncio.run(main.snapshot.load(seeded_store))
+    posted, listed = asyncio.run(app_requests(
+        ("POST", "/api/catalogue:lookup", {"productIds": [2, 5, 1]}),
+        ("GET", "/api/catalogue?ids=2,5,1", None),
+    ))
+
+    assert posted.json() == listed.json()
+
+
+@pytest.mark.parametrize("ids", ["1,x", ",", ",".join(str(product_id) for product_id in range(1002))])
+def test_invalid_ids_are_a_bad_request(seeded_store, app_requests, ids):
+    response, = asyncio.run(app_requests(("GET", f"/api/catalogue?ids={ids}", None)))
+    assert response.status_code == 400
+
+
+def test_list_waits_for_the_snapshot(seeded_store, app_requests):
+    response, = asyncio.run(app_requests(("GET", "/api/catalogue", None)))
+    assert response.status_code == 503
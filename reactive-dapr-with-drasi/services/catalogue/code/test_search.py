@@ -0,0 +1,128 @@
+"""Tests for the catalogue's full-text search index."""
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from search import BM25_B, BM25_K1, NAME_WEIGHT, SearchIndex, tokenize
+
+
+def _item(product_id, name, description=""):
+    return {"productId": product_id, "productName": name, "productDescription": description}
+
+
+def _index(*items):
+    index = SearchIndex()
+    for item in items:
+        index.on_change(item["productId"], None, item)
+    return index
+
+
+def _all(index, query):
+    ids, _ = index.search(query, 1000, 0)
+    return ids
+
+
+def test_tokenize_lowercases_and_drops_stop_words():
+    assert tokenize("The Red_Chair, and a TABLE!") == ["red", "chair", "table"]
+
+
+def test_every_word_must_match_and_the_last_is_a_prefix():
+    index = _index(
+        _item(1, "Red chair", "Wooden"),
+        _item(2, "Blue chair", "Wooden"),
+        _item(3, "Red table", "Wooden"),
+    )
+
+    assert _all(index, "red") == [1, 3]
+    assert _all(index, "red ch") == [1]
+    assert _all(index, "ch") == [1, 2]
+    assert _all(index, "re chair") == []
+    assert _all(index, "the") == []
+
+
+def test_name_matches_rank_above_description_matches():
+    index = _index(_item(1, "Lamp", "A bright desk light"), _item(2, "Desk", "Sturdy"))
+
+    assert _all(index, "desk") == [2, 1]
+
+
+def test_pages_follow_the_ranking():
+    index = _index(*(_item(product_id, "Chair", "chair " * (product_id % 4)) for product_id in range(1, 12)))
+    ranking = _all(index, "chair")
+
+    pages = []
+    offset = 0
+    while offset is not None:
+        ids, offset = index.search("chair", 3, offset)
+        pages.extend(ids)
+    assert pages == ranking
+    assert len(ranking) == 11
+
+
+def test_changes_reindex_and_drop_cached_rankings():
+    index = _index(_item(1, "Red chair"), _item(2, "Blue chair"))
+    assert _all(index, "red") == [1]
+
+    index.on_change(1, _item(1, "Red chair"), _item(1, "Green chair"))
+    index.on_change(2, _item(2, "Blue chair"), _item(2, "Red sofa"))
+    assert _all(index, "red") == [2]
+    assert _all(index, "gre") == [1]
+
+    index.on_change(2, _item(2, "Red sofa"), None)
+    assert _all(index, "red") == []
+    assert len(index) == 1
+
+
+def _reference_scores(items, query):
+    """BM25 scores computed directly from the definition, for products matching every word."""
+    documents = {}
+    for item in items:
+        terms = Counter()
+        for token in tokenize(item["productName"]):
+            terms[token] += NAME_WEIGHT
+        for token in tokenize(item["productDescription"]):
+            terms[token] += 1
+        documents[item["productId"]] = terms
+    average = sum(sum(terms.values()) for terms in documents.values()) / len(documents)
+    vocabulary = sorted({term for terms in documents.values() for term in terms})
+
+    def score(terms, term):
+        matches = sum(1 for other in documents.values() if term in other)
+        idf = math.log(1 + (len(documents) - matches + 0.5) / (matches + 0.5))
+        frequency = terms[term]
+        length = sum(terms.values())
+        return idf * frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * (1 - BM25_B + BM25_B * length / average))
+
+    words = tokenize(query)
+    scores = {}
+    for product_id, terms in documents.items():
+        total = 0.0
+        for position, word in enumerate(words):
+            options = [word] if position < len(words) - 1 else [term for term in vocabulary if term.startswith(word)]
+            best = max((score(terms, term) for term in options if term in terms), default=0.0)
+            if not best:
+                break
+            total += best
+        else:
+            scores[product_id] = total
+    return scores
+
+
+@pytest.mark.parametrize("query", ["ab", "c", "abc b", "ca ab", "b ca d"])
+def test_ranking_matches_bm25(query):
+    rng = random.Random(query)
+    vocabulary = ["ab", "abc", "abd", "b", "bc", "ca", "cab", "d"]
+    items = [
+        _item(product_id, " ".join(rng.choices(vocabulary, k=rng.randint(1, 3))),
+              " ".join(rng.choices(vocabulary, k=rng.randint(0, 8))))
+        for product_id in range(1, 200)
+    ]
+    index = _index(*items)
+    scores = _reference_scores(items, query)
+    ranking = _all(index, query)
+
+    assert sorted(ranking) == sorted(scores)
+    for better, worse in zip(ranking, ranking[1:]):
+        assert scores[better] >= scores[worse] - 1e-9
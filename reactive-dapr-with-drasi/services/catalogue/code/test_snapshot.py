@@ -0,0 +1,132 @@
+"""Tests for the in-memory catalogue snapshot."""
+import asyncio
+
+import pytest
+from pydantic import ValidationError
+
+from dapr_client import DaprStateStore
+from models import CatalogueItem, CatalogueResponse
+from snapshot import CatalogueSnapshot
+
+
+def _row(product_id, avg_rating=4.0, review_count=2):
+    return {
+        "product_id": product_id,
+        "product_name": f"Product {product_id}",
+        "product_description": "A product",
+        "avg_rating": avg_rating,
+        "review_count": review_count,
+    }
+
+
+def _event(op, product_id, **row):
+    if op == "d":
+        return {"op": "d", "payload": {"before": _row(product_id, **row)}}
+    return {"op": op, "payload": {"after": _row(product_id, **row)}}
+
+
+@pytest.fixture
+def store(make_store):
+    return make_store(DaprStateStore)
+
+
+def test_load_fills_the_snapshot_in_product_order(store):
+    asyncio.run(store.save_items({str(product_id): _row(product_id) for product_id in (3, 1, 2)}))
+    snapshot = CatalogueSnapshot()
+
+    assert asyncio.run(snapshot.load(store)) == 3
+    assert snapshot.loaded
+    items, cursor = snapshot.page(2, None)
+    assert [item["productId"] for item in items] == [1, 2]
+    items, cursor = snapshot.page(2, cursor)
+    assert [item["productId"] for item in items] == [3]
+    assert cursor is None
+
+
+def test_events_insert_update_and_delete_entries():
+    snapshot = CatalogueSnapshot()
+    changes = []
+    snapshot.add_listener(lambda product_id, old, new: changes.append((product_id, old is None, new is None)))
+
+    assert snapshot.apply_event(_event("i", 1))
+    assert snapshot.apply_event(_event("u", 1, avg_rating=5))
+    assert not snapshot.apply_event(_event("u", 1, avg_rating=5))
+    assert snapshot.get(1)["avgRating"] == 5.0
+    assert snapshot.apply_event(_event("d", 1))
+    assert snapshot.get(1) is None
+    assert changes == [(1, True, False), (1, False, False), (1, False, True)]
+    assert snapshot.version == 3
+
+
+def test_unknown_event_is_rejected():
+    with pytest.raises(ValueError):
+        CatalogueSnapshot().apply_event({"op": "x", "payload": {}})
+
+
+def test_rescan_repairs_missed_changes(store):
+    asyncio.run(store.save_items({"1": _row(1), "2": _row(2)}))
+    snapshot = CatalogueSnapshot()
+    asyncio.run(snapshot.load(store))
+    asyncio.run(store.save_item("1", _row(1, avg_rating=1.5)))
+    asyncio.run(store.delete_item("2"))
+
+    assert asyncio.run(snapshot.load(store)) == 2
+    assert snapshot.get(1)["avgRating"] == 1.5
+    assert snapshot.get(2) is None
+    assert snapshot.stats()["rescanChanges"] == 2
+
+
+def test_event_during_a_rescan_wins_over_the_scan(store, monkeypatch):
+    asyncio.run(store.save_items({"1": _row(1, avg_rating=3.0), "2": _row(2)}))
+    snapshot = CatalogueSnapshot()
+    asyncio.run(snapshot.load(store))
+    iter_items = store.iter_items
+
+    async def scan_then_event(query):
+        async for result in iter_items(query):
+            yield result
+        # The store has not caught up with these changes yet, so the scan read stale rows
+        snapshot.apply_event(_event("u", 1, avg_rating=5.0))
+        snapshot.apply_event(_event("i", 3))
+
+    monkeypatch.setattr(store, "iter_items", scan_then_event)
+    asyncio.run(snapshot.load(store))
+
+    assert snapshot.get(1)["avgRating"] == 5.0
+    assert snapshot.get(3) is not None
+    assert len(snapshot) == 3
+
+
+# Drasi may store a whole-number rating as an integer
+@pytest.mark.parametrize("avg_rating", [4, 3.33333])
+def test_rows_map_as_the_response_model_does(avg_rating):
+    row = _row(1, avg_rating=avg_rating, review_count=7)
+    expected = CatalogueResponse.from_catalogue_item(CatalogueItem.from_db_dict(row)).model_dump(mode="json")
+    assert CatalogueResponse.dict_from_db(row) == expected
+
+
+MALFORMED = [
+    {**_row(1), "avg_rating": 7.5},
+    {**_row(1), "review_count": -1},
+    {key: value for key, value in _row(1).items() if key != "product_name"},
+]
+
+
+@pytest.mark.parametrize("row", MALFORMED)
+def test_malformed_rows_are_left_out_of_the_snapshot(store, row):
+    asyncio.run(store.save_items({"1": row, "2": _row(2)}))
+    snapshot = CatalogueSnapshot()
+    asyncio.run(snapshot.load(store))
+
+    assert snapshot.get(1) is None
+    assert snapshot.get(2) is not None
+
+
+@pytest.mark.parametrize("row", MALFORMED)
+def test_malformed_events_are_rejected(row):
+    snapshot = CatalogueSnapshot()
+    snapshot.apply_event(_event("i", 1))
+
+    with pytest.raises((KeyError, ValidationError)):
+        snapshot.apply_event({"op": "u", "payload": {"after": row}})
+    assert snapshot.get(1)["avgRating"] == 4.0
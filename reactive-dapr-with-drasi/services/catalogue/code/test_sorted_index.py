@@ -0,0 +1,65 @@
+"""Tests for the catalogue's sorted indexes."""
+import random
+
+import pytest
+from fastapi import HTTPException
+
+from sorted_index import SortedIndex
+
+
+def _index(ratings):
+    index = SortedIndex("avgRating")
+    for product_id, rating in ratings.items():
+        index.on_change(product_id, None, {"avgRating": rating})
+    return index
+
+
+def _pages(index, descending, limit):
+    ids = []
+    cursor = None
+    while True:
+        page, cursor = index.page(descending, limit, cursor)
+        ids.extend(page)
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize("limit", [1, 3, 7, 50])
+def test_pages_follow_the_field_order_with_ties_by_id(limit):
+    rng = random.Random(limit)
+    ratings = {product_id: rng.choice([1.0, 2.5, 4.0, 5.0]) for product_id in range(1, 30)}
+    index = _index(ratings)
+    ascending = sorted(ratings, key=lambda product_id: (ratings[product_id], product_id))
+
+    assert _pages(index, False, limit) == ascending
+    assert _pages(index, True, limit) == ascending[::-1]
+    assert index.page(False, None, None) == (ascending, None)
+
+
+def test_cursor_holds_its_place_while_products_move():
+    index = _index({1: 1.0, 2: 2.0, 3: 3.0, 4: 4.0})
+    first, cursor = index.page(False, 2, None)
+    assert first == [1, 2]
+
+    # Product 2, the last one returned, moves up; product 1 moves past the cursor
+    index.on_change(2, {"avgRating": 2.0}, {"avgRating": 5.0})
+    index.on_change(1, {"avgRating": 1.0}, {"avgRating": 3.5})
+    rest, cursor = index.page(False, 10, cursor)
+    assert rest == [3, 1, 4, 2]
+    assert cursor is None
+
+
+def test_unchanged_field_leaves_the_order_alone():
+    index = _index({1: 4.0, 2: 3.0})
+    index.on_change(1, {"avgRating": 4.0}, {"avgRating": 4.0})
+    index.on_change(2, {"avgRating": 3.0}, None)
+
+    assert index.page(True, None, None) == ([1], None)
+    assert len(index) == 1
+
+
+@pytest.mark.parametrize("cursor", ["nonsense", "4.0", "x:1", "4.0:y"])
+def test_invalid_cursor_is_a_bad_request(cursor):
+    with pytest.raises(HTTPException) as raised:
+        _index({1: 4.0}).page(False, 1, cursor)
+    assert raised.value.status_code == 400
@@ -75,6 +75,18 @@ else
     print_result "Get product 1001" false "Unexpected response code: $HTTP_CODE"
 fi
 
+# Test 4: Batch Lookup (Products 1001, 1002 and a missing one)
+echo ""
+echo "Test 4: Batch Lookup - Products 1001, 1002, 999999"
+echo "--------------------------------------------------"
+RESPONSE=$(make_request_with_retry "GET" "$BASE_URL/catalogue?ids=1001,1002,999999" "")
+HTTP_CODE=$(echo "$RESPONSE" | tail -n 1)
+if [ "$HTTP_CODE" = "200" ] && echo "$RESPONSE" | grep -q '"missing":\[[^]]*999999'; then
+    print_result "Batch lookup" true "Hits returned and 999999 reported missing"
+else
+    print_result "Batch lookup" false "Expected 200 with 999999 missing, got: $HTTP_CODE"
+fi
+
 # Print summary
 echo ""
 echo "================================="
@@ -2,29 +2,45 @@ import React, { useEffect, useState } from 'react';
 import { catalogueApi } from '../services/api';
 import { CatalogueItem } from '../types';
 import { ProductCard } from './ProductCard';
-import { Loader2 } from 'lucide-react';
+import { Loader2, Search } from 'lucide-react';
 
 export const ProductList: React.FC = () => {
   const [products, setProducts] = useState<CatalogueItem[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState<string | null>(null);
+  const [query, setQuery] = useState('');
 
   useEffect(() => {
+    let cancelled = false;
     const fetchProducts = async () => {
       try {
-        setLoading(true);
-        const response = await catalogueApi.getAllProducts();
-        setProducts(response.items);
+        // Search on the server; an empty query lists the whole catalogue
+        const response = query.trim()
+          ? await catalogueApi.searchProducts(query)
+          : await catalogueApi.getAllProducts();
+        if (!cancelled) {
+          setProducts(response.items);
+          setError(null);
+        }
       } catch (err) {
-        setError('Failed to load products');
+        if (!cancelled) {
+          setError('Failed to load products');
+        }
         console.error('Error fetching products:', err);
       } finally {
-        setLoading(false);
+        if (!cancelled) {
+          setLoading(false);
+        }
       }
     };
 
-    fetchProducts();
-  }, []);
+    // Wait for a pause in typing before searching
+    const timer = setTimeout(fetchProducts, query ? 200 : 0);
+    return () => {
+      cancelled = true;
+      clearTimeout(timer);
+    };
+  }, [query]);
 
   if (loading) {
     return (
@@ -42,7 +58,7 @@ export const ProductList: React.FC = () => {
     );
   }
 
-  if (products.length === 0) {
+  if (products.length === 0 && !query) {
     return (
       <div className="text-center py-12">
         <p className="text-gray-600 text-lg">No products available in the catalogue.</p>
@@ -53,11 +69,25 @@ export const ProductList: React.FC = () => {
   return (
     <div className="container mx-auto px-4 py-8">
       <h1 className="text-3xl font-bold text-gray-900 mb-8">Product Catalogue</h1>
-      <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
-        {products.map((product) => (
-          <ProductCard key={product.productId} product={product} />
-        ))}
+      <div className="relative mb-8">
+        <Search className="absolute left-3 top-1/2 -translate-y-1/2 text-gray-400" size={20} />
+        <input
+          type="search"
+          value={query}
+          onChange={(e) => setQuery(e.target.value)}
+          placeholder="Search products..."
+          className="w-full pl-10 pr-4 py-2 border border-gray-300 rounded-lg focus:outline-none focus:ring-2 focus:ring-blue-500"
+        />
       </div>
+      {products.length === 0 ? (
+        <p className="text-center text-gray-600 text-lg py-12">No products match "{query}".</p>
+      ) : (
+        <div className="grid grid-cols-1 md:grid-cols-2 lg:grid-cols-3 gap-6">
+          {products.map((product) => (
+            <ProductCard key={product.productId} product={product} />
+          ))}
+        </div>
+      )}
     </div>
   );
 };
\ No newline at end of file
@@ -9,6 +9,13 @@ export const catalogueApi = {
     return response.data;
   },
 
+  async searchProducts(query: string): Promise<CatalogueListResponse> {
+    const response = await axios.get<CatalogueListResponse>(`${API_BASE_URL}/catalogue/search`, {
+      params: { q: query, limit: 100 }
+    });
+    return response.data;
+  },
+
   async getProduct(productId: number): Promise<CatalogueItem> {
     const response = await axios.get<CatalogueItem>(`${API_BASE_URL}/catalogue/${productId}`);
     return response.data;
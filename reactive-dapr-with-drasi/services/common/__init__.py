@@ -0,0 +1,14 @@
+"""
+Shared Python code for the Dapr-backed services.
+
+Each service imports the state store client from here through a thin
+dapr_client.py shim that sets its default store name.
+"""
+from .state import DaprStateStore, ETagMismatchError, QUERY_PAGE_SIZE, META_KEY_PREFIX
+from .ids import IdAllocator, IdAllocationError
+from .metrics import StoreMetrics
+
+__all__ = [
+    "DaprStateStore", "ETagMismatchError", "QUERY_PAGE_SIZE", "META_KEY_PREFIX",
+    "IdAllocator", "IdAllocationError", "StoreMetrics",
+]
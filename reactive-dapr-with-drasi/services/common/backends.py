@@ -0,0 +1,464 @@
+"""
+In-process stand-ins for the Dapr sidecar's state API.
+
+DaprStateStore talks to its backend through the subset of the asyncio
+DaprClient state API it uses: get_state, get_bulk_state, save_state,
+delete_state, execute_state_transaction and query_state. The backends here
+implement that subset with the client's response types and its errors, so
+the store's ETag, insert, transaction, cache and metrics code runs
+unchanged on top of them. A failed ETag or first-write check is an ABORTED
+gRPC error, and a filter the query API does not support an
+INVALID_ARGUMENT one; like the client, save_state raises them as a
+DaprInternalError holding the details and the other calls as a
+DaprGrpcError. This makes it possible to profile the services' own
+overhead and to load test them without a sidecar, PostgreSQL or a network.
+
+The SDK's TransactionalStateOperation cannot carry state options, so an
+upsert in a transaction cannot ask for first-write concurrency. Operations
+that need it are StateOperations, and every client here, the sidecar's
+included, sends their options.
+
+STATE_BACKEND selects the backend:
+
+  dapr    the Dapr sidecar (default)
+  memory  a dict per store name, shared by every store in the process
+  sqlite  a SQLite database at STATE_SQLITE_PATH, one table for all stores
+
+Queries support the filter (EQ, NEQ, GT, GTE, LT, LTE, IN, AND, OR), sort
+and page subset of the Dapr state query API that the PostgreSQL store
+supports. The page token is the offset of the next page, as with
+PostgreSQL.
+"""
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+
+import grpc
+from dapr.aio.clients import DaprClient
+from dapr.clients.exceptions import DaprGrpcError, DaprInternalError
+from dapr.clients.grpc._request import TransactionalStateOperation, TransactionOperationType
+from dapr.clients.grpc._response import (
+    BulkStateItem, BulkStatesResponse, DaprResponse, QueryResponse, QueryResponseItem, StateResponse
+)
+from dapr.clients.grpc._helpers import to_bytes
+from dapr.clients.grpc._state import StateOptions, Concurrency
+from dapr.proto import api_v1, common_v1
+
+from .codec import decode_value
+
+# State backend used by DaprStateStore: dapr, memory or sqlite
+STATE_BACKEND = os.getenv("STATE_BACKEND", "dapr")
+
+# Database file of the sqlite backend; ":memory:" keeps it in the process
+SQLITE_PATH = os.getenv("STATE_SQLITE_PATH", ":memory:")
+
+_COMPARISONS = {
+    "EQ": lambda value, operand: value == operand,
+    "NEQ": lambda value, operand: value != operand,
+    "GT": lambda value, operand: value > operand,
+    "GTE": lambda value, operand: value >= operand,
+    "LT": lambda value, operand: value < operand,
+    "LTE": lambda value, operand: value <= operand,
+    "IN": lambda value, operand: value in operand,
+}
+
+_SQL_COMPARISONS = {"EQ": "=", "NEQ": "!=", "GT": ">", "GTE": ">=", "LT": "<", "LTE": "<="}
+
+# Clients handed out by create_state_client, so all stores in a process share the data
+_clients: Dict[Tuple[str, str], Any] = {}
+
+
+def create_state_client(backend: str = STATE_BACKEND):
+    """
+    Return the client DaprStateStore should use for backend.
+
+    A new DaprClient is created per call. The memory and sqlite clients are
+    shared by all callers in the process, like a sidecar shared by its app.
+    """
+    if backend == "dapr":
+        return SidecarStateClient()
+    if backend == "memory":
+        key = (backend, "")
+        if key not in _clients:
+            _clients[key] = MemoryStateClient()
+        return _clients[key]
+    if backend == "sqlite":
+        key = (backend, SQLITE_PATH)
+        if key not in _clients:
+            _clients[key] = SqliteStateClient(SQLITE_PATH)
+        return _clients[key]
+    raise ValueError(f"Unknown STATE_BACKEND '{backend}'. Supported: dapr, memory, sqlite")
+
+
+def _rpc_error(code: grpc.StatusCode, details: str) -> grpc.aio.AioRpcError:
+    return grpc.aio.AioRpcError(code, grpc.aio.Metadata(), grpc.aio.Metadata(), details=details)
+
+
+def _aborted(details: str) -> grpc.aio.AioRpcError:
+    """The error the sidecar returns for a failed ETag or first-write check."""
+    return _rpc_error(grpc.StatusCode.ABORTED, details)
+
+
+def _unsupported(operator: str) -> grpc.aio.AioRpcError:
+    """The error the sidecar returns for a query filter it cannot run."""
+    return _rpc_error(grpc.StatusCode.INVALID_ARGUMENT, f"failed query in state store: unsupported operator '{operator}'")
+
+
+@contextmanager
+def _client_errors():
+    """Raise sidecar errors as DaprClient's state calls other than save_state do."""
+    try:
+        yield
+    except grpc.aio.AioRpcError as error:
+        raise DaprGrpcError(error) from error
+
+
+@contextmanager
+def _save_state_errors():
+    """Raise sidecar errors as DaprClient.save_state does, keeping only the details."""
+    try:
+        yield
+    except grpc.aio.AioRpcError as error:
+        raise DaprInternalError(error.details()) from error
+
+
+def _is_first_write(options: Optional[StateOptions]) -> bool:
+    return options is not None and options.concurrency == Concurrency.first_write
+
+
+def _options(operation: TransactionalStateOperation) -> Optional[StateOptions]:
+    """StateOptions of a transaction operation; only StateOperations have them."""
+    return getattr(operation, "options", None)
+
+
+def _as_text(data: Union[bytes, str]) -> str:
+    return data.decode("utf-8") if isinstance(data, bytes) else data
+
+
+def _field(value: Any, path: str) -> Any:
+    """Value of a dotted field path in a decoded item, or None if absent."""
+    for name in path.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(name)
+    return value
+
+
+def _matches(value: Any, query_filter: Dict[str, Any]) -> bool:
+    """Whether a decoded item satisfies a Dapr state query filter."""
+    if not query_filter:
+        return True
+    (operator, operand), = query_filter.items()
+    if operator == "AND":
+        return all(_matches(value, condition) for condition in operand)
+    if operator == "OR":
+        return any(_matches(value, condition) for condition in operand)
+    (path, expected), = operand.items()
+    actual = _field(value, path)
+    if actual is None:
+        return False
+    if operator not in _COMPARISONS:
+        raise _unsupported(operator)
+    try:
+        return _COMPARISONS[operator](actual, expected)
+    except TypeError:
+        return False
+
+
+def _sort_key(value: Any, path: str) -> tuple:
+    """Sort key that puts missing fields last in ascending and first in descending order, as PostgreSQL does."""
+    field = _field(value, path)
+    return (field is None, field if field is not None else 0)
+
+
+def _page(query: Dict[str, Any]) -> Tuple[int, Optional[int]]:
+    """Offset and limit of a query's page; no limit returns everything."""
+    page = query.get("page") or {}
+    offset = int(page.get("token") or 0)
+    return offset, page.get("limit") or None
+
+
+def _query_response(rows: List[Tuple[str, str, str]], offset: int, limit: Optional[int]) -> QueryResponse:
+    token = str(offset + len(rows)) if limit and len(rows) == limit else ""
+    return QueryResponse(
+        results=[QueryResponseItem(key=key, value=value.encode("utf-8"), etag=etag) for key, value, etag in rows],
+        token=token
+    )
+
+
+class StateOperation(TransactionalStateOperation):
+    """A state transaction operation with StateOptions, such as first-write concurrency."""
+
+    def __init__(self, key: str, data: Optional[Union[bytes, str]] = None, etag: Optional[str] = None,
+                 operation_type: TransactionOperationType = TransactionOperationType.upsert,
+                 options: Optional[StateOptions] = None):
+        super().__init__(key, data, etag, operation_type)
+        self.options = options
+
+
+class SidecarStateClient(DaprClient):
+    """DaprClient whose state transactions send the StateOptions of StateOperations."""
+
+    async def execute_state_transaction(self, store_name: str, operations: Sequence[TransactionalStateOperation],
+                                        transactional_metadata: Optional[Dict[str, str]] = None,
+                                        **kwargs) -> DaprResponse:
+        request = api_v1.ExecuteStateTransactionRequest(
+            storeName=store_name,
+            operations=[
+                api_v1.TransactionalStateOperation(
+                    operationType=operation.operation_type.value,
+                    request=common_v1.StateItem(
+                        key=operation.key,
+                        # The SDK fails to encode the missing value of a delete
+                        value=to_bytes(operation.data) if operation.data is not None else b"",
+                        etag=common_v1.Etag(value=operation.etag) if operation.etag is not None else None,
+                        options=operation.options.get_proto() if _options(operation) else None,
+                    ),
+                )
+                for operation in operations
+            ],
+            metadata=transactional_metadata or {},
+        )
+        with _client_errors():
+            call = self._stub.ExecuteStateTransaction(request)
+            await call
+        return DaprResponse(headers=await call.initial_metadata())
+
+
+class MemoryStateClient:
+    """State API stand-in keeping each store's items in a dict, for the memory backend."""
+
+    def __init__(self):
+        self._stores: Dict[str, Dict[str, Tuple[str, str]]] = {}
+        self._version = 0
+
+    def _items(self, store_name: str) -> Dict[str, Tuple[str, str]]:
+        return self._stores.setdefault(store_name, {})
+
+    def _next_etag(self) -> str:
+        self._version += 1
+        return str(self._version)
+
+    def _check(self, items: Dict[str, Tuple[str, str]], key: str, etag: Optional[str], first_write: bool) -> None:
+        if etag:
+            if key not in items or items[key][1] != etag:
+                raise _aborted(f"possible etag mismatch. error from state store: key '{key}'")
+        elif first_write and key in items:
+            raise _aborted(f"possible etag mismatch. error from state store: key '{key}' exists")
+
+    async def close(self) -> None:
+        """Keep the data; other stores in the process may still use it."""
+
+    async def get_state(self, store_name: str, key: str, **kwargs) -> StateResponse:
+        value, etag = self._items(store_name).get(key, ("", ""))
+        return StateResponse(data=value.encode("utf-8"), etag=etag)
+
+    async def get_bulk_state(self, store_name: str, keys: Sequence[str], parallelism: int = 1,
+                             **kwargs) -> BulkStatesResponse:
+        items = self._items(store_name)
+        return BulkStatesResponse(items=[
+            BulkStateItem(key=key, data=items.get(key, ("", ""))[0].encode("utf-8"), etag=items.get(key, ("", ""))[1])
+            for key in keys
+        ])
+
+    async def save_state(self, store_name: str, key: str, value: Union[bytes, str], etag: Optional[str] = None,
+                         options: Optional[StateOptions] = None, **kwargs) -> DaprResponse:
+        items = self._items(store_name)
+        with _save_state_errors():
+            self._check(items, key, etag, _is_first_write(options))
+        items[key] = (_as_text(value), self._next_etag())
+        return DaprResponse()
+
+    async def delete_state(self, store_name: str, key: str, etag: Optional[str] = None,
+                           options: Optional[StateOptions] = None, **kwargs) -> DaprResponse:
+        items = self._items(store_name)
+        if etag:
+            with _client_errors():
+                self._check(items, key, etag, False)
+        items.pop(key, None)
+        return DaprResponse()
+
+    async def execute_state_transaction(self, store_name: str, operations: Sequence[TransactionalStateOperation],
+                                        **kwargs) -> DaprResponse:
+        items = self._items(store_name)
+        # Check every ETag and first write before applying anything, so the transaction is all or nothing
+        with _client_errors():
+            for operation in operations:
+                self._check(items, operation.key, operation.etag, _is_first_write(_options(operation)))
+        for operation in operations:
+            if operation.operation_type == TransactionOperationType.delete:
+                items.pop(operation.key, None)
+            else:
+                items[operation.key] = (_as_text(operation.data), self._next_etag())
+        return DaprResponse()
+
+    async def query_state(self, store_name: str, query: str, **kwargs) -> QueryResponse:
+        query = json.loads(query)
+        rows = []
+        with _client_errors():
+            for key, (value, etag) in sorted(self._items(store_name).items()):
+                decoded = decode_value(value)
+                if _matches(decoded, query.get("filter")):
+                    rows.append((key, value, etag, decoded))
+
+        # Stable sorts applied from the last key to the first give a multi-key sort
+        for sort in reversed(query.get("sort") or []):
+            descending = sort.get("order", "ASC").upper() == "DESC"
+            rows.sort(key=lambda row: _sort_key(row[3], sort["key"]), reverse=descending)
+
+        offset, limit = _page(query)
+        rows = rows[offset:offset + limit if limit else None]
+        return _query_response([row[:3] for row in rows], offset, limit)
+
+
+class SqliteStateClient:
+    """
+    State API stand-in backed by SQLite, for the sqlite backend.
+
+    Items of all stores live in one table keyed by store name and key, with
+    an integer ETag bumped on every write. Queries are compiled to SQL over
+    json_extract. Calls run synchronously on the event loop, so each one,
+    transactions included, is atomic with respect to the others.
+    """
+
+    def __init__(self, path: str):
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS state ("
+            "store TEXT NOT NULL, key TEXT NOT NULL, value TEXT NOT NULL, etag INTEGER NOT NULL, "
+            "PRIMARY KEY (store, key))"
+        )
+
+    def _etag(self, store_name: str, key: str) -> Optional[str]:
+        row = self.connection.execute(
+            "SELECT etag FROM state WHERE store = ? AND key = ?", (store_name, key)
+        ).fetchone()
+        return str(row[0]) if row else None
+
+    def _check(self, store_name: str, key: str, etag: Optional[str], first_write: bool) -> None:
+        current = self._etag(store_name, key)
+        if etag:
+            if current != etag:
+                raise _aborted(f"possible etag mismatch. error from state store: key '{key}'")
+        elif first_write and current is not None:
+            raise _aborted(f"possible etag mismatch. error from state store: key '{key}' exists")
+
+    def _upsert(self, store_name: str, key: str, value: Union[bytes, str]) -> None:
+        self.connection.execute(
+            "INSERT INTO state (store, key, value, etag) VALUES (?, ?, ?, 1) "
+            "ON CONFLICT (store, key) DO UPDATE SET value = excluded.value, etag = state.etag + 1",
+            (store_name, key, _as_text(value))
+        )
+
+    def _delete(self, store_name: str, key: str) -> None:
+        self.connection.execute("DELETE FROM state WHERE store = ? AND key = ?", (store_name, key))
+
+    async def close(self) -> None:
+        """Keep the connection; other stores in the process may still use it."""
+
+    async def get_state(self, store_name: str, key: str, **kwargs) -> StateResponse:
+        row = self.connection.execute(
+            "SELECT value, etag FROM state WHERE store = ? AND key = ?", (store_name, key)
+        ).fetchone()
+        return StateResponse(data=row[0].encode("utf-8"), etag=str(row[1])) if row else StateResponse(data=b"")
+
+    async def get_bulk_state(self, store_name: str, keys: Sequence[str], parallelism: int = 1,
+                             **kwargs) -> BulkStatesResponse:
+        keys = list(keys)
+        found = {}
+        # Stay below SQLite's limit on bound parameters
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            found.update(
+                (key, (value, str(etag))) for key, value, etag in self.connection.execute(
+                    f"SELECT key, value, etag FROM state WHERE store = ? AND key IN ({', '.join('?' * len(chunk))})",
+                    (store_name, *chunk)
+                )
+            )
+        return BulkStatesResponse(items=[
+            BulkStateItem(key=key, data=found.get(key, ("", ""))[0].encode("utf-8"), etag=found.get(key, ("", ""))[1])
+            for key in keys
+        ])
+
+    async def save_state(self, store_name: str, key: str, value: Union[bytes, str], etag: Optional[str] = None,
+                         options: Optional[StateOptions] = None, **kwargs) -> DaprResponse:
+        self.connection.execute("BEGIN")
+        try:
+            with _save_state_errors():
+                self._check(store_name, key, etag, _is_first_write(options))
+            self._upsert(store_name, key, value)
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return DaprResponse()
+
+    async def delete_state(self, store_name: str, key: str, etag: Optional[str] = None,
+                           options: Optional[StateOptions] = None, **kwargs) -> DaprResponse:
+        self.connection.execute("BEGIN")
+        try:
+            if etag:
+                with _client_errors():
+                    self._check(store_name, key, etag, False)
+            self._delete(store_name, key)
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return DaprResponse()
+
+    async def execute_state_transaction(self, store_name: str, operations: Sequence[TransactionalStateOperation],
+                                        **kwargs) -> DaprResponse:
+        self.connection.execute("BEGIN")
+        try:
+            for operation in operations:
+                with _client_errors():
+                    self._check(store_name, operation.key, operation.etag, _is_first_write(_options(operation)))
+                if operation.operation_type == TransactionOperationType.delete:
+                    self._delete(store_name, operation.key)
+                else:
+                    self._upsert(store_name, operation.key, operation.data)
+            self.connection.execute("COMMIT")
+        except Exception:
+            self.connection.execute("ROLLBACK")
+            raise
+        return DaprResponse()
+
+    def _where(self, query_filter: Dict[str, Any], params: list) -> str:
+        """Compile a Dapr state query filter to a SQL condition, appending its parameters."""
+        if not query_filter:
+            return "1"
+        (operator, operand), = query_filter.items()
+        if operator in ("AND", "OR"):
+            return "(" + f" {operator} ".join(self._where(condition, params) for condition in operand) + ")"
+        if operator != "IN" and operator not in _SQL_COMPARISONS:
+            raise _unsupported(operator)
+        (path, expected), = operand.items()
+        params.append(f"$.{path}")
+        if operator == "IN":
+            params.extend(expected)
+            return f"json_extract(value, ?) IN ({', '.join('?' * len(expected))})"
+        params.append(expected)
+        return f"json_extract(value, ?) {_SQL_COMPARISONS[operator]} ?"
+
+    async def query_state(self, store_name: str, query: str, **kwargs) -> QueryResponse:
+        query = json.loads(query)
+        params = [store_name]
+        with _client_errors():
+            sql = f"SELECT key, value, etag FROM state WHERE store = ? AND {self._where(query.get('filter'), params)}"
+
+        order = []
+        for sort in query.get("sort") or []:
+            direction = "DESC NULLS FIRST" if sort.get("order", "ASC").upper() == "DESC" else "ASC NULLS LAST"
+            order.append(f"json_extract(value, ?) {direction}")
+            params.append(f"$.{sort['key']}")
+        sql += " ORDER BY " + ", ".join(order + ["key"])
+
+        offset, limit = _page(query)
+        sql += " LIMIT ? OFFSET ?"
+        params.extend([limit or -1, offset])
+
+        rows = [(key, value, str(etag)) for key, value, etag in self.connection.execute(sql, params)]
+        return _query_response(rows, offset, limit)
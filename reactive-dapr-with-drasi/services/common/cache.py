@@ -0,0 +1,79 @@
+import os
+import time
+from collections import OrderedDict
+from typing import Iterable, NamedTuple, Optional
+
+from .metrics import StoreMetrics
+
+# Maximum number of items held by the read-through cache; 0 disables it
+CACHE_SIZE = int(os.getenv("STATE_CACHE_SIZE", "0"))
+
+# Seconds a cached item is served without asking the sidecar
+CACHE_TTL_SECONDS = float(os.getenv("STATE_CACHE_TTL_SECONDS", "5"))
+
+
+class CacheEntry(NamedTuple):
+    data: dict
+    etag: Optional[str]
+    expires_at: float
+
+    @property
+    def fresh(self) -> bool:
+        return time.monotonic() < self.expires_at
+
+
+class ItemCache:
+    """
+    Size- and TTL-bounded LRU cache of decoded state store items.
+
+    Fresh entries are served without a sidecar call. Expired entries are
+    kept until evicted so that a refetch returning the same ETag can reuse
+    the already-decoded item. Writes through the owning store invalidate
+    their keys; writes from other replicas or from Drasi are only picked up
+    once the TTL expires.
+
+    Cached items are shared between callers and must not be mutated.
+    """
+
+    def __init__(self, max_items: int, ttl_seconds: float, metrics: Optional[StoreMetrics] = None):
+        self.max_items = max_items
+        self.ttl_seconds = ttl_seconds
+        self.metrics = metrics
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # Bumped on every invalidation so reads that raced a write do not refill stale data
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry for key, fresh or expired, marking it recently used."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: str, data: dict, etag: Optional[str], version: int) -> None:
+        """
+        Cache data for key if nothing was invalidated since version was read.
+
+        Args:
+            key: Item key
+            data: Decoded item
+            etag: ETag returned with the item
+            version: Value of self.version before the sidecar read started
+        """
+        if version != self.version:
+            return
+        self._entries[key] = CacheEntry(data, etag, time.monotonic() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_items:
+            self._entries.popitem(last=False)
+            if self.metrics:
+                self.metrics.increment("cache_evictions")
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        """Drop keys that were written or deleted."""
+        self.version += 1
+        for key in keys:
+            self._entries.pop(key, None)
@@ -0,0 +1,50 @@
+import binascii
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+
+    _loads = orjson.loads
+    _dumps = orjson.dumps
+except ImportError:  # orjson is optional; the standard library parser is used without it
+    _loads = json.loads
+
+    def _dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+# Leading bytes of base64-encoded JSON objects ('{"' -> 'eyJ') and arrays ('[' -> 'W')
+_BASE64_JSON_PREFIXES = (b'"ey', b'"W')
+
+_WHITESPACE = b' \t\r\n'
+
+
+def decode_value(raw: Union[bytes, str]) -> Any:
+    """
+    Decode a state value in a single pass.
+
+    Values are JSON. Some writers (such as the Drasi sync reaction) store a
+    base64-encoded JSON document instead, which arrives as a JSON string.
+    The encoding is detected from the first bytes rather than by trying one
+    decoder and catching the failure: a JSON string whose content starts
+    like base64-encoded JSON is unwrapped, anything else is parsed once.
+    A string that only looks like base64 JSON is returned unchanged.
+    """
+    if isinstance(raw, str):
+        raw = raw.encode('utf-8')
+    raw = raw.strip(_WHITESPACE)
+
+    if raw.startswith(_BASE64_JSON_PREFIXES) and raw.endswith(b'"'):
+        try:
+            # Base64 has no characters that need JSON escaping, so the quoted
+            # content can be decoded directly without parsing the string first
+            return _loads(binascii.a2b_base64(raw[1:-1]))
+        except (binascii.Error, ValueError):
+            pass
+
+    return _loads(raw)
+
+
+def encode_json(obj: Any) -> bytes:
+    """Serialize plain dicts, lists and scalars to compact UTF-8 JSON bytes."""
+    return _dumps(obj)
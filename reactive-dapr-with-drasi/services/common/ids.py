@@ -0,0 +1,99 @@
+import asyncio
+import logging
+import os
+import random
+from typing import List
+
+from .state import DaprStateStore, ETagMismatchError, META_KEY_PREFIX
+
+logger = logging.getLogger(__name__)
+
+# First ID handed out by a fresh counter. Earlier releases picked random IDs
+# below 1,000,000, so allocated IDs can never collide with those.
+FIRST_ALLOCATED_ID = int(os.getenv("ID_ALLOCATOR_START", "1000000"))
+
+# Number of IDs leased from the shared counter at a time
+ID_BLOCK_SIZE = int(os.getenv("ID_ALLOCATOR_BLOCK_SIZE", "100"))
+
+# Attempts at an ETag-guarded counter increment before giving up
+MAX_ATTEMPTS = int(os.getenv("ID_ALLOCATOR_MAX_ATTEMPTS", "10"))
+
+# Base delay in seconds for the jittered exponential backoff between attempts
+RETRY_BASE_DELAY = float(os.getenv("ID_ALLOCATOR_RETRY_DELAY", "0.005"))
+
+
+class IdAllocationError(Exception):
+    """Raised when every attempt to lease a block of IDs lost the ETag race."""
+
+
+class IdAllocator:
+    """
+    Hands out unique integer IDs without probing the store for free keys.
+
+    IDs are leased in blocks from a counter item in the service's own state
+    store. A lease reads the counter with its ETag and writes it back
+    advanced by the block size only if the ETag is unchanged, so replicas
+    never receive overlapping blocks. IDs are then handed out from the
+    local block with no sidecar call, one lease per ID_BLOCK_SIZE creates.
+
+    IDs left in a block when the worker stops are never used, so the IDs
+    are unique and increasing per worker but not gap-free.
+    """
+
+    def __init__(self, store: DaprStateStore, block_size: int = ID_BLOCK_SIZE, first_id: int = FIRST_ALLOCATED_ID):
+        self.store = store
+        self.block_size = block_size
+        self.first_id = first_id
+        self.key = f"{META_KEY_PREFIX}next-id"
+        self._next = 0
+        self._end = 0
+        self._lock = asyncio.Lock()
+
+    async def next_id(self) -> int:
+        """Return one unused ID."""
+        ids = await self.allocate(1)
+        return ids[0]
+
+    async def allocate(self, count: int) -> List[int]:
+        """
+        Return count unused IDs, leasing more blocks from the counter as needed.
+
+        Raises:
+            IdAllocationError: A lease conflicted with other writers MAX_ATTEMPTS times
+        """
+        async with self._lock:
+            ids = []
+            while len(ids) < count:
+                if self._next >= self._end:
+                    await self._lease(max(self.block_size, count - len(ids)))
+                take = min(count - len(ids), self._end - self._next)
+                ids.extend(range(self._next, self._next + take))
+                self._next += take
+            return ids
+
+    async def _lease(self, size: int) -> None:
+        """Advance the shared counter by size and keep the skipped range as the local block."""
+        for attempt in range(MAX_ATTEMPTS):
+            data, etag = await self.store.get_item_with_etag(self.key)
+            start = data["next_id"] if data else self.first_id
+            counter = {"next_id": start + size}
+
+            if data:
+                try:
+                    await self.store.save_item(self.key, counter, etag=etag)
+                    leased = True
+                except ETagMismatchError:
+                    leased = False
+            else:
+                # First lease for this store; only one of several racing workers creates the counter
+                leased = await self.store.insert_item(self.key, counter)
+
+            if leased:
+                self._next, self._end = start, start + size
+                logger.debug(f"Leased IDs {start}-{start + size - 1} from {self.store.store_name}")
+                return
+
+            logger.debug(f"ID lease on {self.store.store_name} conflicted (attempt {attempt + 1})")
+            await asyncio.sleep(random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt))
+
+        raise IdAllocationError(f"Leasing IDs from {self.store.store_name} conflicted {MAX_ATTEMPTS} times")
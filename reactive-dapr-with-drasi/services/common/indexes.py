@@ -0,0 +1,48 @@
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException, status
+
+
+def with_ids(index: dict, ids: Iterable[int]) -> dict:
+    """Return a copy of an ID index record with ids added, keeping the IDs sorted."""
+    sorted_ids = list(index.get("ids", []))
+    for item_id in ids:
+        position = bisect_left(sorted_ids, item_id)
+        if position == len(sorted_ids) or sorted_ids[position] != item_id:
+            sorted_ids.insert(position, item_id)
+    return {"ids": sorted_ids}
+
+
+def without_ids(index: dict, ids: Iterable[int]) -> dict:
+    """Return a copy of an ID index record with ids removed."""
+    removed = set(ids)
+    return {"ids": [item_id for item_id in index.get("ids", []) if item_id not in removed]}
+
+
+def page_ids(index: dict, limit: Optional[int], cursor: Optional[str]) -> Tuple[List[int], Optional[str]]:
+    """
+    Select one page of IDs from an ID index record.
+
+    Args:
+        index: The index record
+        limit: Maximum number of IDs, or None for all remaining
+        cursor: nextCursor of the previous page (the last ID it held)
+
+    Returns:
+        Tuple of (IDs, nextCursor or None on the last page)
+    """
+    ids = index.get("ids", [])
+    start = 0
+    if cursor:
+        try:
+            start = bisect_right(ids, int(cursor))
+        except ValueError:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Invalid cursor '{cursor}'"
+            )
+    end = len(ids) if limit is None else start + limit
+    page = ids[start:end]
+    next_cursor = str(page[-1]) if page and end < len(ids) else None
+    return page, next_cursor
@@ -0,0 +1,53 @@
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator
+
+
+class StoreMetrics:
+    """
+    In-process counters for state store access.
+
+    Tracks call count, error count and latency per sidecar operation, plus
+    free-form counters. Values are per worker process and reset on restart.
+    """
+
+    def __init__(self):
+        self._operations: Dict[str, Dict[str, float]] = {}
+        self._counters: Dict[str, int] = {}
+
+    @contextmanager
+    def track(self, operation: str) -> Iterator[None]:
+        """Time the enclosed sidecar call and record it under operation."""
+        stats = self._operations.setdefault(
+            operation, {"calls": 0, "errors": 0, "totalMs": 0.0, "maxMs": 0.0}
+        )
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            stats["errors"] += 1
+            raise
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            stats["calls"] += 1
+            stats["totalMs"] += elapsed
+            stats["maxMs"] = max(stats["maxMs"], elapsed)
+
+    def increment(self, counter: str, amount: int = 1) -> None:
+        """Add amount to a named counter."""
+        self._counters[counter] = self._counters.get(counter, 0) + amount
+
+    def snapshot(self) -> dict:
+        """Return the current values as a JSON-serializable dictionary."""
+        return {
+            "operations": {
+                operation: {
+                    "calls": int(stats["calls"]),
+                    "errors": int(stats["errors"]),
+                    "avgMs": round(stats["totalMs"] / stats["calls"], 3) if stats["calls"] else 0.0,
+                    "maxMs": round(stats["maxMs"], 3),
+                }
+                for operation, stats in self._operations.items()
+            },
+            "counters": dict(self._counters),
+        }
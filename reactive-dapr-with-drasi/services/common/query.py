@@ -0,0 +1,42 @@
+from typing import Any, Dict, Optional
+
+from fastapi import HTTPException, status
+
+
+def build_query(equals: Dict[str, Any], sort_key: Optional[str] = None, descending: bool = False) -> Dict[str, Any]:
+    """
+    Build a Dapr state query that the state store evaluates.
+
+    Args:
+        equals: Stored (snake_case) field name to required value; None values
+            are left out, so optional query parameters can be passed as-is
+        sort_key: Stored field to sort by
+        descending: Sort in descending order
+
+    Returns:
+        Query dictionary with filter and, when sorting, sort
+    """
+    conditions = [{"EQ": {key: value}} for key, value in equals.items() if value is not None]
+    if not conditions:
+        query_filter = {}
+    elif len(conditions) == 1:
+        query_filter = conditions[0]
+    else:
+        query_filter = {"AND": conditions}
+
+    query = {"filter": query_filter}
+    if sort_key:
+        query["sort"] = [{"key": sort_key, "order": "DESC" if descending else "ASC"}]
+    return query
+
+
+def resolve_sort(sort: Optional[str], sort_fields: Dict[str, str]) -> Optional[str]:
+    """Map a camelCase sort parameter to its stored field, rejecting unknown fields with 400."""
+    if sort is None:
+        return None
+    if sort not in sort_fields:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cannot sort by '{sort}'. Supported fields: {', '.join(sort_fields)}"
+        )
+    return sort_fields[sort]
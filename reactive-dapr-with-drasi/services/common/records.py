@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import os
+import random
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from .state import DaprStateStore, ETagMismatchError
+
+logger = logging.getLogger(__name__)
+
+# Attempts at an ETag-guarded record update before giving up
+MAX_ATTEMPTS = int(os.getenv("RECORD_UPDATE_MAX_ATTEMPTS", "10"))
+
+# Base delay in seconds for the jittered exponential backoff between attempts
+RETRY_BASE_DELAY = float(os.getenv("RECORD_UPDATE_RETRY_DELAY", "0.005"))
+
+
+class RecordConflictError(Exception):
+    """Raised when every attempt to update bookkeeping records lost the ETag race."""
+
+
+class Changes(NamedTuple):
+    """Writes produced by a record update, applied in one state transaction."""
+    upserts: Dict[str, dict]
+    deletes: List[str]
+    result: Any = None
+
+
+async def read_records(store: DaprStateStore, keys: Iterable[str],
+                       items: Iterable[str] = ()) -> Dict[str, Tuple[Optional[dict], Optional[str]]]:
+    """
+    Read bookkeeping records (indexes, aggregates) and items with their ETags.
+
+    Everything is read with one bulk get, and nothing is written: a missing
+    record is returned as an empty dict without an ETag, a missing item as
+    (None, None).
+
+    Args:
+        store: State store holding the records and items
+        keys: Record keys
+        items: Item keys to read alongside the records
+
+    Returns:
+        Dictionary of key to (data, etag)
+    """
+    keys = list(keys)
+    items = list(items)
+    found = await store.get_items_with_etags(keys + items)
+    return {
+        **{key: found.get(key, ({}, None)) for key in keys},
+        **{key: found.get(key, (None, None)) for key in items},
+    }
+
+
+async def update_records(store: DaprStateStore, keys: Iterable[str],
+                         apply: Callable[[Dict[str, Optional[dict]]], Changes],
+                         items: Iterable[str] = ()) -> Any:
+    """
+    Update bookkeeping records together with the items they describe.
+
+    Reads the records and items, passes them to apply and writes the
+    returned upserts and deletes in one state transaction. Everything read
+    that is written is guarded: by its ETag if it existed, and with a
+    first-write insert if it did not, so a missing record is only created
+    by a transaction that applies. If another writer changed or created one
+    of them in the meantime, everything is read again and apply is called
+    again, up to MAX_ATTEMPTS times, so apply must not have side effects.
+    Exceptions raised by apply abort the update.
+
+    Args:
+        store: State store holding both the items and the records
+        keys: Keys of the records apply needs
+        apply: Called with key to data, where a new record is an empty dict
+            and a missing item is None, and returning the Changes to write
+        items: Keys of items apply needs
+
+    Returns:
+        The result field of the applied Changes
+
+    Raises:
+        RecordConflictError: All attempts conflicted with other writers
+    """
+    keys = list(keys)
+    items = list(items)
+    for attempt in range(MAX_ATTEMPTS):
+        records = await read_records(store, keys, items)
+        changes = apply({key: data for key, (data, _) in records.items()})
+        if not changes.upserts and not changes.deletes:
+            return changes.result
+
+        written = set(changes.upserts) | set(changes.deletes)
+        etags = {key: etag for key, (_, etag) in records.items() if key in written and etag}
+        inserts = [key for key in changes.upserts if key in records and not records[key][1]]
+        try:
+            await store.transact(changes.upserts, changes.deletes, etags, inserts)
+            return changes.result
+        except ETagMismatchError:
+            logger.debug(f"Record update for {keys} conflicted (attempt {attempt + 1})")
+            await asyncio.sleep(random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt))
+
+    raise RecordConflictError(f"Updating records {keys} conflicted {MAX_ATTEMPTS} times")
+
+
+async def insert_with_records(store: DaprStateStore, key: str, data: dict, keys: Iterable[str],
+                              apply: Callable[[Dict[str, Optional[dict]]], Changes]) -> bool:
+    """
+    Insert a new item and update the bookkeeping records that describe it.
+
+    The item is written as in update_records, in one transaction with the
+    records and with a first-write insert, so of several concurrent creates
+    of one key exactly one goes ahead, and the others get False without
+    touching the records. If apply raises, nothing is written.
+
+    Args:
+        store: State store holding both the item and the records
+        key: Key of the new item
+        data: Item to insert
+        keys: Keys of the records apply needs
+        apply: Called with record key to data, where a new record is an
+            empty dict, and returning the Changes to the records
+
+    Returns:
+        True if the item was inserted, False if the key already existed
+    """
+    def apply_with_item(records: Dict[str, Optional[dict]]) -> Changes:
+        if records.pop(key) is not None:
+            return Changes({}, [], False)
+        changes = apply(records)
+        return Changes({key: data, **changes.upserts}, changes.deletes, True)
+
+    return await update_records(store, keys, apply_with_item, items=[key])
@@ -0,0 +1,165 @@
+import gzip
+import hashlib
+from typing import Any, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import Response
+
+from .codec import encode_json
+
+try:
+    import brotli
+except ImportError:  # brotli is optional; responses are only gzip-compressed without it
+    brotli = None
+
+# Bodies smaller than this are always sent uncompressed
+MIN_COMPRESS_SIZE = 1024
+
+# Content codings a client can be sent, most preferred first
+ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+
+def json_response(content: Any, status_code: int = 200) -> Response:
+    """
+    Return already-shaped content as a JSON response.
+
+    FastAPI passes a returned Response through untouched, so the endpoint's
+    response_model is only used for the OpenAPI schema and no pydantic
+    validation or serialization happens for the body.
+    """
+    return Response(content=encode_json(content), status_code=status_code, media_type="application/json")
+
+
+def _body_etag(body: bytes) -> str:
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def _matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Whether an If-None-Match header matches etag (weak comparison, as RFC 9110 requires for GET)."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def conditional_response(request: Request, content: Any, etag: Optional[str] = None) -> Response:
+    """
+    Return content as a JSON response with an ETag, or 304 if the client already has it.
+
+    Args:
+        request: Incoming request, checked for If-None-Match
+        content: Response body before serialization
+        etag: State store ETag of the item the body was built from. When
+            given, a matching request is answered without serializing the
+            body; otherwise the ETag is a hash of the serialized body.
+    """
+    body = None
+    if etag:
+        etag = f'"{etag}"'
+    else:
+        body = encode_json(content)
+        etag = _body_etag(body)
+
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    if body is None:
+        body = encode_json(content)
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
+
+
+def list_content(items: list, next_cursor: Optional[str]) -> dict:
+    """Build a list endpoint body: {items, total, nextCursor}."""
+    return {
+        "items": items,
+        "total": len(items),
+        "nextCursor": next_cursor or None
+    }
+
+
+def list_response(items: list, next_cursor: Optional[str], request: Optional[Request] = None) -> Response:
+    """
+    Return a list endpoint body (see list_content) as a JSON response.
+
+    When request is given, the response carries a content-hash ETag and
+    If-None-Match is honoured (see conditional_response).
+    """
+    content = list_content(items, next_cursor)
+    if request is None:
+        return json_response(content)
+    return conditional_response(request, content)
+
+
+def ndjson_line(item: Any) -> bytes:
+    """Serialize one item of a streamed NDJSON response."""
+    return encode_json(item) + b"\n"
+
+
+class EncodedBody:
+    """
+    A serialized JSON body with its ETag and compressed variants.
+
+    Each compressed variant is made the first time a client asks for it and
+    kept, so a cached EncodedBody answers later requests without
+    serializing or compressing anything.
+    """
+
+    def __init__(self, content: Any):
+        self.body = encode_json(content)
+        self.etag = _body_etag(self.body)
+        self._variants: Dict[str, bytes] = {}
+
+    def variant(self, encoding: str) -> bytes:
+        """Return the body in a content coding from ENCODINGS."""
+        data = self._variants.get(encoding)
+        if data is None:
+            if encoding == "br":
+                data = brotli.compress(self.body, quality=5)
+            else:
+                data = gzip.compress(self.body, compresslevel=6, mtime=0)
+            self._variants[encoding] = data
+        return data
+
+
+def _accepted_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """Pick the content coding to send for an Accept-Encoding header, or None for the plain body."""
+    if not accept_encoding:
+        return None
+    weights = {}
+    for entry in accept_encoding.split(","):
+        coding, _, parameters = entry.strip().partition(";")
+        weight = 1.0
+        parameter = parameters.strip()
+        if parameter.startswith("q="):
+            try:
+                weight = float(parameter[2:])
+            except ValueError:
+                continue
+        weights[coding.strip().lower()] = weight
+    candidates = [
+        (weights.get(encoding, weights.get("*", 0.0)), -rank, encoding)
+        for rank, encoding in enumerate(ENCODINGS)
+    ]
+    weight, _, encoding = max(candidates)
+    return encoding if weight > 0 else None
+
+
+def encoded_response(request: Request, body: EncodedBody) -> Response:
+    """
+    Return a prepared body, compressed as the client's Accept-Encoding allows, or 304 if it has it.
+
+    Compressed variants get their own ETag (the body's with the coding
+    appended), as different representations must not share a strong ETag.
+    """
+    encoding = _accepted_encoding(request.headers.get("accept-encoding")) if len(body.body) >= MIN_COMPRESS_SIZE else None
+    etag = body.etag if encoding is None else f'{body.etag[:-1]}-{encoding}"'
+    headers = {"ETag": etag, "Vary": "Accept-Encoding"}
+    if _matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    if encoding is None:
+        return Response(content=body.body, media_type="application/json", headers=headers)
+    headers["Content-Encoding"] = encoding
+    return Response(content=body.variant(encoding), media_type="application/json", headers=headers)
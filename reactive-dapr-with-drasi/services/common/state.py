@@ -0,0 +1,487 @@
+import asyncio
+import json
+import logging
+import os
+from typing import Optional, Any, List, Dict, Iterable, Iterator, AsyncIterator
+
+import grpc
+from dapr.clients.exceptions import DaprInternalError
+from dapr.clients.grpc._request import TransactionalStateOperation, TransactionOperationType
+from dapr.clients.grpc._state import StateOptions, Concurrency
+
+from .backends import STATE_BACKEND, StateOperation, create_state_client
+from .cache import ItemCache, CACHE_SIZE, CACHE_TTL_SECONDS
+from .codec import decode_value
+from .metrics import StoreMetrics
+
+logger = logging.getLogger(__name__)
+
+# Maximum number of keys sent to the sidecar in one bulk get or state transaction
+BULK_CHUNK_SIZE = int(os.getenv("DAPR_BULK_CHUNK_SIZE", "500"))
+
+# Number of items requested per page when iterating over a query
+QUERY_PAGE_SIZE = int(os.getenv("DAPR_QUERY_PAGE_SIZE", "500"))
+
+# Number of keys the sidecar fetches in parallel for stores without native bulk get
+BULK_GET_PARALLELISM = int(os.getenv("DAPR_BULK_GET_PARALLELISM", "10"))
+
+# Keys starting with this prefix hold service bookkeeping (counters, indexes)
+# rather than items, and are left out of query results
+META_KEY_PREFIX = "_meta:"
+
+
+class ETagMismatchError(Exception):
+    """Raised when a write's ETag no longer matches the stored item."""
+
+
+def _sidecar_error(error: Exception) -> tuple[Optional[grpc.StatusCode], str]:
+    """
+    Status code and lowercase details of a sidecar error, or (None, "") if it is not one.
+
+    The asyncio DaprClient wraps sidecar errors: save_state raises a
+    DaprInternalError holding only the details (raised from the gRPC
+    error), the other state calls a DaprGrpcError, which is an RpcError.
+    """
+    if isinstance(error, DaprInternalError):
+        if isinstance(error.__cause__, grpc.RpcError):
+            return _sidecar_error(error.__cause__)
+        return None, str(error.as_dict().get("message") or "").lower()
+    if isinstance(error, grpc.RpcError):
+        return error.code(), str(error.details()).lower()
+    return None, ""
+
+
+def _is_etag_mismatch(error: Exception) -> bool:
+    """Whether a sidecar error reports a failed ETag check."""
+    code, details = _sidecar_error(error)
+    # Covers "possible etag mismatch", which is how the PostgreSQL store words it
+    return code == grpc.StatusCode.ABORTED or "etag mismatch" in details
+
+
+def _is_insert_conflict(error: Exception) -> bool:
+    """Whether a sidecar error reports that a first-write insert found an existing key."""
+    if _is_etag_mismatch(error):
+        return True
+    # The PostgreSQL store reports a first-write insert that matched no row this way
+    _, details = _sidecar_error(error)
+    return "no item was updated" in details or "duplicate key" in details
+
+
+def with_item_filter(query_filter: Dict[str, Any], id_field: str) -> Dict[str, Any]:
+    """
+    Restrict a state query filter to items, leaving out bookkeeping records.
+
+    The query API cannot test keys or whether a field exists, so the filter
+    requires the numeric ID field every item has and no bookkeeping record
+    has: any number is either at least 0 or below 0, while a missing field
+    matches neither.
+    """
+    has_id = {"OR": [{"GTE": {id_field: 0}}, {"LT": {id_field: 0}}]}
+    return {"AND": [query_filter, has_id]} if query_filter else has_id
+
+
+def is_meta_key(key: str) -> bool:
+    """Whether a state key holds bookkeeping rather than an item (see META_KEY_PREFIX)."""
+    return key.startswith(META_KEY_PREFIX)
+
+
+def _chunks(keys: Iterable[str], size: int) -> Iterator[List[str]]:
+    """Split keys into lists of at most size elements."""
+    chunk = []
+    for key in keys:
+        chunk.append(key)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+class DaprStateStore:
+    """
+    Async access to a Dapr state store.
+
+    Uses the asyncio Dapr client so that sidecar round trips are awaited
+    instead of blocking the event loop. A single gRPC channel is shared by
+    all concurrent requests in the worker (HTTP/2 multiplexes the calls).
+
+    Services subclass this in their dapr_client.py to set
+    default_store_name; DAPR_STORE_NAME overrides it at runtime.
+
+    Point reads can go through an in-process read-through cache (see
+    ItemCache), enabled by setting STATE_CACHE_SIZE above zero.
+
+    STATE_BACKEND=memory or sqlite replaces the sidecar with an in-process
+    stand-in (see common.backends), for profiling and load tests.
+    """
+
+    default_store_name: Optional[str] = None
+
+    # Numeric ID field of every item in the store. When set, queries leave
+    # out bookkeeping records in the state store (see with_item_filter), so
+    # they do not take up page slots; otherwise they are dropped afterwards.
+    id_field: Optional[str] = None
+
+    def __init__(self, store_name: Optional[str] = None, cache_size: int = CACHE_SIZE,
+                 cache_ttl_seconds: float = CACHE_TTL_SECONDS, backend: str = STATE_BACKEND):
+        self.store_name = store_name or os.getenv("DAPR_STORE_NAME", self.default_store_name)
+        if not self.store_name:
+            raise ValueError("No state store name given and DAPR_STORE_NAME is not set")
+        self.metrics = StoreMetrics()
+        self.cache = ItemCache(cache_size, cache_ttl_seconds, self.metrics) if cache_size > 0 else None
+        self.client = create_state_client(backend)
+        logger.info(f"Initialized {backend} state store client for store: {self.store_name}")
+
+    async def close(self) -> None:
+        """Close the underlying gRPC channel."""
+        await self.client.close()
+        logger.info(f"Closed Dapr state store client for store: {self.store_name}")
+
+    async def get_item(self, key: str) -> Optional[dict]:
+        """Get an item from the state store."""
+        data, _ = await self.get_item_with_etag(key)
+        return data
+
+    async def get_item_with_etag(self, key: str) -> tuple[Optional[dict], Optional[str]]:
+        """Get an item and its ETag, from the cache when a fresh entry exists."""
+        cached = None
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None and cached.fresh:
+                self.metrics.increment("cache_hits")
+                return cached.data, cached.etag
+            self.metrics.increment("cache_misses")
+            version = self.cache.version
+
+        try:
+            with self.metrics.track("get"):
+                response = await self.client.get_state(
+                    store_name=self.store_name,
+                    key=key
+                )
+
+            if response.data:
+                logger.debug(f"Retrieved item with key '{key}' and etag '{response.etag}'")
+                data = self._decode_cached(key, response.data, response.etag, cached)
+                if self.cache is not None:
+                    self.cache.put(key, data, response.etag, version)
+                return data, response.etag
+            else:
+                logger.debug(f"No item found with key '{key}'")
+                return None, None
+
+        except Exception as e:
+            logger.error(f"Error getting item with key '{key}': {str(e)}")
+            raise
+
+    def _decode_cached(self, key: str, raw: bytes, etag: Optional[str], cached) -> dict:
+        """Decode raw, reusing an expired cache entry's item when the ETag is unchanged."""
+        if cached is not None and etag and cached.etag == etag:
+            self.metrics.increment("cache_revalidated")
+            return cached.data
+        return decode_value(raw)
+
+    def _invalidate(self, keys: List[str]) -> None:
+        if self.cache is not None:
+            self.cache.invalidate(keys)
+
+    async def save_item(self, key: str, data: dict, etag: Optional[str] = None) -> None:
+        """
+        Save an item to the state store.
+
+        Args:
+            key: Item key
+            data: Item to store
+            etag: When given, the write only succeeds if the stored item still
+                has this ETag; otherwise ETagMismatchError is raised
+
+        Raises:
+            ETagMismatchError: The item changed since etag was read
+        """
+        try:
+            with self.metrics.track("save"):
+                await self.client.save_state(
+                    store_name=self.store_name,
+                    key=key,
+                    value=json.dumps(data),
+                    etag=etag,
+                    options=StateOptions(concurrency=Concurrency.first_write) if etag else None
+                )
+            logger.debug(f"Saved item with key '{key}': {data}")
+
+        except Exception as e:
+            if etag and _is_etag_mismatch(e):
+                logger.debug(f"ETag mismatch saving item with key '{key}'")
+                raise ETagMismatchError(key) from e
+            logger.error(f"Error saving item with key '{key}': {str(e)}")
+            raise
+
+        finally:
+            self._invalidate([key])
+
+    async def insert_item(self, key: str, data: dict) -> bool:
+        """
+        Save an item only if the key does not exist yet, in one sidecar call.
+
+        Uses first-write concurrency without an ETag, which the state store
+        turns into an insert that fails on an existing key.
+
+        Returns:
+            True if the item was inserted, False if the key already existed
+        """
+        try:
+            with self.metrics.track("save"):
+                await self.client.save_state(
+                    store_name=self.store_name,
+                    key=key,
+                    value=json.dumps(data),
+                    options=StateOptions(concurrency=Concurrency.first_write)
+                )
+            logger.debug(f"Inserted item with key '{key}': {data}")
+            return True
+
+        except Exception as e:
+            if _is_insert_conflict(e):
+                logger.debug(f"Item with key '{key}' already exists")
+                return False
+            logger.error(f"Error inserting item with key '{key}': {str(e)}")
+            raise
+
+        finally:
+            self._invalidate([key])
+
+    async def delete_item(self, key: str) -> None:
+        """Delete an item from the state store."""
+        try:
+            with self.metrics.track("delete"):
+                await self.client.delete_state(
+                    store_name=self.store_name,
+                    key=key
+                )
+            logger.debug(f"Deleted item with key '{key}'")
+
+        except Exception as e:
+            logger.error(f"Error deleting item with key '{key}': {str(e)}")
+            raise
+
+        finally:
+            self._invalidate([key])
+
+    async def get_items(self, keys: List[str]) -> Dict[str, dict]:
+        """
+        Get several items using the Dapr bulk-get API.
+
+        Keys are sent in chunks of BULK_CHUNK_SIZE, and the chunks are fetched
+        concurrently.
+
+        Args:
+            keys: Keys to fetch
+
+        Returns:
+            Dictionary of key to item, containing only the keys that exist
+        """
+        items = await self.get_items_with_etags(keys)
+        return {key: data for key, (data, _) in items.items()}
+
+    async def get_items_with_etags(self, keys: List[str]) -> Dict[str, tuple[dict, Optional[str]]]:
+        """Get several items and their ETags like get_items, as key to (item, etag)."""
+        items = {}
+        stale = {}
+        if self.cache is not None:
+            missing = []
+            for key in keys:
+                cached = self.cache.get(key)
+                if cached is not None and cached.fresh:
+                    items[key] = cached.data, cached.etag
+                else:
+                    missing.append(key)
+                    if cached is not None:
+                        stale[key] = cached
+            self.metrics.increment("cache_hits", len(items))
+            self.metrics.increment("cache_misses", len(missing))
+            version = self.cache.version
+            keys = missing
+
+        try:
+            with self.metrics.track("bulk_get"):
+                responses = await asyncio.gather(*(
+                    self.client.get_bulk_state(
+                        store_name=self.store_name,
+                        keys=chunk,
+                        parallelism=BULK_GET_PARALLELISM
+                    )
+                    for chunk in _chunks(keys, BULK_CHUNK_SIZE)
+                ))
+
+            for response in responses:
+                for item in response.items:
+                    if item.error:
+                        logger.warning(f"Error getting item with key '{item.key}': {item.error}")
+                    elif item.data:
+                        data = self._decode_cached(item.key, item.data, item.etag, stale.get(item.key))
+                        if self.cache is not None:
+                            self.cache.put(item.key, data, item.etag, version)
+                        items[item.key] = data, item.etag
+
+            logger.debug(f"Bulk get returned {len(items)} items")
+            return items
+
+        except Exception as e:
+            logger.error(f"Error getting {len(keys)} items: {str(e)}")
+            raise
+
+    async def save_items(self, items: Dict[str, dict]) -> None:
+        """
+        Save several items using Dapr state transactions.
+
+        Each chunk of BULK_CHUNK_SIZE items is written atomically; chunks are
+        written one after another, so a failure can leave earlier chunks saved.
+        """
+        operations = [
+            TransactionalStateOperation(key=key, data=json.dumps(data))
+            for key, data in items.items()
+        ]
+        await self._execute_transaction(operations)
+        logger.debug(f"Saved {len(operations)} items")
+
+    async def delete_items(self, keys: List[str]) -> None:
+        """Delete several items using Dapr state transactions (see save_items)."""
+        operations = [
+            TransactionalStateOperation(key=key, operation_type=TransactionOperationType.delete)
+            for key in keys
+        ]
+        await self._execute_transaction(operations)
+        logger.debug(f"Deleted {len(operations)} items")
+
+    async def transact(self, upserts: Dict[str, dict], deletes: Iterable[str] = (),
+                       etags: Optional[Dict[str, str]] = None, inserts: Iterable[str] = ()) -> None:
+        """
+        Apply upserts and deletes atomically in a single state transaction.
+
+        Unlike save_items, the operations are never split into chunks, so
+        either all of them are applied or none is.
+
+        Args:
+            upserts: Key to item to save
+            deletes: Keys to delete
+            etags: ETags the listed keys must still have for the transaction to apply
+            inserts: Keys of upserts that must not exist yet for the transaction
+                to apply (first-write concurrency without an ETag)
+
+        Raises:
+            ETagMismatchError: One of the guarded keys changed since its ETag was
+                read, or one of the inserted keys exists
+        """
+        etags = etags or {}
+        inserts = set(inserts)
+        first_write = StateOptions(concurrency=Concurrency.first_write)
+        operations = [
+            StateOperation(key=key, data=json.dumps(data), etag=etags.get(key),
+                           options=first_write if key in inserts else None)
+            for key, data in upserts.items()
+        ] + [
+            TransactionalStateOperation(key=key, etag=etags.get(key), operation_type=TransactionOperationType.delete)
+            for key in deletes
+        ]
+        try:
+            with self.metrics.track("transaction"):
+                await self.client.execute_state_transaction(
+                    store_name=self.store_name,
+                    operations=operations
+                )
+            logger.debug(f"Applied transaction with {len(operations)} operations")
+
+        except Exception as e:
+            if (etags and _is_etag_mismatch(e)) or (inserts and _is_insert_conflict(e)):
+                logger.debug(f"Concurrency conflict in transaction with {len(operations)} operations")
+                raise ETagMismatchError(list(etags) + sorted(inserts)) from e
+            logger.error(f"Error executing state transaction with {len(operations)} operations: {str(e)}")
+            raise
+
+        finally:
+            self._invalidate([operation.key for operation in operations])
+
+    async def _execute_transaction(self, operations: List[TransactionalStateOperation]) -> None:
+        """Execute operations as state transactions of at most BULK_CHUNK_SIZE operations."""
+        try:
+            for start in range(0, len(operations), BULK_CHUNK_SIZE):
+                with self.metrics.track("transaction"):
+                    await self.client.execute_state_transaction(
+                        store_name=self.store_name,
+                        operations=operations[start:start + BULK_CHUNK_SIZE]
+                    )
+
+        except Exception as e:
+            logger.error(f"Error executing state transaction with {len(operations)} operations: {str(e)}")
+            raise
+
+        finally:
+            self._invalidate([operation.key for operation in operations])
+
+    async def query_items(self, query: Dict[str, Any]) -> tuple[List[Dict[str, Any]], Optional[str]]:
+        """
+        Query items from the state store using Dapr state query API.
+
+        Args:
+            query: Query dictionary with filter, sort, and page options
+
+        Returns:
+            Tuple of (results list, pagination token); bookkeeping keys
+            (see META_KEY_PREFIX) are left out
+        """
+        results, token, _ = await self._query_page(query)
+        return results, token
+
+    async def _query_page(self, query: Dict[str, Any]) -> tuple[List[Dict[str, Any]], Optional[str], int]:
+        """Run one state query, returning the items, the token and how many rows the store returned."""
+        if self.id_field:
+            query = {**query, "filter": with_item_filter(query.get("filter"), self.id_field)}
+        try:
+            query_json = json.dumps(query)
+            logger.debug(f"Executing state query with: {query_json}")
+            with self.metrics.track("query"):
+                response = await self.client.query_state(
+                    store_name=self.store_name,
+                    query=query_json
+                )
+
+            results = []
+            for item in response.results:
+                if is_meta_key(item.key):
+                    continue
+                try:
+                    results.append({
+                        'key': item.key,
+                        'value': decode_value(item.value)
+                    })
+                except Exception as e:
+                    logger.error(f"Failed to parse item with key {item.key}: {e}")
+
+            logger.debug(f"Query completed - returned {len(results)} items, token: {response.token}")
+            return results, response.token, len(response.results)
+
+        except Exception as e:
+            logger.error(f"Error querying state store: {str(e)}")
+            raise
+
+    async def iter_items(self, query: Dict[str, Any], page_size: int = QUERY_PAGE_SIZE) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield query results page by page, following the Dapr pagination token.
+
+        Only one page is held in memory at a time, so callers can stream
+        arbitrarily large result sets.
+
+        Args:
+            query: Query dictionary with filter and sort options (any page is replaced)
+            page_size: Number of items fetched per state query
+        """
+        token = None
+        while True:
+            page = {"limit": page_size}
+            if token:
+                page["token"] = token
+            results, token, returned = await self._query_page({**query, "page": page})
+            for result in results:
+                yield result
+            if not token or returned < page_size:
+                break
@@ -0,0 +1,106 @@
+"""Tests for the in-process state backends, through DaprStateStore as the services use them."""
+import asyncio
+import json
+
+import pytest
+from dapr.clients.exceptions import DaprGrpcError, DaprInternalError
+from dapr.clients.grpc._request import TransactionalStateOperation, TransactionOperationType
+from dapr.clients.grpc._state import StateOptions, Concurrency
+
+from common.backends import MemoryStateClient, SidecarStateClient, SqliteStateClient, StateOperation
+from common.state import DaprStateStore, ETagMismatchError
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def client(request):
+    return MemoryStateClient() if request.param == "memory" else SqliteStateClient(":memory:")
+
+
+@pytest.fixture
+def store(client):
+    store = DaprStateStore(store_name="test-store", cache_size=0, backend="memory")
+    store.client = client
+    return store
+
+
+def test_save_state_conflict_is_raised_as_the_client_does(client):
+    async def scenario():
+        await client.save_state("test-store", "key", json.dumps({"value": 1}))
+        await client.save_state("test-store", "key", json.dumps({"value": 2}),
+                                options=StateOptions(concurrency=Concurrency.first_write))
+
+    with pytest.raises(DaprInternalError) as raised:
+        asyncio.run(scenario())
+    assert "etag mismatch" in raised.value.as_dict()["message"]
+
+
+def test_transaction_conflict_is_raised_as_the_client_does(client):
+    async def scenario():
+        await client.save_state("test-store", "key", json.dumps({"value": 1}))
+        await client.delete_state("test-store", "key", etag="999")
+
+    with pytest.raises(DaprGrpcError):
+        asyncio.run(scenario())
+
+
+def test_unsupported_query_operator(client):
+    async def scenario():
+        await client.save_state("test-store", "key", json.dumps({"name": "abc"}))
+        await client.query_state("test-store", json.dumps({"filter": {"LIKE": {"name": "a%"}}}))
+
+    with pytest.raises(DaprGrpcError):
+        asyncio.run(scenario())
+
+
+def test_store_sees_conflicts(store):
+    async def scenario():
+        assert await store.insert_item("key", {"value": 1})
+        assert not await store.insert_item("key", {"value": 2})
+        _, etag = await store.get_item_with_etag("key")
+        await store.save_item("key", {"value": 3}, etag=etag)
+        with pytest.raises(ETagMismatchError):
+            await store.save_item("key", {"value": 4}, etag=etag)
+        with pytest.raises(ETagMismatchError):
+            await store.transact({"key": {"value": 5}, "other": {"value": 1}}, etags={"key": etag})
+        # The failed transaction applied nothing
+        assert await store.get_items(["key", "other"]) == {"key": {"value": 3}}
+
+    asyncio.run(scenario())
+
+
+def test_transaction_inserts_are_first_writes(store):
+    async def scenario():
+        await store.transact({"key": {"value": 1}, "index": {"ids": [1]}}, inserts=["key", "index"])
+        with pytest.raises(ETagMismatchError):
+            await store.transact({"key": {"value": 2}, "other": {"value": 1}}, inserts=["key"])
+        assert await store.get_items(["key", "other"]) == {"key": {"value": 1}}
+
+    asyncio.run(scenario())
+
+
+def test_sidecar_client_sends_state_options():
+    class Stub:
+        def ExecuteStateTransaction(self, request):
+            self.request = request
+
+            class Call:
+                def __await__(self):
+                    return iter(())
+
+                async def initial_metadata(self):
+                    return ()
+            return Call()
+
+    client = SidecarStateClient.__new__(SidecarStateClient)
+    client._stub = Stub()
+    asyncio.run(client.execute_state_transaction("test-store", [
+        StateOperation(key="new", data="{}", options=StateOptions(concurrency=Concurrency.first_write)),
+        TransactionalStateOperation(key="old", data="{}", etag="3"),
+        TransactionalStateOperation(key="gone", operation_type=TransactionOperationType.delete),
+    ]))
+
+    new, old, gone = client._stub.request.operations
+    assert new.request.options.concurrency == Concurrency.first_write.value
+    assert not old.request.HasField("options")
+    assert old.request.etag.value == "3"
+    assert gone.operationType == "delete"
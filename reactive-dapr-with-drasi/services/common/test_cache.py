@@ -0,0 +1,83 @@
+"""Tests for the read-through item cache in DaprStateStore."""
+import asyncio
+
+import pytest
+
+from common.cache import ItemCache
+from common.state import DaprStateStore, ETagMismatchError
+
+
+@pytest.fixture
+def store(state_client):
+    store = DaprStateStore(store_name="test-store", cache_size=2, cache_ttl_seconds=60, backend="memory")
+    store.client = state_client
+    return store
+
+
+def _counters(store) -> dict:
+    return store.metrics.snapshot()["counters"]
+
+
+def test_fresh_entries_are_served_without_the_sidecar(store, state_client):
+    async def scenario():
+        await store.save_item("1", {"value": 1})
+        await store.get_item("1")
+        # A write from another replica is not seen until the entry expires
+        await state_client.save_state("test-store", "1", '{"value": 2}')
+        return await store.get_item("1")
+
+    assert asyncio.run(scenario()) == {"value": 1}
+    assert _counters(store)["cache_hits"] == 1
+
+
+def test_writes_invalidate_their_keys(store):
+    async def scenario():
+        await store.save_item("1", {"value": 1})
+        _, etag = await store.get_item_with_etag("1")
+        await store.save_item("1", {"value": 2}, etag=etag)
+        first = await store.get_item("1")
+        # A failed guarded write invalidates too, since the item changed under it
+        with pytest.raises(ETagMismatchError):
+            await store.save_item("1", {"value": 3}, etag=etag)
+        await store.transact({"1": {"value": 4}})
+        return first, await store.get_item("1")
+
+    assert asyncio.run(scenario()) == ({"value": 2}, {"value": 4})
+
+
+def test_read_racing_a_write_does_not_cache_stale_data(store):
+    async def scenario():
+        await store.save_item("1", {"value": 1})
+        # The read yields after fetching, so the write lands before it caches
+        read = asyncio.create_task(store.get_item("1"))
+        await asyncio.sleep(0)
+        await store.save_item("1", {"value": 2})
+        await read
+        return await store.get_item("1")
+
+    assert asyncio.run(scenario()) == {"value": 2}
+
+
+def test_expired_entries_with_unchanged_etag_are_reused(store):
+    store.cache.ttl_seconds = 0
+
+    async def scenario():
+        await store.save_item("1", {"value": 1})
+        first = await store.get_item("1")
+        return first, await store.get_item("1")
+
+    first, second = asyncio.run(scenario())
+    assert first is second
+    assert _counters(store)["cache_revalidated"] == 1
+
+
+def test_least_recently_used_entries_are_evicted():
+    cache = ItemCache(max_items=2, ttl_seconds=60)
+    for key in ("a", "b"):
+        cache.put(key, {"key": key}, "1", cache.version)
+    cache.get("a")
+    cache.put("c", {"key": "c"}, "1", cache.version)
+
+    assert cache.get("b") is None
+    assert cache.get("a").data == {"key": "a"}
+    assert len(cache) == 2
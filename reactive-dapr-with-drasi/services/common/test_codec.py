@@ -0,0 +1,35 @@
+"""Tests for single-pass state value decoding."""
+import base64
+import json
+
+import pytest
+
+from common.codec import decode_value, encode_json
+
+
+@pytest.mark.parametrize("value", [{"product_id": 1, "name": "Lamp"}, [1, 2], "text", 3, None])
+def test_plain_json(value):
+    assert decode_value(json.dumps(value).encode("utf-8")) == value
+    assert decode_value(f"  {json.dumps(value)}\n") == value
+
+
+@pytest.mark.parametrize("value", [{"product_id": 1, "name": "Lämp"}, [1, {"a": 2}]])
+def test_base64_wrapped_json(value):
+    wrapped = base64.b64encode(json.dumps(value).encode("utf-8")).decode("ascii")
+    assert decode_value(json.dumps(wrapped)) == value
+
+
+def test_string_that_only_looks_like_base64_json_is_kept():
+    assert decode_value('"eyJ not base64"') == "eyJ not base64"
+    # Valid base64 whose content is not JSON
+    assert decode_value(json.dumps(base64.b64encode(b"{broken").decode("ascii"))) == base64.b64encode(b"{broken").decode("ascii")
+
+
+def test_invalid_json_raises():
+    with pytest.raises(ValueError):
+        decode_value(b"{not json")
+
+
+def test_encode_json_round_trips():
+    value = {"name": "Lämp", "ids": [1, 2]}
+    assert decode_value(encode_json(value)) == value
@@ -0,0 +1,53 @@
+"""Tests for IdAllocator leases racing on the shared counter."""
+import asyncio
+
+import pytest
+
+from common import ids
+from common.backends import MemoryStateClient
+from common.ids import IdAllocationError, IdAllocator
+from common.state import DaprStateStore
+
+
+class YieldingClient(MemoryStateClient):
+    """Memory client that lets other tasks run between a read and the write based on it."""
+
+    async def get_state(self, *args, **kwargs):
+        response = await super().get_state(*args, **kwargs)
+        await asyncio.sleep(0)
+        return response
+
+
+def _store(client=None) -> DaprStateStore:
+    store = DaprStateStore(store_name="test-store", cache_size=0, backend="memory")
+    store.client = client or YieldingClient()
+    return store
+
+
+def test_contended_leases_hand_out_disjoint_blocks():
+    store = _store()
+    allocators = [IdAllocator(store, block_size=10, first_id=1000) for _ in range(4)]
+
+    async def scenario():
+        return await asyncio.gather(*(allocator.allocate(25) for allocator in allocators))
+
+    allocated = [id_ for block in asyncio.run(scenario()) for id_ in block]
+    assert len(allocated) == len(set(allocated)) == 100
+    assert min(allocated) == 1000
+
+
+def test_lease_gives_up_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(ids, "MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(ids, "RETRY_BASE_DELAY", 0)
+
+    class ConflictingClient(MemoryStateClient):
+        """Every write finds the counter changed by another replica."""
+
+        async def save_state(self, store_name, key, value, etag=None, options=None, **kwargs):
+            await super().save_state(store_name, key, '{"next_id": 0}')
+            return await super().save_state(store_name, key, value, etag=etag, options=options)
+
+    store = _store(ConflictingClient())
+    asyncio.run(store.save_item(f"{ids.META_KEY_PREFIX}next-id", {"next_id": 1000}))
+    with pytest.raises(IdAllocationError):
+        asyncio.run(IdAllocator(store).next_id())
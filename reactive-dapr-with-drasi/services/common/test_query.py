@@ -0,0 +1,26 @@
+"""Tests for building state queries from list parameters."""
+import pytest
+from fastapi import HTTPException
+
+from common.query import build_query, resolve_sort
+
+
+def test_unset_parameters_are_left_out():
+    assert build_query({"status": None}) == {"filter": {}}
+    assert build_query({"status": "PENDING", "customer_id": None}) == {"filter": {"EQ": {"status": "PENDING"}}}
+
+
+def test_several_conditions_are_combined_with_and():
+    query = build_query({"status": "PENDING", "customer_id": 1}, "order_id", descending=True)
+    assert query == {
+        "filter": {"AND": [{"EQ": {"status": "PENDING"}}, {"EQ": {"customer_id": 1}}]},
+        "sort": [{"key": "order_id", "order": "DESC"}],
+    }
+
+
+def test_unknown_sort_field_is_a_bad_request():
+    assert resolve_sort("orderId", {"orderId": "order_id"}) == "order_id"
+    assert resolve_sort(None, {"orderId": "order_id"}) is None
+    with pytest.raises(HTTPException) as raised:
+        resolve_sort("secret", {"orderId": "order_id"})
+    assert raised.value.status_code == 400
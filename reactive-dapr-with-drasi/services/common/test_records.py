@@ -0,0 +1,91 @@
+"""Tests for record updates and guarded inserts racing with other writers."""
+import asyncio
+
+import pytest
+
+from common import records
+from common.records import Changes, RecordConflictError, insert_with_records, read_records, update_records
+
+
+def _counter(records_by_key: dict) -> Changes:
+    return Changes({"counter": {"value": records_by_key["counter"].get("value", 0) + 1}}, [])
+
+
+def test_concurrent_updates_are_all_applied(make_store):
+    store = make_store()
+
+    async def scenario():
+        await asyncio.gather(*(update_records(store, ["counter"], _counter) for _ in range(10)))
+        return await store.get_item("counter")
+
+    assert asyncio.run(scenario()) == {"value": 10}
+
+
+def test_update_gives_up_after_max_attempts(make_store, state_client, monkeypatch):
+    monkeypatch.setattr(records, "MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(records, "RETRY_BASE_DELAY", 0)
+    store = make_store()
+    execute = state_client.execute_state_transaction
+
+    async def interfering(store_name, operations, **kwargs):
+        # Another writer changes the record between every read and write
+        await state_client.save_state(store_name, "counter", '{"value": -1}')
+        return await execute(store_name, operations, **kwargs)
+
+    monkeypatch.setattr(state_client, "execute_state_transaction", interfering)
+    with pytest.raises(RecordConflictError):
+        asyncio.run(update_records(store, ["counter"], _counter))
+
+
+def test_reading_missing_records_writes_nothing(make_store):
+    store = make_store()
+
+    assert asyncio.run(read_records(store, ["counter"], ["item"])) == {"counter": ({}, None), "item": (None, None)}
+    assert asyncio.run(store.get_items(["counter", "item"])) == {}
+
+
+@pytest.mark.parametrize("outcome", ["raises", "unchanged"])
+def test_update_without_changes_creates_no_record(make_store, outcome):
+    store = make_store()
+
+    def apply(records_by_key: dict) -> Changes:
+        if outcome == "raises":
+            raise ValueError("rejected")
+        return Changes({}, [])
+
+    try:
+        asyncio.run(update_records(store, ["counter"], apply))
+    except ValueError:
+        pass
+    assert asyncio.run(store.get_item("counter")) is None
+
+
+def test_insert_with_records_inserts_one_of_racing_creates(make_store):
+    store = make_store()
+
+    def apply(key: str):
+        return lambda records_by_key: Changes({key: {"ids": records_by_key[key].get("ids", []) + [1]}}, [])
+
+    async def scenario():
+        # Creates of one item keyed under different records share no record ETag
+        return await asyncio.gather(
+            insert_with_records(store, "1", {"owner": "a"}, ["index:a"], apply("index:a")),
+            insert_with_records(store, "1", {"owner": "b"}, ["index:b"], apply("index:b")),
+        )
+
+    assert sorted(asyncio.run(scenario())) == [False, True]
+    owner = asyncio.run(store.get_item("1"))["owner"]
+    indexes = asyncio.run(store.get_items(["index:a", "index:b"]))
+    assert indexes[f"index:{owner}"] == {"ids": [1]}
+    assert indexes.get(f"index:{'b' if owner == 'a' else 'a'}", {}).get("ids") is None
+
+
+def test_insert_with_records_writes_nothing_when_apply_fails(make_store):
+    store = make_store()
+
+    def apply(records_by_key: dict) -> Changes:
+        raise ValueError("rejected")
+
+    with pytest.raises(ValueError):
+        asyncio.run(insert_with_records(store, "1", {"value": 1}, ["index"], apply))
+    assert asyncio.run(store.get_items(["1", "index"])) == {}
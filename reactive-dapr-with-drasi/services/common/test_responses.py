@@ -0,0 +1,88 @@
+"""Tests for JSON, conditional and compressed responses."""
+import gzip
+
+import pytest
+from starlette.requests import Request
+
+from common.codec import decode_value
+from common import responses
+from common.responses import EncodedBody, conditional_response, encoded_response, list_response
+
+
+def _request(**headers) -> Request:
+    return Request({
+        "type": "http",
+        "method": "GET",
+        "path": "/",
+        "headers": [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()],
+    })
+
+
+def test_item_etag_comes_from_the_store():
+    response = conditional_response(_request(), {"id": 1}, etag="7")
+    assert response.headers["etag"] == '"7"'
+    assert decode_value(response.body) == {"id": 1}
+
+
+@pytest.mark.parametrize("if_none_match", ['"7"', 'W/"7"', '"3", "7"', "*"])
+def test_matching_if_none_match_is_not_modified(if_none_match):
+    response = conditional_response(_request(if_none_match=if_none_match), {"id": 1}, etag="7")
+    assert response.status_code == 304
+    assert response.body == b""
+
+
+def test_changed_item_is_sent_again():
+    response = conditional_response(_request(if_none_match='"6"'), {"id": 1}, etag="7")
+    assert response.status_code == 200
+
+
+def test_list_etag_follows_the_content():
+    first = list_response([{"id": 1}], None, _request())
+    same = list_response([{"id": 1}], None, _request(if_none_match=first.headers["etag"]))
+    changed = list_response([{"id": 2}], None, _request(if_none_match=first.headers["etag"]))
+    assert same.status_code == 304
+    assert changed.status_code == 200
+    assert changed.headers["etag"] != first.headers["etag"]
+
+
+LARGE = [{"id": item_id, "name": "Item"} for item_id in range(200)]
+
+
+def test_small_bodies_are_sent_plain():
+    response = encoded_response(_request(accept_encoding="gzip"), EncodedBody({"id": 1}))
+    assert "content-encoding" not in response.headers
+    assert response.headers["vary"] == "Accept-Encoding"
+
+
+def test_gzip_is_sent_when_accepted():
+    body = EncodedBody(LARGE)
+    response = encoded_response(_request(accept_encoding="gzip, deflate"), body)
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert gzip.decompress(response.body) == body.body
+    # Each coding is a different representation with its own ETag
+    assert response.headers["etag"] == body.etag[:-1] + '-gzip"'
+    assert encoded_response(_request(accept_encoding="gzip", if_none_match=response.headers["etag"]), body).status_code == 304
+    assert encoded_response(_request(if_none_match=response.headers["etag"]), body).status_code == 200
+
+
+@pytest.mark.skipif(responses.brotli is None, reason="brotli is not installed")
+def test_brotli_is_preferred_unless_weighted_lower():
+    body = EncodedBody(LARGE)
+
+    response = encoded_response(_request(accept_encoding="gzip, br"), body)
+    assert response.headers["content-encoding"] == "br"
+    assert responses.brotli.decompress(response.body) == body.body
+    response = encoded_response(_request(accept_encoding="br;q=0.5, gzip"), body)
+    assert response.headers["content-encoding"] == "gzip"
+
+
+@pytest.mark.parametrize("accept_encoding", ["identity", "gzip;q=0, br;q=0", "*;q=0", "gzip;q=bad"])
+def test_refused_codings_send_the_plain_body(monkeypatch, accept_encoding):
+    monkeypatch.setattr(responses, "ENCODINGS", ("gzip",))
+    body = EncodedBody(LARGE)
+    response = encoded_response(_request(accept_encoding=accept_encoding), body)
+
+    assert "content-encoding" not in response.headers
+    assert response.body == body.body
+    assert response.headers["etag"] == body.etag
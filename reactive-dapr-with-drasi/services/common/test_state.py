@@ -0,0 +1,226 @@
+"""
+Tests for DaprStateStore's handling of sidecar errors.
+
+The fake client raises what the asyncio DaprClient of dapr 1.15 raises:
+save_state wraps the gRPC error in a DaprInternalError holding only its
+details, the other state calls wrap it in a DaprGrpcError.
+"""
+import asyncio
+
+import grpc
+import pytest
+from dapr.aio.clients import DaprClient
+from dapr.clients.exceptions import DaprGrpcError, DaprInternalError
+from dapr.clients.grpc._response import StateResponse
+
+from common import state
+from common.backends import SidecarStateClient
+from common.state import DaprStateStore, ETagMismatchError
+
+
+def _rpc_error(code: grpc.StatusCode, details: str) -> grpc.aio.AioRpcError:
+    return grpc.aio.AioRpcError(code, grpc.aio.Metadata(), grpc.aio.Metadata(), details=details)
+
+
+def _save_state_error(code: grpc.StatusCode, details: str) -> DaprInternalError:
+    """What DaprClient.save_state raises for a failed call."""
+    error = _rpc_error(code, details)
+    try:
+        raise DaprInternalError(error.details()) from error
+    except DaprInternalError as wrapped:
+        return wrapped
+
+
+class FailingClient:
+    """Client whose every state call fails with the given errors."""
+
+    def __init__(self, save_error: Exception, call_error: Exception):
+        self.save_error = save_error
+        self.call_error = call_error
+
+    async def save_state(self, **kwargs):
+        raise self.save_error
+
+    async def execute_state_transaction(self, **kwargs):
+        raise self.call_error
+
+
+def _store(save_error: Exception, call_error: Exception = None) -> DaprStateStore:
+    store = DaprStateStore(store_name="test-store", cache_size=0, backend="memory")
+    store.client = FailingClient(save_error, call_error or save_error)
+    return store
+
+
+ETAG_MISMATCH = "failed saving state in state store statestore: possible etag mismatch. error from state store: ERROR: no rows"
+
+
+@pytest.mark.parametrize("error", [
+    _save_state_error(grpc.StatusCode.ABORTED, ETAG_MISMATCH),
+    # Older sidecars report the mismatch as an internal error; only the details tell
+    _save_state_error(grpc.StatusCode.INTERNAL, ETAG_MISMATCH),
+    DaprInternalError(ETAG_MISMATCH),
+    DaprGrpcError(_rpc_error(grpc.StatusCode.ABORTED, ETAG_MISMATCH)),
+])
+def test_save_item_raises_etag_mismatch(error):
+    with pytest.raises(ETagMismatchError):
+        asyncio.run(_store(error).save_item("key", {"value": 1}, etag="1"))
+
+
+def test_save_item_without_etag_raises_the_sidecar_error():
+    error = _save_state_error(grpc.StatusCode.ABORTED, ETAG_MISMATCH)
+    with pytest.raises(DaprInternalError):
+        asyncio.run(_store(error).save_item("key", {"value": 1}))
+
+
+@pytest.mark.parametrize("details", [
+    ETAG_MISMATCH,
+    "failed saving state in state store statestore: no item was updated",
+    "ERROR: duplicate key value violates unique constraint",
+])
+def test_insert_item_returns_false_on_existing_key(details):
+    store = _store(_save_state_error(grpc.StatusCode.INTERNAL, details))
+    assert asyncio.run(store.insert_item("key", {"value": 1})) is False
+
+
+def test_insert_item_raises_other_errors():
+    store = _store(_save_state_error(grpc.StatusCode.UNAVAILABLE, "connection refused"))
+    with pytest.raises(DaprInternalError):
+        asyncio.run(store.insert_item("key", {"value": 1}))
+
+
+def test_transact_raises_etag_mismatch():
+    error = DaprGrpcError(_rpc_error(grpc.StatusCode.ABORTED, ETAG_MISMATCH))
+    store = _store(error, error)
+    with pytest.raises(ETagMismatchError):
+        asyncio.run(store.transact({"key": {"value": 1}}, etags={"key": "1"}))
+
+
+def test_transact_raises_other_errors():
+    error = DaprGrpcError(_rpc_error(grpc.StatusCode.UNAVAILABLE, "connection refused"))
+    store = _store(error, error)
+    with pytest.raises(DaprGrpcError):
+        asyncio.run(store.transact({"key": {"value": 1}}, etags={"key": "1"}))
+
+
+class SlowClient:
+    """Client whose reads wait until the given number of them are in flight at once."""
+
+    def __init__(self, readers: int):
+        self.readers = readers
+        self.in_flight = 0
+        self.all_in_flight = asyncio.Event()
+
+    async def get_state(self, store_name: str, key: str, **kwargs) -> StateResponse:
+        self.in_flight += 1
+        if self.in_flight == self.readers:
+            self.all_in_flight.set()
+        await self.all_in_flight.wait()
+        return StateResponse(data=b'{"value": 1}', etag="1")
+
+
+def test_reads_share_the_event_loop():
+    # A store blocking the loop on each sidecar call would never have two reads in flight
+    store = DaprStateStore(store_name="test-store", cache_size=0, backend="memory")
+    store.client = SlowClient(readers=50)
+
+    async def scenario():
+        return await asyncio.wait_for(asyncio.gather(*(store.get_item(str(key)) for key in range(50))), timeout=1)
+
+    assert asyncio.run(scenario()) == [{"value": 1}] * 50
+
+
+def test_sidecar_backend_uses_the_asyncio_client():
+    assert issubclass(SidecarStateClient, DaprClient)
+
+
+class ItemStore(DaprStateStore):
+    id_field = "item_id"
+
+
+def test_bookkeeping_records_do_not_take_page_slots(make_store):
+    store = make_store(ItemStore)
+
+    async def scenario():
+        await store.save_items({str(item_id): {"item_id": item_id} for item_id in range(1, 4)})
+        await store.save_items({"_meta:index": {"ids": [1, 2, 3]}, "_meta:next-id": {"next_id": 4}})
+        # Records without the sort field come first in descending order
+        query = {"filter": {}, "sort": [{"key": "item_id", "order": "DESC"}], "page": {"limit": 2}}
+        first, token = await store.query_items(query)
+        rest, _ = await store.query_items({**query, "page": {"limit": 2, "token": token}})
+        return first, rest
+
+    first, rest = asyncio.run(scenario())
+    assert [result["value"]["item_id"] for result in first] == [3, 2]
+    assert [result["value"]["item_id"] for result in rest] == [1]
+
+
+def test_item_filter_keeps_the_query_filter(make_store):
+    store = make_store(ItemStore)
+
+    async def scenario():
+        await store.save_items({"1": {"item_id": 1, "color": "red"}, "2": {"item_id": 2, "color": "blue"}})
+        await store.save_item("_meta:colors", {"color": "red"})
+        return [item async for item in store.iter_items({"filter": {"EQ": {"color": "red"}}})]
+
+    assert [result["key"] for result in asyncio.run(scenario())] == ["1"]
+
+
+def test_bulk_operations_split_keys_into_chunks(make_store, state_client, monkeypatch):
+    monkeypatch.setattr(state, "BULK_CHUNK_SIZE", 2)
+    store = make_store()
+    calls = []
+    get_bulk_state = state_client.get_bulk_state
+
+    async def counting_get_bulk_state(**kwargs):
+        calls.append(len(kwargs["keys"]))
+        return await get_bulk_state(**kwargs)
+
+    monkeypatch.setattr(state_client, "get_bulk_state", counting_get_bulk_state)
+
+    async def scenario():
+        await store.save_items({str(key): {"value": key} for key in range(5)})
+        found = await store.get_items([str(key) for key in range(7)])
+        await store.delete_items(["0", "1", "2"])
+        return found, await store.get_items([str(key) for key in range(5)])
+
+    found, remaining = asyncio.run(scenario())
+    assert found == {str(key): {"value": key} for key in range(5)}
+    assert calls[:4] == [2, 2, 2, 1]
+    assert remaining == {"3": {"value": 3}, "4": {"value": 4}}
+
+
+def test_save_items_failure_keeps_earlier_chunks(make_store, state_client, monkeypatch):
+    monkeypatch.setattr(state, "BULK_CHUNK_SIZE", 2)
+    store = make_store()
+    execute = state_client.execute_state_transaction
+    transactions = []
+
+    async def failing_second_transaction(store_name, operations, **kwargs):
+        transactions.append(len(operations))
+        if len(transactions) == 2:
+            raise DaprGrpcError(_rpc_error(grpc.StatusCode.UNAVAILABLE, "connection refused"))
+        return await execute(store_name, operations, **kwargs)
+
+    monkeypatch.setattr(state_client, "execute_state_transaction", failing_second_transaction)
+    with pytest.raises(DaprGrpcError):
+        asyncio.run(store.save_items({str(key): {"value": key} for key in range(5)}))
+    assert set(asyncio.run(store.get_items([str(key) for key in range(5)]))) == {"0", "1"}
+
+
+def test_store_name_comes_from_subclass_or_environment(monkeypatch):
+    monkeypatch.delenv("DAPR_STORE_NAME", raising=False)
+    assert ItemStore(store_name="explicit", backend="memory").store_name == "explicit"
+    with pytest.raises(ValueError):
+        DaprStateStore(backend="memory")
+
+    class ServiceStore(DaprStateStore):
+        default_store_name = "service-store"
+
+    assert ServiceStore(backend="memory").store_name == "service-store"
+    monkeypatch.setenv("DAPR_STORE_NAME", "override")
+    assert ServiceStore(backend="memory").store_name == "override"
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        DaprStateStore(store_name="test-store", backend="redis")
@@ -0,0 +1,109 @@
+"""
+Shared pytest setup for the services.
+
+Tests sit next to the modules they test. A service's code is imported as
+top-level modules (main, models, dapr_client), as in its image, so before
+the tests of one service are collected the modules of the others are
+dropped and its code directory is put first on the path.
+
+Stores in tests use the memory backend (see common.backends) through
+YieldingStateClient, which lets other tasks run after every read, so
+concurrent requests interleave between their reads and writes as they do
+against a sidecar. A service's tests reach its app through app_store,
+which installs such a store as the app's, and app_requests.
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+import pytest
+
+from common.backends import MemoryStateClient
+from common.ids import IdAllocator
+from common.state import DaprStateStore
+
+SERVICES_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _code_dir(path: str) -> str:
+    """The services/<name>/code directory holding path, or "" if none does."""
+    relative = os.path.relpath(os.path.abspath(path), SERVICES_DIR).split(os.sep)
+    if len(relative) > 2 and relative[1] == "code":
+        return os.path.join(SERVICES_DIR, relative[0], "code")
+    return ""
+
+
+def pytest_collectstart(collector):
+    code_dir = _code_dir(str(getattr(collector, "path", "")))
+    if not code_dir or not isinstance(collector, pytest.Module):
+        return
+    for name, module in list(sys.modules.items()):
+        module_dir = _code_dir(getattr(module, "__file__", None) or "")
+        if module_dir and module_dir != code_dir:
+            del sys.modules[name]
+    if code_dir in sys.path:
+        sys.path.remove(code_dir)
+    sys.path.insert(0, code_dir)
+
+
+class YieldingStateClient(MemoryStateClient):
+    """Memory backend that yields to other tasks after every read."""
+
+    async def get_state(self, *args, **kwargs):
+        response = await super().get_state(*args, **kwargs)
+        await asyncio.sleep(0)
+        return response
+
+    async def get_bulk_state(self, *args, **kwargs):
+        response = await super().get_bulk_state(*args, **kwargs)
+        await asyncio.sleep(0)
+        return response
+
+    async def query_state(self, *args, **kwargs):
+        response = await super().query_state(*args, **kwargs)
+        await asyncio.sleep(0)
+        return response
+
+
+@pytest.fixture
+def state_client():
+    return YieldingStateClient()
+
+
+@pytest.fixture
+def make_store(state_client):
+    """Factory for stores of a given DaprStateStore subclass, all sharing state_client."""
+    def make(store_class=DaprStateStore, store_name: str = "test-store") -> DaprStateStore:
+        store = store_class(store_name=store_name, cache_size=0, backend="memory")
+        store.client = state_client
+        return store
+    return make
+
+
+@pytest.fixture
+def app_store(request, make_store, monkeypatch):
+    """A store installed as the state_store of the main module the requesting tests import.
+
+    Its ID allocator is rebuilt on the store and stock updates skip the combiner.
+    """
+    main = request.module.main
+    store = make_store(main.DaprStateStore)
+    monkeypatch.setattr(main, "state_store", store)
+    if hasattr(main, "id_allocator"):
+        monkeypatch.setattr(main, "id_allocator", IdAllocator(store))
+    if hasattr(main, "stock_combiner"):
+        monkeypatch.setattr(main, "stock_combiner", None)
+    return store
+
+
+@pytest.fixture
+def app_requests(request):
+    """Sender of (method, path, body) requests, run concurrently, to the app of the main module the requesting tests import."""
+    main = request.module.main
+
+    async def send(*requests, headers=None):
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", headers=headers) as client:
+            return await asyncio.gather(*(client.request(method, path, json=body) for method, path, body in requests))
+    return send
@@ -0,0 +1,34 @@
+from typing import Optional
+
+from common.state import META_KEY_PREFIX
+
+
+def normalize_email(email: str) -> str:
+    """Form of an email address used for uniqueness checks and lookups."""
+    return email.strip().lower()
+
+
+def email_key(email: str) -> str:
+    """
+    Key of the record claiming an email address, stored next to the customers.
+
+    The record holds the ID of the customer that owns the address (see
+    email_claim); an empty record means the address is free.
+    """
+    return f"{META_KEY_PREFIX}customer-email:{normalize_email(email)}"
+
+
+def email_claim(customer_id: int) -> dict:
+    """
+    Email claim record for a customer.
+
+    It holds only the customer's ID, under a field name no customer has, so
+    that Drasi queries over the customers table never take a claim for a
+    customer.
+    """
+    return {"customerId": customer_id}
+
+
+def claim_owner(claim: Optional[dict]) -> Optional[int]:
+    """ID of the customer holding an email claim, or None if the address is free."""
+    return (claim or {}).get("customerId")
@@ -3,14 +3,19 @@ import os
 import time
 from contextlib import asynccontextmanager
 from typing import Optional
-import random
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from models import CustomerItem, CustomerCreateRequest, CustomerUpdateRequest, CustomerResponse, CustomerListResponse, LoyaltyTier
-from dapr_client import DaprStateStore
+from models import CustomerItem, CustomerCreateRequest, CustomerUpdateRequest, CustomerResponse, CustomerListResponse, LoyaltyTier, CustomerBatchRequest, CustomerBatchResponse, CustomerReindexResponse
+from dapr_client import DaprStateStore, QUERY_PAGE_SIZE
+from common.responses import conditional_response, list_response, ndjson_line
+from common.ids import IdAllocator
+from common.query import build_query, resolve_sort
+from common.records import Changes, insert_with_records, update_records
+from common.state import BULK_CHUNK_SIZE
+from customer_records import email_key, email_claim, claim_owner, normalize_email
 
 # Configure logging
 logging.basicConfig(
@@ -22,16 +27,31 @@ logger = logging.getLogger(__name__)
 # Global state store instance
 state_store = None
 
+# Hands out customer IDs for creates that do not supply one
+id_allocator = None
+
+# Largest page a client may request from a list endpoint
+MAX_PAGE_SIZE = 1000
+
+# List sort parameter to stored field
+SORT_FIELDS = {
+    "customerId": "customer_id",
+    "customerName": "customer_name",
+    "loyaltyTier": "loyalty_tier",
+}
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global state_store
+    global state_store, id_allocator
     state_store = DaprStateStore()
+    id_allocator = IdAllocator(state_store)
     logger.info("Customer service started")
     yield
     # Shutdown
     logger.info("Customer service shutting down")
+    await state_store.close()
 
 
 # Create FastAPI app
@@ -50,9 +70,35 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 
+def _email_conflict(email: str) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=f"A customer with email {email} already exists"
+    )
+
+
+async def _insert_customer(store: DaprStateStore, customer_item: CustomerItem) -> bool:
+    """
+    Save a new customer and claim its email in one transaction; False if the ID is taken.
+
+    Raises:
+        HTTPException: 409 if another customer holds the email; nothing is written
+    """
+    customer_email_key = email_key(customer_item.email)
+
+    def apply(records: dict) -> Changes:
+        if claim_owner(records[customer_email_key]) is not None:
+            raise _email_conflict(customer_item.email)
+        return Changes({customer_email_key: email_claim(customer_item.customerId)}, [])
+
+    return await insert_with_records(store, str(customer_item.customerId), customer_item.to_db_dict(),
+                                     [customer_email_key], apply)
+
+
 def get_state_store() -> DaprStateStore:
     """Dependency to get the state store instance."""
     if state_store is None:
@@ -69,28 +115,67 @@ async def health_check():
     return {"status": "healthy", "service": "customers"}
 
 
+@app.get("/metrics")
+async def store_metrics(store: DaprStateStore = Depends(get_state_store)):
+    """State store call counts, errors and latency for this worker."""
+    return store.metrics.snapshot()
+
+
+async def _stream_customers(store: DaprStateStore, query: dict, page_size: int):
+    """Yield customers as NDJSON lines, one state query page at a time."""
+    async for result in store.iter_items(query, page_size):
+        try:
+            item = CustomerResponse.dict_from_db(result['value'])
+        except Exception as e:
+            logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
+            continue
+        yield ndjson_line(item)
+
+
 @app.get("/customers", response_model=CustomerListResponse)
 async def list_customers(
+    request: Request,
+    tier: Optional[LoyaltyTier] = Query(None, description="Only customers in this loyalty tier"),
+    sort: Optional[str] = Query(None, description="Field to sort by: " + ", ".join(SORT_FIELDS)),
+    sort_order: str = Query("asc", alias="order", pattern="^(asc|desc)$", description="Sort direction"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of customers to return"),
+    cursor: Optional[str] = Query(None, description="nextCursor from a previous page"),
+    stream: bool = Query(False, description="Stream every customer as NDJSON, fetching limit items per page"),
     store: DaprStateStore = Depends(get_state_store)
 ):
-    """Get all customers."""
+    """List customers matching the optional filters, or one page of them when limit or cursor is given."""
+    # Filters and sort are evaluated by the state store, not in this service
+    query = build_query(
+        {
+            "loyalty_tier": tier.value if tier else None
+        },
+        resolve_sort(sort, SORT_FIELDS),
+        sort_order == "desc"
+    )
+    
+    if stream:
+        return StreamingResponse(
+            _stream_customers(store, query, limit or QUERY_PAGE_SIZE),
+            media_type="application/x-ndjson"
+        )
+    
     start_time = time.time()
     
     try:
-        # Simple query with empty filter to get all items
-        query = {
-            "filter": {}
-        }
+        # Page limits the result when requested
+        if limit or cursor:
+            query["page"] = {"limit": limit or QUERY_PAGE_SIZE}
+            if cursor:
+                query["page"]["token"] = cursor
         
         # Execute the query
-        results, _ = await store.query_items(query)
+        results, next_cursor = await store.query_items(query)
         
-        # Convert results to CustomerResponse objects
+        # Map stored items straight to response dicts
         items = []
         for result in results:
             try:
-                customer_item = CustomerItem.from_db_dict(result['value'])
-                items.append(CustomerResponse.from_customer_item(customer_item))
+                items.append(CustomerResponse.dict_from_db(result['value']))
             except Exception as e:
                 logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
                 continue
@@ -98,7 +183,7 @@ async def list_customers(
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Retrieved {len(items)} customers in {elapsed:.2f}ms")
         
-        return CustomerListResponse(items=items, total=len(items))
+        return list_response(items, next_cursor, request)
         
     except Exception as e:
         elapsed = (time.time() - start_time) * 1000
@@ -118,41 +203,34 @@ async def create_customer(
     start_time = time.time()
     
     try:
-        # Use provided customer ID or generate a unique one
-        if request.customerId:
-            customer_id = request.customerId
-            # Check if ID already exists
-            existing = await store.get_item(str(customer_id))
-            if existing:
+        # Use provided customer ID or allocate one
+        customer_id = request.customerId or await id_allocator.next_id()
+        while True:
+            customer_item = CustomerItem(
+                customerId=customer_id,
+                customerName=request.customerName,
+                loyaltyTier=request.loyaltyTier,
+                email=request.email
+            )
+            
+            # Inserted only if the ID is free, then the email is claimed; an existing customer is reported rather than overwritten
+            if await _insert_customer(store, customer_item):
+                break
+            if request.customerId:
                 raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
+                    status_code=status.HTTP_409_CONFLICT,
                     detail=f"Customer with ID {customer_id} already exists"
                 )
-        else:
-            # Generate a unique customer ID
-            customer_id = random.randint(1000, 999999)
-            # Check if ID already exists
-            existing = await store.get_item(str(customer_id))
-            while existing:
-                customer_id = random.randint(1000, 999999)
-                existing = await store.get_item(str(customer_id))
-        
-        # Create customer item
-        customer_item = CustomerItem(
-            customerId=customer_id,
-            customerName=request.customerName,
-            loyaltyTier=request.loyaltyTier,
-            email=request.email
-        )
-        
-        # Save to state store
-        await store.save_item(str(customer_id), customer_item.to_db_dict())
+            # Only reachable if a client picked an allocated ID explicitly; take the next one
+            customer_id = await id_allocator.next_id()
         
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Created customer {customer_id} in {elapsed:.2f}ms")
         
         return CustomerResponse.from_customer_item(customer_item)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating customer: {str(e)}")
         raise HTTPException(
@@ -161,16 +239,192 @@ async def create_customer(
         )
 
 
+@app.post("/customers:batch", response_model=CustomerBatchResponse, status_code=status.HTTP_201_CREATED)
+async def create_customers_batch(
+    request: CustomerBatchRequest,
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """
+    Create many customers with chunked state transactions.
+
+    Each chunk of customers is written in one transaction with their email
+    claims, the customers and the missing claims as first-write upserts.
+    Customers whose ID exists or whose email another customer holds, even
+    if a concurrent request took it after the batch started, are skipped.
+    """
+    start_time = time.time()
+    
+    def apply_chunk(keys: list, records: dict) -> Changes:
+        upserts = {}
+        created = []
+        skipped = []
+        skipped_emails = []
+        for key in keys:
+            customer = customers[key]
+            customer_email_key = email_key(customer["email"])
+            if records[key] is not None:
+                skipped.append(customer["customer_id"])
+            elif claim_owner(records[customer_email_key]) is not None:
+                skipped_emails.append(customer["email"])
+            else:
+                upserts[key] = customer
+                upserts[customer_email_key] = email_claim(customer["customer_id"])
+                created.append(customer["customer_id"])
+        return Changes(upserts, [], (created, skipped, skipped_emails))
+    
+    try:
+        # Generate IDs for the items that did not supply one
+        missing_count = sum(1 for item in request.items if not item.customerId)
+        generated_ids = iter(await id_allocator.allocate(missing_count))
+        
+        customers = {}
+        for item in request.items:
+            customer_id = item.customerId or next(generated_ids)
+            customer_item = CustomerItem(
+                customerId=customer_id,
+                customerName=item.customerName,
+                loyaltyTier=item.loyaltyTier,
+                email=item.email
+            )
+            customers[str(customer_id)] = customer_item.to_db_dict()
+        
+        # A customer and its email claim always go into the same transaction
+        created = []
+        skipped = []
+        skipped_emails = []
+        keys = list(customers)
+        chunk_size = max(1, BULK_CHUNK_SIZE // 2)
+        for start in range(0, len(keys), chunk_size):
+            chunk = keys[start:start + chunk_size]
+            chunk_created, chunk_skipped, chunk_skipped_emails = await update_records(
+                store,
+                [email_key(customers[key]["email"]) for key in chunk],
+                lambda records: apply_chunk(chunk, records),
+                items=chunk
+            )
+            created.extend(chunk_created)
+            skipped.extend(chunk_skipped)
+            skipped_emails.extend(chunk_skipped_emails)
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Batch created {len(created)} customers ({len(skipped) + len(skipped_emails)} skipped) in {elapsed:.2f}ms")
+        
+        return CustomerBatchResponse(created=created, skipped=skipped, skippedEmails=skipped_emails)
+        
+    except Exception as e:
+        logger.error(f"Error creating customer batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create customer batch: {str(e)}"
+        )
+
+
+@app.post("/customers:reindex", response_model=CustomerReindexResponse)
+async def reindex_customers(
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """
+    Rebuild the email index from a paged scan of all customers.
+
+    Needed once for customers written before the index existed. A claim is
+    only written where the address is still unclaimed, guarded against
+    concurrent writes, so it is safe to run under load. An address claimed
+    by another customer than the lowest ID the scan found for it keeps its
+    claim and is reported as a duplicate.
+    """
+    start_time = time.time()
+    
+    try:
+        owners = {}
+        duplicates = set()
+        indexed = 0
+        async for result in store.iter_items({"filter": {}}):
+            try:
+                customer = result['value']
+                key = email_key(customer["email"])
+                if key in owners:
+                    duplicates.add(normalize_email(customer["email"]))
+                if key not in owners or customer["customer_id"] < owners[key]["customer_id"]:
+                    owners[key] = customer
+                indexed += 1
+            except Exception as e:
+                logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
+                continue
+        
+        def apply_chunk(keys: list, records: dict) -> Changes:
+            upserts = {}
+            taken = []
+            for key in keys:
+                owner = claim_owner(records[key])
+                if owner is None:
+                    upserts[key] = email_claim(owners[key]["customer_id"])
+                elif owner != owners[key]["customer_id"]:
+                    taken.append(normalize_email(owners[key]["email"]))
+            return Changes(upserts, [], taken)
+        
+        keys = list(owners)
+        for start in range(0, len(keys), BULK_CHUNK_SIZE):
+            chunk = keys[start:start + BULK_CHUNK_SIZE]
+            duplicates.update(await update_records(store, chunk, lambda records: apply_chunk(chunk, records)))
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Reindexed {indexed} customers ({len(duplicates)} duplicate emails) in {elapsed:.2f}ms")
+        
+        return CustomerReindexResponse(customers=indexed, duplicates=sorted(duplicates))
+        
+    except Exception as e:
+        logger.error(f"Error reindexing customers: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reindex customers: {str(e)}"
+        )
+
+
+@app.get("/customers/by-email/{email}", response_model=CustomerResponse)
+async def get_customer_by_email(
+    email: str,
+    request: Request,
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """Get the customer holding an email address by reading its email claim, then the customer."""
+    start_time = time.time()
+    
+    try:
+        customer_id = claim_owner(await store.get_item(email_key(email)))
+        data, etag = await store.get_item_with_etag(str(customer_id)) if customer_id is not None else (None, None)
+        
+        if not data:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Customer with email {email} not found"
+            )
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Retrieved customer {data['customer_id']} by email in {elapsed:.2f}ms")
+        
+        return conditional_response(request, CustomerResponse.dict_from_db(data), etag)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error retrieving customer by email: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve customer: {str(e)}"
+        )
+
+
 @app.get("/customers/{customer_id}", response_model=CustomerResponse)
 async def get_customer(
     customer_id: int,
+    request: Request,
     store: DaprStateStore = Depends(get_state_store)
 ):
     """Get customer details."""
     start_time = time.time()
     
     try:
-        data = await store.get_item(str(customer_id))
+        data, etag = await store.get_item_with_etag(str(customer_id))
         
         if not data:
             raise HTTPException(
@@ -178,12 +432,10 @@ async def get_customer(
                 detail=f"Customer {customer_id} not found"
             )
         
-        customer_item = CustomerItem.from_db_dict(data)
-        
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Retrieved customer {customer_id} in {elapsed:.2f}ms")
         
-        return CustomerResponse.from_customer_item(customer_item)
+        return conditional_response(request, CustomerResponse.dict_from_db(data), etag)
         
     except HTTPException:
         raise
@@ -214,18 +466,45 @@ async def update_customer(
                 detail=f"Customer {customer_id} not found"
             )
         
-        customer_item = CustomerItem.from_db_dict(data)
+        # A new email is claimed and the old one freed in the same transaction as the customer
+        key = str(customer_id)
+        old_email_key = email_key(data["email"])
+        new_email_key = email_key(request.email) if request.email is not None else old_email_key
         
-        # Update fields if provided
-        if request.customerName is not None:
-            customer_item.customerName = request.customerName
-        if request.loyaltyTier is not None:
-            customer_item.loyaltyTier = request.loyaltyTier
-        if request.email is not None:
-            customer_item.email = request.email
+        def apply(records: dict) -> Changes:
+            if not records[key]:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Customer {customer_id} not found"
+                )
+            
+            customer_item = CustomerItem.from_db_dict(records[key])
+            if email_key(customer_item.email) != old_email_key:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Customer {customer_id} was updated concurrently"
+                )
+            
+            # Update fields if provided
+            if request.customerName is not None:
+                customer_item.customerName = request.customerName
+            if request.loyaltyTier is not None:
+                customer_item.loyaltyTier = request.loyaltyTier
+            if request.email is not None:
+                customer_item.email = request.email
+            
+            owner = claim_owner(records[new_email_key])
+            if owner is not None and owner != customer_id:
+                raise _email_conflict(customer_item.email)
+            
+            upserts = {key: customer_item.to_db_dict()}
+            if owner is None:
+                upserts[new_email_key] = email_claim(customer_id)
+            freed = new_email_key != old_email_key and claim_owner(records[old_email_key]) == customer_id
+            deletes = [old_email_key] if freed else []
+            return Changes(upserts, deletes, customer_item)
         
-        # Save back to state store
-        await store.save_item(str(customer_id), customer_item.to_db_dict())
+        customer_item = await update_records(store, list(dict.fromkeys([old_email_key, new_email_key])), apply, items=[key])
         
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Updated customer {customer_id} in {elapsed:.2f}ms")
@@ -260,8 +539,18 @@ async def delete_customer(
                 detail=f"Customer {customer_id} not found"
             )
         
-        # Delete from state store
-        await store.delete_item(str(customer_id))
+        # Delete in one transaction with the customer's email claim
+        key = str(customer_id)
+        customer_email_key = email_key(data["email"])
+        
+        def apply(records: dict) -> Changes:
+            if records[key] is None:
+                return Changes({}, [])
+            owned = claim_owner(records[customer_email_key]) == customer_id
+            deletes = [key, customer_email_key] if owned else [key]
+            return Changes({}, deletes)
+        
+        await update_records(store, [customer_email_key], apply, items=[key])
         
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Deleted customer {customer_id} in {elapsed:.2f}ms")
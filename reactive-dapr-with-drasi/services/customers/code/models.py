@@ -2,6 +2,8 @@ from pydantic import BaseModel, Field, validator
 from typing import Optional, List
 from enum import Enum
 
+from customer_records import normalize_email
+
 
 class LoyaltyTier(str, Enum):
     BRONZE = "BRONZE"
@@ -75,7 +77,43 @@ class CustomerResponse(BaseModel):
             email=item.email
         )
 
+    @staticmethod
+    def dict_from_db(data: dict) -> dict:
+        """Map a stored customer straight to its response JSON shape, without pydantic validation."""
+        return {
+            "customerId": data["customer_id"],
+            "customerName": data["customer_name"],
+            "loyaltyTier": data["loyalty_tier"],
+            "email": data["email"]
+        }
+
 
 class CustomerListResponse(BaseModel):
     items: List[CustomerResponse]
-    total: int
\ No newline at end of file
+    total: int
+    nextCursor: Optional[str] = Field(None, description="Cursor for the next page, if more items may exist")
+
+
+class CustomerBatchRequest(BaseModel):
+    items: List[CustomerCreateRequest] = Field(..., min_items=1, max_items=10000, description="Customers to create")
+
+    @validator('items')
+    def validate_unique_ids(cls, v):
+        customer_ids = [item.customerId for item in v if item.customerId]
+        if len(customer_ids) != len(set(customer_ids)):
+            raise ValueError('Duplicate customer IDs in batch')
+        emails = [normalize_email(item.email) for item in v]
+        if len(emails) != len(set(emails)):
+            raise ValueError('Duplicate emails in batch')
+        return v
+
+
+class CustomerBatchResponse(BaseModel):
+    created: List[int] = Field(..., description="IDs of created customers, in request order")
+    skipped: List[int] = Field(..., description="Requested IDs that already existed and were left unchanged")
+    skippedEmails: List[str] = Field(..., description="Emails already registered to another customer; those items were not created")
+
+
+class CustomerReindexResponse(BaseModel):
+    customers: int = Field(..., description="Number of customers indexed")
+    duplicates: List[str] = Field(..., description="Emails held by several customers; an existing claim, or else the lowest customer ID, keeps them")
@@ -0,0 +1,132 @@
+"""Tests for the customers service's create path and email claims."""
+import asyncio
+
+import pytest
+
+import main
+from models import CustomerItem, CustomerResponse, LoyaltyTier
+from customer_records import email_key, email_claim
+
+
+def _customer(customer_id, email):
+    return {"customerId": customer_id, "customerName": "Ada", "email": email}
+
+
+def test_concurrent_creates_of_one_id_insert_once(app_store, app_requests):
+    # Customers with different emails share no claim record whose ETag could catch the race
+    responses = asyncio.run(app_requests(
+        ("POST", "/customers", _customer(7, "a@example.com")),
+        ("POST", "/customers", _customer(7, "b@example.com")),
+    ))
+
+    assert sorted(response.status_code for response in responses) == [201, 409]
+    customer = asyncio.run(app_store.get_item("7"))
+    claims = asyncio.run(app_store.get_items([email_key("a@example.com"), email_key("b@example.com")]))
+    assert [claim for claim in claims.values() if claim] == [email_claim(7)]
+    assert claims[email_key(customer["email"])] == email_claim(7)
+
+
+def test_concurrent_creates_of_one_email_claim_it_once(app_store, app_requests):
+    responses = asyncio.run(app_requests(
+        ("POST", "/customers", _customer(1, "a@example.com")),
+        ("POST", "/customers", _customer(2, "A@example.com")),
+    ))
+
+    assert sorted(response.status_code for response in responses) == [201, 409]
+    created = next(response.json()["customerId"] for response in responses if response.status_code == 201)
+    # The loser's customer is removed again
+    assert set(asyncio.run(app_store.get_items(["1", "2"]))) == {str(created)}
+    assert asyncio.run(app_store.get_item(email_key("a@example.com"))) == email_claim(created)
+
+
+def test_claim_holds_only_the_customer_id(app_store, app_requests):
+    asyncio.run(app_requests(("POST", "/customers", _customer(1, "a@example.com"))))
+
+    assert asyncio.run(app_store.get_item(email_key("a@example.com"))) == {"customerId": 1}
+    response, = asyncio.run(app_requests(("GET", "/customers/by-email/A@example.com", None)))
+    assert response.status_code == 200
+    assert response.json()["customerName"] == "Ada"
+
+
+def test_email_change_moves_the_claim(app_store, app_requests):
+    asyncio.run(app_requests(("POST", "/customers", _customer(1, "a@example.com"))))
+    responses = asyncio.run(app_requests(
+        ("PUT", "/customers/1", {"email": "b@example.com"}),
+        ("POST", "/customers", _customer(2, "b@example.com")),
+    ))
+
+    # Whichever request claims the address first wins; the other gets 409
+    assert sorted(response.status_code for response in responses) in ([200, 409], [201, 409])
+    claims = asyncio.run(app_store.get_items([email_key("a@example.com"), email_key("b@example.com")]))
+    owner = claims[email_key("b@example.com")]["customerId"]
+    assert asyncio.run(app_store.get_item(str(owner)))["email"] == "b@example.com"
+    # The old address is held only if customer 1 kept it
+    assert (email_key("a@example.com") in claims) == (owner == 2)
+
+
+def test_batch_create_racing_a_single_create_claims_the_email_once(app_store, app_requests, state_client, monkeypatch):
+    get_bulk_state = state_client.get_bulk_state
+    raced = []
+
+    async def create_after_read(store_name, keys, **kwargs):
+        response = await get_bulk_state(store_name, keys, **kwargs)
+        if email_key("a@example.com") in keys and not raced:
+            # A single create claims the email right after the batch read it as free
+            raced.append(True)
+            await main._insert_customer(app_store, CustomerItem(customerId=3, customerName="Cy", loyaltyTier=LoyaltyTier.BRONZE, email="a@example.com"))
+        return response
+
+    monkeypatch.setattr(state_client, "get_bulk_state", create_after_read)
+    response, = asyncio.run(app_requests(
+        ("POST", "/customers:batch", {"items": [_customer(1, "a@example.com"), _customer(2, "b@example.com")]}),
+    ))
+
+    assert response.json() == {"created": [2], "skipped": [], "skippedEmails": ["a@example.com"]}
+    assert asyncio.run(app_store.get_item(email_key("a@example.com"))) == email_claim(3)
+    assert asyncio.run(app_store.get_item("1")) is None
+
+
+def test_batch_create_skips_existing_ids_and_taken_emails(app_store, app_requests):
+    asyncio.run(app_requests(("POST", "/customers", _customer(1, "a@example.com"))))
+    response, = asyncio.run(app_requests(("POST", "/customers:batch", {"items": [
+        _customer(1, "x@example.com"),
+        _customer(2, "A@example.com"),
+        _customer(3, "c@example.com"),
+    ]})))
+
+    assert response.json() == {"created": [3], "skipped": [1], "skippedEmails": ["A@example.com"]}
+    assert asyncio.run(app_store.get_item(email_key("x@example.com"))) is None
+
+
+def test_reindex_only_claims_unclaimed_emails(app_store, app_requests):
+    asyncio.run(app_store.save_items({
+        "1": {"customer_id": 1, "customer_name": "Ada", "email": "a@example.com", "loyalty_tier": "BRONZE"},
+        "2": {"customer_id": 2, "customer_name": "Bob", "email": "b@example.com", "loyalty_tier": "BRONZE"},
+        "3": {"customer_id": 3, "customer_name": "Cy", "email": "B@example.com", "loyalty_tier": "BRONZE"},
+        # Claimed by a customer created while the scan ran
+        email_key("a@example.com"): email_claim(4),
+    }))
+    response, = asyncio.run(app_requests(("POST", "/customers:reindex", None)))
+
+    assert response.json() == {"customers": 3, "duplicates": ["a@example.com", "b@example.com"]}
+    claims = asyncio.run(app_store.get_items([email_key("a@example.com"), email_key("b@example.com")]))
+    assert claims == {email_key("a@example.com"): email_claim(4), email_key("b@example.com"): email_claim(2)}
+
+
+def test_writes_that_change_nothing_leave_no_records(app_store, app_requests, state_client):
+    asyncio.run(app_requests(("POST", "/customers", _customer(1, "a@example.com"))))
+    # The second delete may find the customer, then its claim already gone
+    responses = asyncio.run(app_requests(
+        ("POST", "/customers", _customer(2, "a@example.com")),
+        ("DELETE", "/customers/1", None),
+        ("DELETE", "/customers/1", None),
+    ))
+
+    assert [response.status_code for response in responses[:2]] == [409, 204]
+    assert responses[2].status_code in (204, 404)
+    assert state_client._items(app_store.store_name) == {}
+
+
+def test_fast_path_matches_the_response_model():
+    customer = CustomerItem(customerId=1, customerName="Ada", loyaltyTier="GOLD", email="ada@example.com")
+    assert CustomerResponse.dict_from_db(customer.to_db_dict()) == CustomerResponse.from_customer_item(customer).model_dump(mode="json")
@@ -1,16 +1,22 @@
+import asyncio
 import logging
 import os
 import time
 from contextlib import asynccontextmanager
-from typing import Optional
-import random
+from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from models import Order, OrderCreateRequest, OrderStatusUpdateRequest, OrderResponse, OrderListResponse, OrderStatus, OrderItem
-from dapr_client import DaprStateStore
+from models import Order, OrderCreateRequest, OrderStatusUpdateRequest, OrderResponse, OrderListResponse, OrderStatus, OrderItem, OrderBatchRequest, OrderBatchResponse, OrderReindexResponse, OrderSummaryResponse, OrderSummaryReconcileResponse, OrderStatusBatchRequest, OrderStatusBatchResponse, OrderStatusFailure
+from dapr_client import DaprStateStore, ETagMismatchError, QUERY_PAGE_SIZE
+from common.responses import conditional_response, json_response, list_response, ndjson_line
+from common.ids import IdAllocator
+from common.query import build_query, resolve_sort
+from common.records import Changes, insert_with_records, read_records, update_records
+from common.indexes import with_ids, without_ids, page_ids
+from order_records import customer_index_key, status_counts_key, all_status_counts_keys, with_statuses, sum_status_counts, transition_error
 
 # Configure logging
 logging.basicConfig(
@@ -22,17 +28,56 @@ logger = logging.getLogger(__name__)
 # Global state store instance
 state_store = None
 
+# Hands out order IDs for creates that do not supply one
+id_allocator = None
+
+# Largest page a client may request from a list endpoint
+MAX_PAGE_SIZE = 1000
+
+# List sort parameter to stored field
+SORT_FIELDS = {
+    "orderId": "order_id",
+    "customerId": "customer_id",
+    "status": "status",
+}
+
+# Customers whose index records a batch create updates at the same time
+BATCH_INDEX_CONCURRENCY = int(os.getenv("BATCH_INDEX_CONCURRENCY", "16"))
+
+# Orders written per state transaction by a batch status update
+STATUS_BATCH_CHUNK_SIZE = int(os.getenv("STATUS_BATCH_CHUNK_SIZE", "200"))
+
+# Seconds between background reconciles of the status counters; 0 disables them
+STATUS_RECONCILE_INTERVAL = float(os.getenv("STATUS_RECONCILE_INTERVAL", "0"))
+
+
+async def _reconcile_periodically(store: DaprStateStore):
+    """Reconcile the status counters every STATUS_RECONCILE_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(STATUS_RECONCILE_INTERVAL)
+        try:
+            await _reconcile_status_counts(store)
+        except Exception as e:
+            logger.error(f"Error reconciling order status counters: {str(e)}")
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global state_store
+    global state_store, id_allocator
     state_store = DaprStateStore()
+    id_allocator = IdAllocator(state_store)
+    reconciler = None
+    if STATUS_RECONCILE_INTERVAL > 0:
+        reconciler = asyncio.create_task(_reconcile_periodically(state_store))
+        logger.info(f"Reconciling order status counters every {STATUS_RECONCILE_INTERVAL}s")
     logger.info("Orders service started")
     yield
     # Shutdown
     logger.info("Orders service shutting down")
+    if reconciler:
+        reconciler.cancel()
+    await state_store.close()
 
 
 # Create FastAPI app
@@ -51,6 +96,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 
@@ -64,6 +110,67 @@ def get_state_store() -> DaprStateStore:
     return state_store
 
 
+async def _insert_order(store: DaprStateStore, order: Order) -> bool:
+    """Save a new order with its customer's index and status count in one transaction; False if the ID is taken."""
+    customer_key = customer_index_key(order.customerId)
+    counts_key = status_counts_key(order.customerId)
+
+    def apply(records: dict) -> Changes:
+        return Changes(
+            {
+                customer_key: with_ids(records[customer_key], [order.orderId]),
+                counts_key: with_statuses(records[counts_key], [order.status.value])
+            },
+            []
+        )
+
+    return await insert_with_records(store, str(order.orderId), order.to_db_dict(), [customer_key, counts_key], apply)
+
+
+async def _reconcile_status_counts(store: DaprStateStore) -> OrderSummaryReconcileResponse:
+    """
+    Rebuild the status counter shards from a paged scan of all orders.
+
+    The shards' ETags are read before the scan and each rebuilt shard is
+    written only if its ETag is unchanged, or created only if it is still
+    missing. Every order write updates its shard in the same transaction,
+    so a shard whose orders changed during the scan is left alone rather
+    than overwritten with stale counts; the next reconcile picks it up.
+    """
+    start_time = time.time()
+    keys = all_status_counts_keys()
+    shards = await read_records(store, keys)
+
+    counts = {key: {} for key in keys}
+    scanned = 0
+    async for result in store.iter_items({"filter": {}}):
+        try:
+            order = result['value']
+            shard = counts[status_counts_key(order["customer_id"])]
+            shard[order["status"]] = shard.get(order["status"], 0) + 1
+            scanned += 1
+        except Exception as e:
+            logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
+            continue
+
+    async def rebuild(key: str) -> bool:
+        etag = shards[key][1]
+        # A shard missing before the scan is only created if no order write created it meanwhile
+        if not etag:
+            return not counts[key] or await store.insert_item(key, {"counts": counts[key]})
+        try:
+            await store.save_item(key, {"counts": counts[key]}, etag=etag)
+            return True
+        except ETagMismatchError:
+            return False
+
+    rebuilt = await asyncio.gather(*(rebuild(key) for key in keys))
+
+    elapsed = (time.time() - start_time) * 1000
+    logger.info(f"Reconciled order status counters from {scanned} orders in {elapsed:.2f}ms, "
+                f"{rebuilt.count(False)} shards changed during the scan")
+
+    return OrderSummaryReconcileResponse(orders=scanned, rebuilt=rebuilt.count(True), skipped=rebuilt.count(False))
 
 
 @app.get("/health")
@@ -72,28 +179,69 @@ async def health_check():
     return {"status": "healthy", "service": "orders"}
 
 
+@app.get("/metrics")
+async def store_metrics(store: DaprStateStore = Depends(get_state_store)):
+    """State store call counts, errors and latency for this worker."""
+    return store.metrics.snapshot()
+
+
+async def _stream_orders(store: DaprStateStore, query: dict, page_size: int):
+    """Yield orders as NDJSON lines, one state query page at a time."""
+    async for result in store.iter_items(query, page_size):
+        try:
+            item = OrderResponse.dict_from_db(result['value'])
+        except Exception as e:
+            logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
+            continue
+        yield ndjson_line(item)
+
+
 @app.get("/orders", response_model=OrderListResponse)
 async def list_orders(
+    request: Request,
+    customerId: Optional[int] = Query(None, description="Only orders placed by this customer"),
+    order_status: Optional[OrderStatus] = Query(None, alias="status", description="Only orders in this status"),
+    sort: Optional[str] = Query(None, description="Field to sort by: " + ", ".join(SORT_FIELDS)),
+    sort_order: str = Query("asc", alias="order", pattern="^(asc|desc)$", description="Sort direction"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of orders to return"),
+    cursor: Optional[str] = Query(None, description="nextCursor from a previous page"),
+    stream: bool = Query(False, description="Stream every order as NDJSON, fetching limit items per page"),
     store: DaprStateStore = Depends(get_state_store)
 ):
-    """Get all orders."""
+    """List orders matching the optional filters, or one page of them when limit or cursor is given."""
+    # Filters and sort are evaluated by the state store, not in this service
+    query = build_query(
+        {
+            "customer_id": customerId,
+            "status": order_status.value if order_status else None
+        },
+        resolve_sort(sort, SORT_FIELDS),
+        sort_order == "desc"
+    )
+    
+    if stream:
+        return StreamingResponse(
+            _stream_orders(store, query, limit or QUERY_PAGE_SIZE),
+            media_type="application/x-ndjson"
+        )
+    
     start_time = time.time()
     
     try:
-        # Simple query with empty filter to get all items
-        query = {
-            "filter": {}
-        }
+        # Page limits the result when requested
+        if limit or cursor:
+            query["page"] = {"limit": limit or QUERY_PAGE_SIZE}
+            if cursor:
+                query["page"]["token"] = cursor
         
         # Execute the query
-        results, _ = await store.query_items(query)
+        results, next_cursor = await store.query_items(query)
         
-        # Convert results to OrderResponse objects
+        # Map stored items straight to response dicts
         items = []
         for result in results:
             try:
-                order = Order.from_db_dict(result['value'])
-                items.append(OrderResponse.from_order(order))
+                items.append(OrderResponse.dict_from_db(result['value']))
             except Exception as e:
                 logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
                 continue
@@ -101,7 +249,7 @@ async def list_orders(
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Retrieved {len(items)} orders in {elapsed:.2f}ms")
         
-        return OrderListResponse(items=items, total=len(items))
+        return list_response(items, next_cursor, request)
         
     except Exception as e:
         elapsed = (time.time() - start_time) * 1000
@@ -112,6 +260,47 @@ async def list_orders(
         )
 
 
+@app.get("/customers/{customer_id}/orders", response_model=OrderListResponse)
+async def list_customer_orders(
+    request: Request,
+    customer_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of orders to return"),
+    cursor: Optional[str] = Query(None, description="nextCursor from a previous page"),
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """List a customer's orders in order ID order with one index read and one bulk get."""
+    start_time = time.time()
+    
+    try:
+        index = await store.get_item(customer_index_key(customer_id)) or {}
+        order_ids, next_cursor = page_ids(index, limit, cursor)
+        
+        orders = await store.get_items([str(order_id) for order_id in order_ids]) if order_ids else {}
+        
+        # Map stored items straight to response dicts
+        items = []
+        for order_id in order_ids:
+            data = orders.get(str(order_id))
+            if data is None:
+                logger.warning(f"Order {order_id} is in the index of customer {customer_id} but was not found")
+                continue
+            items.append(OrderResponse.dict_from_db(data))
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Retrieved {len(items)} orders for customer {customer_id} in {elapsed:.2f}ms")
+        
+        return list_response(items, next_cursor, request)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing orders for customer {customer_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list customer orders: {str(e)}"
+        )
+
+
 @app.post("/orders", response_model=OrderResponse, status_code=status.HTTP_201_CREATED)
 async def create_order(
     request: OrderCreateRequest,
@@ -121,47 +310,40 @@ async def create_order(
     start_time = time.time()
     
     try:
-        # Use provided order ID or generate a unique one
-        if request.orderId:
-            order_id = request.orderId
-            # Check if ID already exists
-            existing = await store.get_item(str(order_id))
-            if existing:
-                raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
-                    detail=f"Order with ID {order_id} already exists"
-                )
-        else:
-            # Generate a unique order ID
-            order_id = random.randint(3001, 999999)
-            # Check if ID already exists
-            existing = await store.get_item(str(order_id))
-            while existing:
-                order_id = random.randint(3001, 999999)
-                existing = await store.get_item(str(order_id))
-        
         # Convert request items to OrderItem objects
         order_items = [
             OrderItem(productId=item.productId, quantity=item.quantity)
             for item in request.items
         ]
         
-        # Create order
-        order = Order(
-            orderId=order_id,
-            customerId=request.customerId,
-            items=order_items,
-            status=OrderStatus.PENDING
-        )
-        
-        # Save to state store
-        await store.save_item(str(order_id), order.to_db_dict())
+        # Use provided order ID or allocate one
+        order_id = request.orderId or await id_allocator.next_id()
+        while True:
+            order = Order(
+                orderId=order_id,
+                customerId=request.customerId,
+                items=order_items,
+                status=OrderStatus.PENDING
+            )
+            
+            # Inserted only if the ID is free, together with the customer's index; an existing order is reported rather than overwritten
+            if await _insert_order(store, order):
+                break
+            if request.orderId:
+                raise HTTPException(
+                    status_code=status.HTTP_409_CONFLICT,
+                    detail=f"Order with ID {order_id} already exists"
+                )
+            # Only reachable if a client picked an allocated ID explicitly; take the next one
+            order_id = await id_allocator.next_id()
         
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Created order {order_id} for customer {request.customerId} in {elapsed:.2f}ms")
         
         return OrderResponse.from_order(order)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating order: {str(e)}")
         raise HTTPException(
@@ -170,16 +352,185 @@ async def create_order(
         )
 
 
+@app.post("/orders:batch", response_model=OrderBatchResponse, status_code=status.HTTP_201_CREATED)
+async def create_orders_batch(
+    request: OrderBatchRequest,
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """
+    Create many orders with one state transaction per customer.
+
+    Each customer's new orders are inserted with first-write upserts in the
+    transaction that updates its index and status counter. Orders whose ID
+    exists, even if a concurrent request created it after the batch
+    started, are skipped rather than overwritten.
+    """
+    start_time = time.time()
+    
+    try:
+        # Generate IDs for the items that did not supply one
+        missing_count = sum(1 for item in request.items if not item.orderId)
+        generated_ids = iter(await id_allocator.allocate(missing_count))
+        
+        orders = {}
+        for item in request.items:
+            order_id = item.orderId or next(generated_ids)
+            order = Order(
+                orderId=order_id,
+                customerId=item.customerId,
+                items=[OrderItem(productId=i.productId, quantity=i.quantity) for i in item.items],
+                status=OrderStatus.PENDING
+            )
+            orders[str(order_id)] = order.to_db_dict()
+        
+        by_customer = {}
+        for key, order in orders.items():
+            by_customer.setdefault(order["customer_id"], {})[key] = order
+        
+        semaphore = asyncio.Semaphore(BATCH_INDEX_CONCURRENCY)
+        
+        async def save_customer_orders(customer_id: int, customer_orders: dict) -> List[str]:
+            customer_key = customer_index_key(customer_id)
+            counts_key = status_counts_key(customer_id)
+            
+            def apply(records: dict) -> Changes:
+                new = {key: order for key, order in customer_orders.items() if records[key] is None}
+                if not new:
+                    return Changes({}, [], [])
+                return Changes(
+                    {
+                        **new,
+                        customer_key: with_ids(records[customer_key], [order["order_id"] for order in new.values()]),
+                        counts_key: with_statuses(records[counts_key], [order["status"] for order in new.values()])
+                    },
+                    [],
+                    list(new)
+                )
+            
+            async with semaphore:
+                return await update_records(store, [customer_key, counts_key], apply, items=list(customer_orders))
+        
+        inserted = set()
+        for keys in await asyncio.gather(*(
+            save_customer_orders(customer_id, customer_orders)
+            for customer_id, customer_orders in by_customer.items()
+        )):
+            inserted.update(keys)
+        created = [int(key) for key in orders if key in inserted]
+        skipped = [int(key) for key in orders if key not in inserted]
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Batch created {len(created)} orders ({len(skipped)} skipped) in {elapsed:.2f}ms")
+        
+        return OrderBatchResponse(created=created, skipped=skipped)
+        
+    except Exception as e:
+        logger.error(f"Error creating order batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create order batch: {str(e)}"
+        )
+
+
+@app.post("/orders:reindex", response_model=OrderReindexResponse)
+async def reindex_orders(
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """
+    Rebuild every customer's order index from a paged scan of all orders.
+
+    Needed once for orders written before the indexes existed. Indexes are
+    overwritten without ETag checks, so run it while no orders are written.
+    """
+    start_time = time.time()
+    
+    try:
+        by_customer = {}
+        indexed = 0
+        async for result in store.iter_items({"filter": {}}):
+            try:
+                order = result['value']
+                by_customer.setdefault(order["customer_id"], []).append(order["order_id"])
+                indexed += 1
+            except Exception as e:
+                logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
+                continue
+        
+        await store.save_items({
+            customer_index_key(customer_id): with_ids({}, order_ids)
+            for customer_id, order_ids in by_customer.items()
+        })
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Reindexed {indexed} orders of {len(by_customer)} customers in {elapsed:.2f}ms")
+        
+        return OrderReindexResponse(customers=len(by_customer), orders=indexed)
+        
+    except Exception as e:
+        logger.error(f"Error reindexing orders: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reindex orders: {str(e)}"
+        )
+
+
+@app.get("/orders/summary", response_model=OrderSummaryResponse)
+async def get_order_summary(
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """Count orders per status from the status counters with one bulk get, however many orders exist."""
+    start_time = time.time()
+    
+    try:
+        shards = await store.get_items(all_status_counts_keys())
+        totals = sum_status_counts(shards.values())
+        counts = {order_status.value: totals.get(order_status.value, 0) for order_status in OrderStatus}
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Retrieved order summary in {elapsed:.2f}ms")
+        
+        return json_response({"counts": counts, "total": sum(counts.values())})
+        
+    except Exception as e:
+        logger.error(f"Error retrieving order summary: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve order summary: {str(e)}"
+        )
+
+
+@app.post("/orders/summary:reconcile", response_model=OrderSummaryReconcileResponse)
+async def reconcile_order_summary(
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """
+    Rebuild the status counters from a scan of all orders to correct drift.
+
+    Also needed once for orders written before the counters existed. Can run
+    while orders are written; shards that change during the scan are skipped.
+    """
+    try:
+        return await _reconcile_status_counts(store)
+        
+    except Exception as e:
+        logger.error(f"Error reconciling order summary: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reconcile order summary: {str(e)}"
+        )
+
+
 @app.get("/orders/{order_id}", response_model=OrderResponse)
 async def get_order(
     order_id: int,
+    request: Request,
     store: DaprStateStore = Depends(get_state_store)
 ):
     """Retrieve order details."""
     start_time = time.time()
     
     try:
-        data = await store.get_item(str(order_id))
+        data, etag = await store.get_item_with_etag(str(order_id))
         
         if not data:
             raise HTTPException(
@@ -187,12 +538,10 @@ async def get_order(
                 detail=f"Order {order_id} not found"
             )
         
-        order = Order.from_db_dict(data)
-        
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Retrieved order {order_id} in {elapsed:.2f}ms")
         
-        return OrderResponse.from_order(order)
+        return conditional_response(request, OrderResponse.dict_from_db(data), etag)
         
     except HTTPException:
         raise
@@ -223,26 +572,35 @@ async def update_order_status(
                 detail=f"Order {order_id} not found"
             )
         
-        order = Order.from_db_dict(data)
+        key = str(order_id)
+        counts_key = status_counts_key(data["customer_id"])
         
-        # Validate status transition (basic validation)
-        if order.status == OrderStatus.DELIVERED and request.status != OrderStatus.DELIVERED:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Cannot change status of a delivered order"
-            )
-        
-        if order.status == OrderStatus.CANCELLED:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="Cannot change status of a cancelled order"
-            )
-        
-        # Update status
-        order.status = request.status
+        def apply(records: dict) -> Changes:
+            if not records[key]:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Order {order_id} not found"
+                )
+            
+            order = Order.from_db_dict(records[key])
+            
+            # Validate status transition (basic validation)
+            error = transition_error(order.status.value, request.status.value)
+            if error:
+                raise HTTPException(
+                    status_code=status.HTTP_400_BAD_REQUEST,
+                    detail=error
+                )
+            
+            # Update status, moving the order between counters in the same transaction
+            previous = order.status
+            order.status = request.status
+            upserts = {key: order.to_db_dict()}
+            if order.status != previous:
+                upserts[counts_key] = with_statuses(records[counts_key], [order.status.value], [previous.value])
+            return Changes(upserts, [], order)
         
-        # Save back to state store
-        await store.save_item(str(order_id), order.to_db_dict())
+        order = await update_records(store, [counts_key], apply, items=[key])
         
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Updated order {order_id} status to {request.status} in {elapsed:.2f}ms")
@@ -259,6 +617,84 @@ async def update_order_status(
         )
 
 
+@app.put("/orders/status:batch", response_model=OrderStatusBatchResponse)
+async def update_order_status_batch(
+    request: OrderStatusBatchRequest,
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """
+    Move many orders to one status with bulk gets and chunked state transactions.
+
+    Each chunk of STATUS_BATCH_CHUNK_SIZE orders is read together with the
+    status counters in one bulk get, checked against the transition rules in
+    memory and written in one transaction. Orders that are missing or may not
+    make the transition are reported as failed; the others are updated.
+    """
+    start_time = time.time()
+    target = request.status.value
+    counts_keys = all_status_counts_keys()
+    
+    def apply_chunk(order_ids: list, records: dict) -> Changes:
+        upserts = {}
+        counts = {}
+        succeeded = []
+        failed = []
+        for order_id in order_ids:
+            data = records[str(order_id)]
+            if data is None:
+                failed.append(OrderStatusFailure(orderId=order_id, reason=f"Order {order_id} not found"))
+                continue
+            error = transition_error(data["status"], target)
+            if error:
+                failed.append(OrderStatusFailure(orderId=order_id, reason=error))
+                continue
+            
+            upserts[str(order_id)] = {**data, "status": target}
+            if data["status"] != target:
+                counts_key = status_counts_key(data["customer_id"])
+                added, removed = counts.setdefault(counts_key, ([], []))
+                added.append(target)
+                removed.append(data["status"])
+            succeeded.append(order_id)
+        
+        for counts_key, (added, removed) in counts.items():
+            upserts[counts_key] = with_statuses(records[counts_key], added, removed)
+        return Changes(upserts, [], (succeeded, failed))
+    
+    try:
+        succeeded = []
+        failed = []
+        # Chunks run one after another, as every chunk may move orders between the same counters
+        for start in range(0, len(request.orderIds), STATUS_BATCH_CHUNK_SIZE):
+            order_ids = request.orderIds[start:start + STATUS_BATCH_CHUNK_SIZE]
+            try:
+                chunk_succeeded, chunk_failed = await update_records(
+                    store,
+                    counts_keys,
+                    lambda records: apply_chunk(order_ids, records),
+                    items=[str(order_id) for order_id in order_ids]
+                )
+            except Exception as e:
+                logger.error(f"Error updating status of {len(order_ids)} orders: {str(e)}")
+                chunk_succeeded = []
+                chunk_failed = [OrderStatusFailure(orderId=order_id, reason=f"Failed to update order status: {str(e)}")
+                                for order_id in order_ids]
+            succeeded.extend(chunk_succeeded)
+            failed.extend(chunk_failed)
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Updated {len(succeeded)} orders to {target} ({len(failed)} failed) in {elapsed:.2f}ms")
+        
+        return OrderStatusBatchResponse(succeeded=succeeded, failed=failed)
+        
+    except Exception as e:
+        logger.error(f"Error updating order status batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to update order status: {str(e)}"
+        )
+
+
 @app.delete("/orders/{order_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def delete_order(
     order_id: int,
@@ -277,8 +713,23 @@ async def delete_order(
                 detail=f"Order {order_id} not found"
             )
         
-        # Delete from state store
-        await store.delete_item(str(order_id))
+        # Delete in one transaction with the removal from the customer's index and status counter
+        key = str(order_id)
+        customer_key = customer_index_key(data["customer_id"])
+        counts_key = status_counts_key(data["customer_id"])
+        
+        def apply(records: dict) -> Changes:
+            if records[key] is None:
+                return Changes({}, [])
+            return Changes(
+                {
+                    customer_key: without_ids(records[customer_key], [order_id]),
+                    counts_key: with_statuses(records[counts_key], removed=[records[key]["status"]])
+                },
+                [key]
+            )
+        
+        await update_records(store, [customer_key, counts_key], apply, items=[key])
         
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Deleted order {order_id} in {elapsed:.2f}ms")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from typing import Dict, List, Optional
 from enum import Enum
 import uuid
 
@@ -96,7 +96,74 @@ class OrderResponse(BaseModel):
             status=order.status
         )
 
+    @staticmethod
+    def dict_from_db(data: dict) -> dict:
+        """Map a stored order straight to its response JSON shape, without pydantic validation."""
+        return {
+            "orderId": data["order_id"],
+            "customerId": data["customer_id"],
+            "items": [
+                {"productId": item["product_id"], "quantity": item["quantity"]}
+                for item in data["items"]
+            ],
+            "status": data["status"]
+        }
+
 
 class OrderListResponse(BaseModel):
     items: List[OrderResponse]
-    total: int
\ No newline at end of file
+    total: int
+    nextCursor: Optional[str] = Field(None, description="Cursor for the next page, if more items may exist")
+
+
+class OrderBatchRequest(BaseModel):
+    items: List[OrderCreateRequest] = Field(..., min_items=1, max_items=10000, description="Orders to create")
+
+    @validator('items')
+    def validate_unique_ids(cls, v):
+        order_ids = [item.orderId for item in v if item.orderId]
+        if len(order_ids) != len(set(order_ids)):
+            raise ValueError('Duplicate order IDs in batch')
+        return v
+
+
+class OrderBatchResponse(BaseModel):
+    created: List[int] = Field(..., description="IDs of created orders, in request order")
+    skipped: List[int] = Field(..., description="Requested IDs that already existed and were left unchanged")
+
+
+class OrderReindexResponse(BaseModel):
+    customers: int = Field(..., description="Number of customers whose index was rebuilt")
+    orders: int = Field(..., description="Number of orders indexed")
+
+
+class OrderSummaryResponse(BaseModel):
+    counts: Dict[str, int] = Field(..., description="Number of orders in each status")
+    total: int = Field(..., description="Number of orders")
+
+
+class OrderSummaryReconcileResponse(BaseModel):
+    orders: int = Field(..., description="Number of orders scanned")
+    rebuilt: int = Field(..., description="Number of counter shards rebuilt from the scan")
+    skipped: int = Field(..., description="Number of counter shards left alone because orders changed during the scan")
+
+
+class OrderStatusBatchRequest(BaseModel):
+    orderIds: List[int] = Field(..., min_items=1, max_items=10000, description="Orders to update")
+    status: OrderStatus = Field(..., description="New status for every order")
+
+    @validator('orderIds')
+    def validate_unique_ids(cls, v):
+        if len(v) != len(set(v)):
+            raise ValueError('Duplicate order IDs in batch')
+        return v
+
+
+class OrderStatusFailure(BaseModel):
+    orderId: int
+    reason: str
+
+
+class OrderStatusBatchResponse(BaseModel):
+    succeeded: List[int] = Field(..., description="IDs of updated orders, in request order")
+    failed: List[OrderStatusFailure] = Field(..., description="Orders left unchanged, with the reason")
@@ -0,0 +1,52 @@
+import os
+from typing import Dict, Iterable, List, Optional
+
+from common.state import META_KEY_PREFIX
+
+# Number of records the per-status order counts are spread over. Orders are
+# assigned by customer, so creates of different customers rarely contend for
+# the same counter. Run POST /orders/summary:reconcile after changing it.
+STATUS_COUNTER_SHARDS = int(os.getenv("STATUS_COUNTER_SHARDS", "16"))
+
+
+def customer_index_key(customer_id: int) -> str:
+    """Key of the record listing a customer's order IDs (see common.indexes), stored next to the orders."""
+    return f"{META_KEY_PREFIX}customer-orders:{customer_id}"
+
+
+def status_counts_key(customer_id: int) -> str:
+    """Key of the status counter shard that counts the orders of a customer."""
+    return f"{META_KEY_PREFIX}status-counts:{customer_id % STATUS_COUNTER_SHARDS}"
+
+
+def all_status_counts_keys() -> List[str]:
+    """Keys of every status counter shard."""
+    return [f"{META_KEY_PREFIX}status-counts:{shard}" for shard in range(STATUS_COUNTER_SHARDS)]
+
+
+def with_statuses(counts: dict, added: Iterable[str] = (), removed: Iterable[str] = ()) -> dict:
+    """Return a copy of a status counter shard with orders in the added and removed statuses counted."""
+    counts = dict(counts.get("counts", {}))
+    for order_status in added:
+        counts[order_status] = counts.get(order_status, 0) + 1
+    for order_status in removed:
+        counts[order_status] = counts.get(order_status, 0) - 1
+    return {"counts": counts}
+
+
+def sum_status_counts(shards: Iterable[Optional[dict]]) -> Dict[str, int]:
+    """Add up the counts of several status counter shards; missing shards count nothing."""
+    totals = {}
+    for shard in shards:
+        for order_status, count in (shard or {}).get("counts", {}).items():
+            totals[order_status] = totals.get(order_status, 0) + count
+    return totals
+
+
+def transition_error(current: str, target: str) -> Optional[str]:
+    """Return why an order cannot move from status current to target, or None if it can."""
+    if current == "DELIVERED" and target != "DELIVERED":
+        return "Cannot change status of a delivered order"
+    if current == "CANCELLED":
+        return "Cannot change status of a cancelled order"
+    return None
@@ -0,0 +1,156 @@
+"""Tests for the orders service's create path, customer index and status counters."""
+import asyncio
+
+import pytest
+
+import main
+from models import Order, OrderItem, OrderResponse, OrderStatus
+from order_records import customer_index_key, status_counts_key
+
+
+def _order(order_id, customer_id):
+    return {"orderId": order_id, "customerId": customer_id, "items": [{"productId": 1, "quantity": 1}]}
+
+
+def test_concurrent_creates_of_one_id_insert_once(app_store, app_requests):
+    # Orders of different customers share no index or counter record whose ETag could catch the race
+    responses = asyncio.run(app_requests(("POST", "/orders", _order(7, 1)), ("POST", "/orders", _order(7, 2))))
+
+    assert sorted(response.status_code for response in responses) == [201, 409]
+    order = asyncio.run(app_store.get_item("7"))
+    indexes = asyncio.run(app_store.get_items([customer_index_key(1), customer_index_key(2)]))
+    assert indexes[customer_index_key(order["customer_id"])]["ids"] == [7]
+    assert [index.get("ids") for index in indexes.values()].count([7]) == 1
+    summary = asyncio.run(app_requests(("GET", "/orders/summary", None)))[0].json()
+    assert summary["total"] == 1
+
+
+def test_concurrent_creates_without_ids_get_distinct_ids(app_store, app_requests):
+    responses = asyncio.run(app_requests(*(("POST", "/orders", _order(None, 1)) for _ in range(5))))
+
+    assert [response.status_code for response in responses] == [201] * 5
+    order_ids = sorted(response.json()["orderId"] for response in responses)
+    assert len(set(order_ids)) == 5
+    assert asyncio.run(app_store.get_item(customer_index_key(1)))["ids"] == order_ids
+
+
+def test_batch_create_racing_a_single_create_inserts_once(app_store, app_requests, state_client, monkeypatch):
+    get_bulk_state = state_client.get_bulk_state
+    raced = []
+
+    async def create_after_read(store_name, keys, **kwargs):
+        response = await get_bulk_state(store_name, keys, **kwargs)
+        if "7" in keys and not raced:
+            # A single create inserts order 7 right after the batch read its ID as free
+            raced.append(True)
+            order = Order(orderId=7, customerId=2, items=[OrderItem(productId=1, quantity=1)], status=OrderStatus.PENDING)
+            await main._insert_order(app_store, order)
+        return response
+
+    monkeypatch.setattr(state_client, "get_bulk_state", create_after_read)
+    response, = asyncio.run(app_requests(("POST", "/orders:batch", {"items": [_order(7, 1), _order(8, 1)]})))
+
+    assert response.json()["created"] == [8]
+    assert response.json()["skipped"] == [7]
+    assert asyncio.run(app_store.get_item("7"))["customer_id"] == 2
+    assert asyncio.run(app_store.get_item(customer_index_key(1)))["ids"] == [8]
+    assert asyncio.run(app_store.get_item(customer_index_key(2)))["ids"] == [7]
+    summary = asyncio.run(app_requests(("GET", "/orders/summary", None)))[0].json()
+    assert summary["total"] == 2
+
+
+def test_reconcile_rebuilds_drifted_counters(app_store, app_requests):
+    asyncio.run(app_requests(*(("POST", "/orders", _order(order_id, 1)) for order_id in range(1, 4))))
+    asyncio.run(app_store.save_item(status_counts_key(1), {"counts": {"PENDING": 40}}))
+
+    response, = asyncio.run(app_requests(("POST", "/orders/summary:reconcile", None)))
+    assert response.json()["skipped"] == 0
+    summary, = asyncio.run(app_requests(("GET", "/orders/summary", None)))
+    assert summary.json()["counts"]["PENDING"] == 3
+
+
+def test_reconcile_skips_shards_written_during_the_scan(app_store, app_requests, monkeypatch):
+    asyncio.run(app_requests(("POST", "/orders", _order(1, 1))))
+    iter_items = app_store.iter_items
+
+    async def scan_with_concurrent_create(query, *args):
+        async for result in iter_items(query, *args):
+            yield result
+        # An order created after the scan read its customer's orders
+        await app_requests(("POST", "/orders", _order(2, 1)))
+
+    monkeypatch.setattr(app_store, "iter_items", scan_with_concurrent_create)
+    response, = asyncio.run(app_requests(("POST", "/orders/summary:reconcile", None)))
+
+    assert response.status_code == 200
+    assert response.json()["skipped"] == 1
+    # The skipped shard keeps the create's count rather than the scan's stale one
+    assert asyncio.run(app_store.get_item(status_counts_key(1)))["counts"]["PENDING"] == 2
+
+
+def test_duplicate_create_returns_conflict(app_store, app_requests):
+    created, = asyncio.run(app_requests(("POST", "/orders", _order(7, 1))))
+    duplicate, = asyncio.run(app_requests(("POST", "/orders", _order(7, 1))))
+
+    assert (created.status_code, duplicate.status_code) == (201, 409)
+    assert asyncio.run(app_store.get_item(customer_index_key(1)))["ids"] == [7]
+
+
+def test_list_filters_and_sorts_in_the_store(app_store, app_requests):
+    asyncio.run(app_requests(*(("POST", "/orders", _order(order_id, order_id % 2)) for order_id in range(1, 6))))
+
+    response, = asyncio.run(app_requests(("GET", "/orders?customerId=1&sort=orderId&order=desc", None)))
+    assert [item["orderId"] for item in response.json()["items"]] == [5, 3, 1]
+
+    response, = asyncio.run(app_requests(("GET", "/orders?sort=total", None)))
+    assert response.status_code == 400
+
+
+def test_fast_path_matches_the_response_model():
+    order = Order(orderId=1, customerId=2, items=[OrderItem(productId=3, quantity=4)], status=OrderStatus.SHIPPED)
+    assert OrderResponse.dict_from_db(order.to_db_dict()) == OrderResponse.from_order(order).model_dump(mode="json")
+
+
+def test_status_batch_reports_missing_and_forbidden_orders(app_store, app_requests, monkeypatch):
+    monkeypatch.setattr(main, "STATUS_BATCH_CHUNK_SIZE", 2)
+    asyncio.run(app_requests(*(("POST", "/orders", _order(order_id, order_id)) for order_id in range(1, 5))))
+    asyncio.run(app_requests(("PUT", "/orders/2/status", {"status": "DELIVERED"})))
+    asyncio.run(app_requests(("PUT", "/orders/3/status", {"status": "CANCELLED"})))
+
+    response, = asyncio.run(app_requests(
+        ("PUT", "/orders/status:batch", {"orderIds": [1, 2, 3, 9, 4], "status": "SHIPPED"})
+    ))
+    assert response.status_code == 200
+    assert response.json()["succeeded"] == [1, 4]
+    assert {failure["orderId"]: failure["reason"] for failure in response.json()["failed"]} == {
+        2: "Cannot change status of a delivered order",
+        3: "Cannot change status of a cancelled order",
+        9: "Order 9 not found",
+    }
+    assert asyncio.run(app_store.get_item("1"))["status"] == "SHIPPED"
+    assert asyncio.run(app_store.get_item("2"))["status"] == "DELIVERED"
+    summary, = asyncio.run(app_requests(("GET", "/orders/summary", None)))
+    assert summary.json()["counts"]["SHIPPED"] == 2
+    assert summary.json()["counts"]["PENDING"] == 0
+
+
+def test_status_batch_and_single_updates_keep_counters_exact(app_store, app_requests):
+    asyncio.run(app_requests(*(("POST", "/orders", _order(order_id, order_id)) for order_id in range(1, 7))))
+    asyncio.run(app_requests(
+        ("PUT", "/orders/status:batch", {"orderIds": [1, 2, 3, 4], "status": "PAID"}),
+        ("PUT", "/orders/4/status", {"status": "CANCELLED"}),
+        ("PUT", "/orders/5/status", {"status": "SHIPPED"}),
+        ("PUT", "/orders/status:batch", {"orderIds": [5, 6], "status": "PROCESSING"}),
+    ))
+
+    orders = asyncio.run(app_store.get_items([str(order_id) for order_id in range(1, 7)]))
+    expected = {}
+    for order in orders.values():
+        expected[order["status"]] = expected.get(order["status"], 0) + 1
+    summary, = asyncio.run(app_requests(("GET", "/orders/summary", None)))
+    assert {key: count for key, count in summary.json()["counts"].items() if count} == expected
+
+
+def test_status_batch_rejects_duplicate_ids(app_store, app_requests):
+    response, = asyncio.run(app_requests(("PUT", "/orders/status:batch", {"orderIds": [1, 1], "status": "PAID"})))
+    assert response.status_code == 422
@@ -94,7 +94,25 @@ if check_status "200" "$http_code" "Get order" "$body"; then
 fi
 
 echo ""
-echo "4. Updating Order Status"
+echo "4. Listing Orders for Customer"
+echo "------------------------------"
+response=$(make_request_with_retry "GET" "$BASE_URL/customers/9999/orders" "")
+http_code=$(echo "$response" | tail -1)
+body=$(echo "$response" | sed '$d')
+
+if check_status "200" "$http_code" "List customer orders" "$body"; then
+    # The new order must be found through the customer's index
+    if echo "$body" | grep -q "\"orderId\":$ORDER_ID"; then
+        print_test_result "Verify order in customer index" "true"
+        ((TESTS_PASSED++))
+    else
+        print_test_result "Verify order in customer index" "false" "Order $ORDER_ID not listed for customer 9999"
+        ((TESTS_FAILED++))
+    fi
+fi
+
+echo ""
+echo "5. Updating Order Status"
 echo "------------------------"
 # Test valid status transitions
 STATUSES=("PAID" "PROCESSING" "SHIPPED" "DELIVERED")
@@ -122,7 +140,7 @@ for status in "${STATUSES[@]}"; do
 done
 
 echo ""
-echo "5. Testing Invalid Status Transition"
+echo "6. Testing Invalid Status Transition"
 echo "------------------------------------"
 # Try to update a delivered order (should fail)
 INVALID_UPDATE='{"status": "PENDING"}'
@@ -133,7 +151,7 @@ body=$(echo "$response" | sed '$d')
 check_status "400" "$http_code" "Invalid status transition" "$body"
 
 echo ""
-echo "6. Testing Invalid Status Value"
+echo "7. Testing Invalid Status Value"
 echo "--------------------------------"
 INVALID_STATUS='{"status": "INVALID_STATUS"}'
 
@@ -143,7 +161,7 @@ body=$(echo "$response" | sed '$d')
 check_status "422" "$http_code" "Invalid status value" "$body"
 
 echo ""
-echo "7. Creating Order with Duplicate Products"
+echo "8. Creating Order with Duplicate Products"
 echo "-----------------------------------------"
 DUPLICATE_ITEMS='{
     "customerId": 9998,
@@ -159,7 +177,7 @@ body=$(echo "$response" | sed '$d')
 check_status "422" "$http_code" "Duplicate products error" "$body"
 
 echo ""
-echo "8. Creating Order with Empty Items"
+echo "9. Creating Order with Empty Items"
 echo "-----------------------------------"
 EMPTY_ITEMS='{"customerId": 9997, "items": []}'
 
@@ -169,7 +187,7 @@ body=$(echo "$response" | sed '$d')
 check_status "422" "$http_code" "Empty items error" "$body"
 
 echo ""
-echo "9. Creating Order with Invalid Quantity"
+echo "10. Creating Order with Invalid Quantity"
 echo "----------------------------------------"
 INVALID_QUANTITY='{
     "customerId": 9996,
@@ -182,7 +200,7 @@ body=$(echo "$response" | sed '$d')
 check_status "422" "$http_code" "Invalid quantity error" "$body"
 
 echo ""
-echo "10. Testing 404 for Non-existent Order"
+echo "11. Testing 404 for Non-existent Order"
 echo "---------------------------------------"
 response=$(make_request_with_retry "GET" "$BASE_URL/orders/999999999" "")
 http_code=$(echo "$response" | tail -1)
@@ -190,7 +208,7 @@ body=$(echo "$response" | sed '$d')
 check_status "404" "$http_code" "Get non-existent order" "$body"
 
 echo ""
-echo "11. Creating Cancelled Order"
+echo "12. Creating Cancelled Order"
 echo "----------------------------"
 CANCEL_ORDER='{
     "customerId": 9995,
@@ -224,7 +242,7 @@ else
 fi
 
 echo ""
-echo "12. Cleaning Up Test Orders"
+echo "13. Cleaning Up Test Orders"
 echo "---------------------------"
 # Delete the main test order
 response=$(make_request_with_retry "DELETE" "$BASE_URL/orders/$ORDER_ID" "")
@@ -241,7 +259,7 @@ if [ ! -z "$CANCEL_ORDER_ID" ]; then
 fi
 
 echo ""
-echo "13. Verifying Cleanup"
+echo "14. Verifying Cleanup"
 echo "---------------------"
 response=$(make_request_with_retry "GET" "$BASE_URL/orders/$ORDER_ID" "")
 http_code=$(echo "$response" | tail -1)
@@ -1,15 +1,19 @@
+import asyncio
 import logging
 import os
 import time
 from contextlib import asynccontextmanager
 from typing import Optional
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from models import ProductItem, ProductCreateRequest, StockUpdateRequest, ProductResponse, ProductListResponse
-from dapr_client import DaprStateStore
+from models import ProductItem, ProductCreateRequest, StockUpdateRequest, ProductResponse, ProductListResponse, ProductBatchRequest, ProductBatchResponse, ProductReindexResponse
+from dapr_client import DaprStateStore, ETagMismatchError, QUERY_PAGE_SIZE
+from common.responses import conditional_response, list_response, ndjson_line
+from common.query import build_query, resolve_sort
+from stock import StockUpdateCombiner, update_stock, ProductNotFoundError, InsufficientStockError, StockUpdateConflictError
 
 # Configure logging
 logging.basicConfig(
@@ -21,16 +25,36 @@ logger = logging.getLogger(__name__)
 # Global state store instance
 state_store = None
 
+# Merges concurrent stock updates per product when STOCK_COMBINER_ENABLED is set
+stock_combiner = None
+
+# Largest page a client may request from a list endpoint
+MAX_PAGE_SIZE = 1000
+
+# Products a reindex rewrites at the same time
+REINDEX_CONCURRENCY = int(os.getenv("REINDEX_CONCURRENCY", "16"))
+
+# List sort parameter to stored field
+SORT_FIELDS = {
+    "productId": "product_id",
+    "productName": "product_name",
+    "stockOnHand": "stock_on_hand",
+}
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global state_store
+    global state_store, stock_combiner
     state_store = DaprStateStore()
+    if os.getenv("STOCK_COMBINER_ENABLED", "false").lower() == "true":
+        stock_combiner = StockUpdateCombiner(state_store)
+        logger.info("Stock update combiner enabled")
     logger.info("Product service started")
     yield
     # Shutdown
     logger.info("Product service shutting down")
+    await state_store.close()
 
 
 # Create FastAPI app
@@ -49,6 +73,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 
@@ -62,34 +87,98 @@ def get_state_store() -> DaprStateStore:
     return state_store
 
 
+async def apply_stock_delta(store: DaprStateStore, product_id: int, delta: int) -> ProductItem:
+    """Apply a stock delta through the combiner when enabled, else with an ETag retry loop."""
+    if stock_combiner is not None:
+        return await stock_combiner.update(product_id, delta)
+    return await update_stock(store, product_id, delta)
+
+
+def stock_error_to_http(error: Exception, product_id: int) -> HTTPException:
+    """Map stock update errors to HTTP errors."""
+    if isinstance(error, ProductNotFoundError):
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product {product_id} not found"
+        )
+    if isinstance(error, InsufficientStockError):
+        return HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=str(error)
+        )
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail=str(error)
+    )
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": "products"}
 
 
+@app.get("/metrics")
+async def store_metrics(store: DaprStateStore = Depends(get_state_store)):
+    """State store call counts, errors and latency for this worker."""
+    return store.metrics.snapshot()
+
+
+async def _stream_products(store: DaprStateStore, query: dict, page_size: int):
+    """Yield products as NDJSON lines, one state query page at a time."""
+    async for result in store.iter_items(query, page_size):
+        try:
+            item = ProductResponse.dict_from_db(result['value'])
+        except Exception as e:
+            logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
+            continue
+        yield ndjson_line(item)
+
+
 @app.get("/products", response_model=ProductListResponse)
 async def list_products(
+    request: Request,
+    lowStock: Optional[bool] = Query(None, description="Only products at or below (true) or above (false) their low stock threshold"),
+    sort: Optional[str] = Query(None, description="Field to sort by: " + ", ".join(SORT_FIELDS)),
+    sort_order: str = Query("asc", alias="order", pattern="^(asc|desc)$", description="Sort direction"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of products to return"),
+    cursor: Optional[str] = Query(None, description="nextCursor from a previous page"),
+    stream: bool = Query(False, description="Stream every product as NDJSON, fetching limit items per page"),
     store: DaprStateStore = Depends(get_state_store)
 ):
-    """Get all products."""
+    """List products matching the optional filters, or one page of them when limit or cursor is given."""
+    # Filters and sort are evaluated by the state store, not in this service
+    query = build_query(
+        {
+            "is_low_stock": lowStock
+        },
+        resolve_sort(sort, SORT_FIELDS),
+        sort_order == "desc"
+    )
+    
+    if stream:
+        return StreamingResponse(
+            _stream_products(store, query, limit or QUERY_PAGE_SIZE),
+            media_type="application/x-ndjson"
+        )
+    
     start_time = time.time()
     
     try:
-        # Simple query with empty filter to get all items
-        query = {
-            "filter": {}
-        }
+        # Page limits the result when requested
+        if limit or cursor:
+            query["page"] = {"limit": limit or QUERY_PAGE_SIZE}
+            if cursor:
+                query["page"]["token"] = cursor
         
         # Execute the query
-        results, _ = await store.query_items(query)
+        results, next_cursor = await store.query_items(query)
         
-        # Convert results to ProductResponse objects
+        # Map stored items straight to response dicts
         items = []
         for result in results:
             try:
-                product_item = ProductItem.from_db_dict(result['value'])
-                items.append(ProductResponse.from_product_item(product_item))
+                items.append(ProductResponse.dict_from_db(result['value']))
             except Exception as e:
                 logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
                 continue
@@ -97,10 +186,7 @@ async def list_products(
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Retrieved {len(items)} products in {elapsed:.2f}ms")
         
-        return ProductListResponse(
-            items=items,
-            total=len(items)
-        )
+        return list_response(items, next_cursor, request)
         
     except Exception as e:
         logger.error(f"Error listing products: {str(e)}")
@@ -119,9 +205,6 @@ async def create_or_update_product(
     start_time = time.time()
     
     try:
-        # Check if item already exists
-        existing = await store.get_item(str(request.productId))
-        
         # Create product item
         product_item = ProductItem(
             productId=request.productId,
@@ -131,17 +214,21 @@ async def create_or_update_product(
             lowStockThreshold=request.lowStockThreshold
         )
         
-        # Save to state store
-        await store.save_item(str(request.productId), product_item.to_db_dict())
+        # Insert-only write first, so creating a product is one round trip;
+        # only an existing product needs a second, overwriting write
+        key = str(request.productId)
+        created = await store.insert_item(key, product_item.to_db_dict())
+        if not created:
+            await store.save_item(key, product_item.to_db_dict())
         
         elapsed = (time.time() - start_time) * 1000
-        logger.info(f"{'Updated' if existing else 'Created'} product {request.productId} in {elapsed:.2f}ms")
+        logger.info(f"{'Created' if created else 'Updated'} product {request.productId} in {elapsed:.2f}ms")
         
         # Return appropriate status code via response
         response = ProductResponse.from_product_item(product_item)
         return JSONResponse(
             content=response.model_dump(),
-            status_code=status.HTTP_200_OK if existing else status.HTTP_201_CREATED
+            status_code=status.HTTP_201_CREATED if created else status.HTTP_200_OK
         )
         
     except Exception as e:
@@ -152,16 +239,108 @@ async def create_or_update_product(
         )
 
 
+@app.post("/products:batch", response_model=ProductBatchResponse)
+async def create_or_update_products_batch(
+    request: ProductBatchRequest,
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """Add or update many products with one bulk get and chunked state transactions."""
+    start_time = time.time()
+    
+    try:
+        keys = [str(item.productId) for item in request.items]
+        existing = await store.get_items(keys)
+        
+        products = {
+            str(item.productId): ProductItem(**item.model_dump()).to_db_dict()
+            for item in request.items
+        }
+        await store.save_items(products)
+        
+        created = [item.productId for item in request.items if str(item.productId) not in existing]
+        updated = [item.productId for item in request.items if str(item.productId) in existing]
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Batch saved {len(products)} products ({len(created)} created, {len(updated)} updated) in {elapsed:.2f}ms")
+        
+        return ProductBatchResponse(created=created, updated=updated)
+        
+    except Exception as e:
+        logger.error(f"Error saving product batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to save product batch: {str(e)}"
+        )
+
+
+@app.post("/products:reindex", response_model=ProductReindexResponse)
+async def reindex_products(
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """
+    Rewrite products whose derived is_low_stock field is missing or stale.
+
+    Needed once for products saved before the field existed, which the
+    lowStock filter does not match. Each product is rewritten only if its
+    ETag is unchanged; a product written in the meantime already has the
+    field recomputed, so it is skipped. Safe to run while products are written.
+    """
+    start_time = time.time()
+    
+    try:
+        stale = []
+        scanned = 0
+        async for result in store.iter_items({"filter": {}}):
+            try:
+                product = result['value']
+                if product.get("is_low_stock") != ProductItem.from_db_dict(product).to_db_dict()["is_low_stock"]:
+                    stale.append(result['key'])
+                scanned += 1
+            except Exception as e:
+                logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
+                continue
+        
+        semaphore = asyncio.Semaphore(REINDEX_CONCURRENCY)
+        
+        async def rewrite(key: str, data: dict, etag: str) -> bool:
+            async with semaphore:
+                try:
+                    await store.save_item(key, ProductItem.from_db_dict(data).to_db_dict(), etag=etag)
+                    return True
+                except ETagMismatchError:
+                    return False
+        
+        rewritten = []
+        for start in range(0, len(stale), QUERY_PAGE_SIZE):
+            found = await store.get_items_with_etags(stale[start:start + QUERY_PAGE_SIZE])
+            rewritten.extend(await asyncio.gather(*(
+                rewrite(key, data, etag) for key, (data, etag) in found.items()
+            )))
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Reindexed {scanned} products ({rewritten.count(True)} rewritten) in {elapsed:.2f}ms")
+        
+        return ProductReindexResponse(products=scanned, updated=rewritten.count(True), skipped=rewritten.count(False))
+        
+    except Exception as e:
+        logger.error(f"Error reindexing products: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reindex products: {str(e)}"
+        )
+
+
 @app.get("/products/{product_id}", response_model=ProductResponse)
 async def get_product(
     product_id: int,
+    request: Request,
     store: DaprStateStore = Depends(get_state_store)
 ):
     """Get product details."""
     start_time = time.time()
     
     try:
-        data = await store.get_item(str(product_id))
+        data, etag = await store.get_item_with_etag(str(product_id))
         
         if not data:
             raise HTTPException(
@@ -169,12 +348,10 @@ async def get_product(
                 detail=f"Product {product_id} not found"
             )
         
-        product_item = ProductItem.from_db_dict(data)
-        
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Retrieved product {product_id} in {elapsed:.2f}ms")
         
-        return ProductResponse.from_product_item(product_item)
+        return conditional_response(request, ProductResponse.dict_from_db(data), etag)
         
     except HTTPException:
         raise
@@ -196,37 +373,15 @@ async def decrement_stock(
     start_time = time.time()
     
     try:
-        # Get current inventory
-        data = await store.get_item(str(product_id))
-        
-        if not data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Product {product_id} not found"
-            )
-        
-        product_item = ProductItem.from_db_dict(data)
-        
-        # Check if we have enough stock
-        if product_item.stockOnHand < request.quantity:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail=f"Insufficient stock. Available: {product_item.stockOnHand}, Requested: {request.quantity}"
-            )
-        
-        # Update stock
-        product_item.stockOnHand -= request.quantity
-        
-        # Save back to state store
-        await store.save_item(str(product_id), product_item.to_db_dict())
+        product_item = await apply_stock_delta(store, product_id, -request.quantity)
         
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Decremented stock for product {product_id} by {request.quantity} in {elapsed:.2f}ms")
         
         return ProductResponse.from_product_item(product_item)
         
-    except HTTPException:
-        raise
+    except (ProductNotFoundError, InsufficientStockError, StockUpdateConflictError) as e:
+        raise stock_error_to_http(e, product_id)
     except Exception as e:
         logger.error(f"Error decrementing stock: {str(e)}")
         raise HTTPException(
@@ -245,30 +400,15 @@ async def increment_stock(
     start_time = time.time()
     
     try:
-        # Get current inventory
-        data = await store.get_item(str(product_id))
-        
-        if not data:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Product {product_id} not found"
-            )
-        
-        product_item = ProductItem.from_db_dict(data)
-        
-        # Update stock
-        product_item.stockOnHand += request.quantity
-        
-        # Save back to state store
-        await store.save_item(str(product_id), product_item.to_db_dict())
+        product_item = await apply_stock_delta(store, product_id, request.quantity)
         
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Incremented stock for product {product_id} by {request.quantity} in {elapsed:.2f}ms")
         
         return ProductResponse.from_product_item(product_item)
         
-    except HTTPException:
-        raise
+    except (ProductNotFoundError, StockUpdateConflictError) as e:
+        raise stock_error_to_http(e, product_id)
     except Exception as e:
         logger.error(f"Error incrementing stock: {str(e)}")
         raise HTTPException(
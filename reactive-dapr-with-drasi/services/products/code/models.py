@@ -1,4 +1,4 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, validator
 from typing import Optional, List
 
 
@@ -16,7 +16,9 @@ class ProductItem(BaseModel):
             "product_name": self.productName,
             "product_description": self.productDescription,
             "stock_on_hand": self.stockOnHand,
-            "low_stock_threshold": self.lowStockThreshold
+            "low_stock_threshold": self.lowStockThreshold,
+            # Derived so that low-stock filters can be evaluated by the state store
+            "is_low_stock": self.stockOnHand <= self.lowStockThreshold
         }
 
     @classmethod
@@ -62,7 +64,42 @@ class ProductResponse(BaseModel):
             isLowStock=item.stockOnHand <= item.lowStockThreshold
         )
 
+    @staticmethod
+    def dict_from_db(data: dict) -> dict:
+        """Map a stored product straight to its response JSON shape, without pydantic validation."""
+        return {
+            "productId": data["product_id"],
+            "productName": data["product_name"],
+            "productDescription": data["product_description"],
+            "stockOnHand": data["stock_on_hand"],
+            "lowStockThreshold": data["low_stock_threshold"],
+            "isLowStock": data["stock_on_hand"] <= data["low_stock_threshold"]
+        }
+
 
 class ProductListResponse(BaseModel):
     items: List[ProductResponse]
-    total: int
\ No newline at end of file
+    total: int
+    nextCursor: Optional[str] = Field(None, description="Cursor for the next page, if more items may exist")
+
+
+class ProductBatchRequest(BaseModel):
+    items: List[ProductCreateRequest] = Field(..., min_items=1, max_items=10000, description="Products to add or update")
+
+    @validator('items')
+    def validate_unique_products(cls, v):
+        product_ids = [item.productId for item in v]
+        if len(product_ids) != len(set(product_ids)):
+            raise ValueError('Duplicate product IDs in batch')
+        return v
+
+
+class ProductBatchResponse(BaseModel):
+    created: List[int] = Field(..., description="IDs of products that were created")
+    updated: List[int] = Field(..., description="IDs of products that already existed and were updated")
+
+
+class ProductReindexResponse(BaseModel):
+    products: int = Field(..., description="Number of products scanned")
+    updated: int = Field(..., description="Number of products whose derived fields were rewritten")
+    skipped: int = Field(..., description="Number of stale products left alone because they were written during the reindex")
@@ -0,0 +1,161 @@
+import asyncio
+import logging
+import os
+import random
+from typing import Dict, List, Tuple
+
+from models import ProductItem
+from dapr_client import DaprStateStore, ETagMismatchError
+
+logger = logging.getLogger(__name__)
+
+# Attempts at an ETag-guarded read-modify-write before giving up
+MAX_ATTEMPTS = int(os.getenv("STOCK_UPDATE_MAX_ATTEMPTS", "10"))
+
+# Base delay in seconds for the jittered exponential backoff between attempts
+RETRY_BASE_DELAY = float(os.getenv("STOCK_UPDATE_RETRY_DELAY", "0.005"))
+
+
+class ProductNotFoundError(Exception):
+    """Raised when the product to update does not exist."""
+
+
+class InsufficientStockError(Exception):
+    """Raised when a decrement would take stockOnHand below zero."""
+
+    def __init__(self, available: int, requested: int):
+        super().__init__(f"Insufficient stock. Available: {available}, Requested: {requested}")
+        self.available = available
+        self.requested = requested
+
+
+class StockUpdateConflictError(Exception):
+    """Raised when every attempt lost the ETag race to another writer."""
+
+
+async def _backoff(attempt: int) -> None:
+    await asyncio.sleep(random.uniform(0, RETRY_BASE_DELAY * 2 ** attempt))
+
+
+async def update_stock(store: DaprStateStore, product_id: int, delta: int) -> ProductItem:
+    """
+    Add delta to a product's stockOnHand without losing concurrent updates.
+
+    The product is read with its ETag and written back only if the ETag is
+    unchanged. On a mismatch the update is retried on fresh data, up to
+    MAX_ATTEMPTS times.
+
+    Raises:
+        ProductNotFoundError: The product does not exist
+        InsufficientStockError: The decrement exceeds the current stock
+        StockUpdateConflictError: All attempts conflicted with other writers
+    """
+    key = str(product_id)
+    for attempt in range(MAX_ATTEMPTS):
+        data, etag = await store.get_item_with_etag(key)
+        if not data:
+            raise ProductNotFoundError(product_id)
+
+        product_item = ProductItem.from_db_dict(data)
+        if product_item.stockOnHand + delta < 0:
+            raise InsufficientStockError(product_item.stockOnHand, -delta)
+        product_item.stockOnHand += delta
+
+        try:
+            await store.save_item(key, product_item.to_db_dict(), etag=etag)
+            return product_item
+        except ETagMismatchError:
+            logger.debug(f"Stock update for product {product_id} conflicted (attempt {attempt + 1})")
+            await _backoff(attempt)
+
+    raise StockUpdateConflictError(f"Stock update for product {product_id} conflicted {MAX_ATTEMPTS} times")
+
+
+class StockUpdateCombiner:
+    """
+    Merges concurrent stock updates for the same product into one write.
+
+    While a write for a product is in flight, further updates for it queue
+    up. The next flush applies the queued deltas in arrival order on a single
+    ETag-guarded read-modify-write, so a hot product costs one save per batch
+    instead of one save (plus retries) per request. Each caller still gets
+    its own outcome: a decrement that would take stock below zero fails on
+    its own and is left out of the write.
+    """
+
+    def __init__(self, store: DaprStateStore):
+        self.store = store
+        self._pending: Dict[str, List[Tuple[int, asyncio.Future]]] = {}
+        self._tasks = set()
+
+    async def update(self, product_id: int, delta: int) -> ProductItem:
+        """Queue delta for the product and wait for the write that applies it."""
+        key = str(product_id)
+        future = asyncio.get_running_loop().create_future()
+
+        queue = self._pending.get(key)
+        if queue is None:
+            self._pending[key] = [(delta, future)]
+            task = asyncio.create_task(self._flush(key))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+        else:
+            queue.append((delta, future))
+
+        return await future
+
+    async def _flush(self, key: str) -> None:
+        """Write queued batches for key until no more updates arrive."""
+        while True:
+            batch = self._pending[key]
+            if not batch:
+                del self._pending[key]
+                return
+            self._pending[key] = []
+            await self._apply(key, batch)
+
+    async def _apply(self, key: str, batch: List[Tuple[int, asyncio.Future]]) -> None:
+        try:
+            for attempt in range(MAX_ATTEMPTS):
+                data, etag = await self.store.get_item_with_etag(key)
+                if not data:
+                    for _, future in batch:
+                        if not future.done():
+                            future.set_exception(ProductNotFoundError(int(key)))
+                    return
+
+                product_item = ProductItem.from_db_dict(data)
+                stock = product_item.stockOnHand
+                outcomes = []
+                for delta, future in batch:
+                    if stock + delta < 0:
+                        outcomes.append((future, InsufficientStockError(stock, -delta)))
+                    else:
+                        stock += delta
+                        outcomes.append((future, product_item.model_copy(update={"stockOnHand": stock})))
+
+                if stock != product_item.stockOnHand:
+                    product_item.stockOnHand = stock
+                    try:
+                        await self.store.save_item(key, product_item.to_db_dict(), etag=etag)
+                    except ETagMismatchError:
+                        logger.debug(f"Combined stock update for product {key} conflicted (attempt {attempt + 1})")
+                        await _backoff(attempt)
+                        continue
+
+                logger.debug(f"Applied {len(batch)} combined stock updates to product {key}")
+                for future, outcome in outcomes:
+                    if future.done():
+                        continue
+                    if isinstance(outcome, Exception):
+                        future.set_exception(outcome)
+                    else:
+                        future.set_result(outcome)
+                return
+
+            raise StockUpdateConflictError(f"Combined stock update for product {key} conflicted {MAX_ATTEMPTS} times")
+
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
@@ -0,0 +1,126 @@
+"""Tests for the products service's create path."""
+import asyncio
+import json
+
+import pytest
+
+import main
+from models import ProductItem, ProductResponse
+
+
+def _product(stock):
+    return {"productId": 1, "productName": "Lamp", "productDescription": "A lamp",
+            "stockOnHand": stock, "lowStockThreshold": 5}
+
+
+def test_duplicate_create_updates_the_product(app_store, app_requests):
+    created, = asyncio.run(app_requests(("POST", "/products", _product(10))))
+    updated, = asyncio.run(app_requests(("POST", "/products", _product(3))))
+
+    assert (created.status_code, updated.status_code) == (201, 200)
+    assert asyncio.run(app_store.get_item("1"))["stock_on_hand"] == 3
+
+
+def test_concurrent_creates_create_once(app_store, app_requests):
+    responses = asyncio.run(app_requests(("POST", "/products", _product(10)), ("POST", "/products", _product(20))))
+
+    assert sorted(response.status_code for response in responses) == [200, 201]
+
+
+def test_reindex_backfills_is_low_stock(app_store, app_requests):
+    legacy = {"product_id": 2, "product_name": "Desk", "product_description": "A desk",
+              "stock_on_hand": 1, "low_stock_threshold": 5}
+    asyncio.run(app_store.save_item("2", legacy))
+    asyncio.run(app_requests(("POST", "/products", _product(10))))
+
+    response, = asyncio.run(app_requests(("POST", "/products:reindex", None)))
+
+    assert response.json() == {"products": 2, "updated": 1, "skipped": 0}
+    assert asyncio.run(app_store.get_item("2"))["is_low_stock"] is True
+    low_stock, = asyncio.run(app_requests(("GET", "/products?lowStock=true", None)))
+    assert [item["productId"] for item in low_stock.json()["items"]] == [2]
+
+
+def test_reindex_skips_products_written_during_it(app_store, app_requests, monkeypatch):
+    legacy = {"product_id": 2, "product_name": "Desk", "product_description": "A desk",
+              "stock_on_hand": 1, "low_stock_threshold": 5}
+    asyncio.run(app_store.save_item("2", legacy))
+    get_items_with_etags = app_store.get_items_with_etags
+
+    async def read_then_concurrent_write(keys):
+        found = await get_items_with_etags(keys)
+        await app_store.save_item("2", {**legacy, "stock_on_hand": 9, "is_low_stock": False})
+        return found
+
+    monkeypatch.setattr(app_store, "get_items_with_etags", read_then_concurrent_write)
+    response, = asyncio.run(app_requests(("POST", "/products:reindex", None)))
+
+    assert response.json() == {"products": 1, "updated": 0, "skipped": 1}
+    assert asyncio.run(app_store.get_item("2"))["stock_on_hand"] == 9
+
+
+def test_batch_reports_created_and_updated(app_store, app_requests):
+    asyncio.run(app_requests(("POST", "/products", _product(10))))
+    second = {**_product(4), "productId": 2}
+    response, = asyncio.run(app_requests(("POST", "/products:batch", {"items": [_product(3), second]})))
+
+    assert response.json() == {"created": [2], "updated": [1]}
+    assert asyncio.run(app_store.get_items(["1", "2"]))["2"]["is_low_stock"] is True
+
+
+def test_batch_rejects_duplicate_ids(app_store, app_requests):
+    response, = asyncio.run(app_requests(("POST", "/products:batch", {"items": [_product(3), _product(4)]})))
+    assert response.status_code == 422
+
+
+def _seed(app_requests, count):
+    asyncio.run(app_requests(*(
+        ("POST", "/products", {**_product(product_id), "productId": product_id}) for product_id in range(1, count + 1)
+    )))
+
+
+def test_list_pages_follow_the_cursor(app_store, app_requests):
+    _seed(app_requests, 5)
+
+    ids, cursor = [], None
+    for _ in range(5):
+        path = "/products?limit=2" + (f"&cursor={cursor}" if cursor else "")
+        page, = asyncio.run(app_requests(("GET", path, None)))
+        ids.extend(item["productId"] for item in page.json()["items"])
+        cursor = page.json()["nextCursor"]
+        if not cursor:
+            break
+    assert ids == [1, 2, 3, 4, 5]
+
+
+def test_list_streams_ndjson(app_store, app_requests):
+    _seed(app_requests, 3)
+
+    response, = asyncio.run(app_requests(("GET", "/products?stream=true&limit=2", None)))
+
+    assert response.headers["content-type"] == "application/x-ndjson"
+    lines = [json.loads(line) for line in response.text.splitlines()]
+    assert [line["productId"] for line in lines] == [1, 2, 3]
+
+
+def test_list_rejects_oversized_pages(app_store, app_requests):
+    response, = asyncio.run(app_requests(("GET", "/products?limit=1001", None)))
+    assert response.status_code == 422
+
+
+@pytest.mark.parametrize("stock", [0, 5, 6])
+def test_fast_path_matches_the_response_model(stock):
+    item = ProductItem(productId=1, productName="Lamp", productDescription="A lamp", stockOnHand=stock, lowStockThreshold=5)
+    assert ProductResponse.dict_from_db(item.to_db_dict()) == ProductResponse.from_product_item(item).model_dump(mode="json")
+
+
+def test_get_answers_if_none_match(app_store, app_requests):
+    asyncio.run(app_requests(("POST", "/products", _product(10))))
+
+    first, = asyncio.run(app_requests(("GET", "/products/1", None)))
+    if_none_match = {"If-None-Match": first.headers["etag"]}
+    assert asyncio.run(app_requests(("GET", "/products/1", None), headers=if_none_match))[0].status_code == 304
+    asyncio.run(app_requests(("PUT", "/products/1/decrement", {"quantity": 1})))
+    changed, = asyncio.run(app_requests(("GET", "/products/1", None), headers=if_none_match))
+    assert changed.status_code == 200
+    assert changed.json()["stockOnHand"] == 9
@@ -0,0 +1,90 @@
+"""Tests for ETag-guarded stock updates and the stock update combiner under contention."""
+import asyncio
+
+import pytest
+
+import stock
+from dapr_client import DaprStateStore
+from models import ProductItem
+from stock import InsufficientStockError, ProductNotFoundError, StockUpdateCombiner, StockUpdateConflictError, update_stock
+
+
+@pytest.fixture
+def store(make_store, monkeypatch):
+    monkeypatch.setattr(stock, "RETRY_BASE_DELAY", 0)
+    store = make_store(DaprStateStore)
+    item = ProductItem(productId=1, productName="Lamp", productDescription="A lamp", stockOnHand=100, lowStockThreshold=5)
+    asyncio.run(store.save_item("1", item.to_db_dict()))
+    return store
+
+
+def _stock(store) -> int:
+    return asyncio.run(store.get_item("1"))["stock_on_hand"]
+
+
+def test_concurrent_decrements_lose_no_update(store):
+    async def scenario():
+        await asyncio.gather(*(update_stock(store, 1, -1) for _ in range(8)))
+
+    asyncio.run(scenario())
+    assert _stock(store) == 92
+
+
+def test_decrement_below_zero_is_refused(store):
+    with pytest.raises(InsufficientStockError):
+        asyncio.run(update_stock(store, 1, -101))
+    with pytest.raises(ProductNotFoundError):
+        asyncio.run(update_stock(store, 2, -1))
+    assert _stock(store) == 100
+
+
+def test_update_gives_up_after_max_attempts(store, state_client, monkeypatch):
+    monkeypatch.setattr(stock, "MAX_ATTEMPTS", 3)
+    save_state = state_client.save_state
+
+    async def interfering_save_state(store_name, key, value, etag=None, **kwargs):
+        # Another replica writes the product between every read and write
+        await save_state(store_name, key, value)
+        return await save_state(store_name, key, value, etag=etag, **kwargs)
+
+    monkeypatch.setattr(state_client, "save_state", interfering_save_state)
+    with pytest.raises(StockUpdateConflictError):
+        asyncio.run(update_stock(store, 1, -1))
+
+
+def test_combiner_merges_concurrent_updates(store, state_client, monkeypatch):
+    writes = []
+    save_state = state_client.save_state
+
+    async def counting_save_state(*args, **kwargs):
+        writes.append(kwargs.get("key"))
+        return await save_state(*args, **kwargs)
+
+    monkeypatch.setattr(state_client, "save_state", counting_save_state)
+
+    async def scenario():
+        combiner = StockUpdateCombiner(store)
+        return await asyncio.gather(
+            *(combiner.update(1, -10) for _ in range(9)),
+            combiner.update(1, -50),
+            return_exceptions=True
+        )
+
+    outcomes = asyncio.run(scenario())
+    # The decrement that arrived when only 10 were left fails on its own
+    assert isinstance(outcomes[-1], InsufficientStockError)
+    assert [outcome.stockOnHand for outcome in outcomes[:-1]] == list(range(90, 0, -10))
+    assert _stock(store) == 10
+    assert len(writes) < 9
+
+
+def test_combiner_retries_on_conflicting_writers(store):
+    async def scenario():
+        combiner = StockUpdateCombiner(store)
+        await asyncio.gather(
+            *(combiner.update(1, -1) for _ in range(5)),
+            *(update_stock(store, 1, -1) for _ in range(5))
+        )
+
+    asyncio.run(scenario())
+    assert _stock(store) == 90
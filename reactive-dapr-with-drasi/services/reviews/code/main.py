@@ -1,16 +1,22 @@
+import asyncio
 import logging
 import os
 import time
 from contextlib import asynccontextmanager
-from typing import Optional
-import random
+from typing import List, Optional
 
-from fastapi import FastAPI, HTTPException, Depends, status
+from fastapi import FastAPI, HTTPException, Depends, status, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
-from models import ReviewItem, ReviewCreateRequest, ReviewUpdateRequest, ReviewResponse, ReviewListResponse
-from dapr_client import DaprStateStore
+from models import ReviewItem, ReviewCreateRequest, ReviewUpdateRequest, ReviewResponse, ReviewListResponse, ReviewBatchRequest, ReviewBatchResponse, ReviewReindexResponse, ReviewSummaryResponse, ReviewSummaryListResponse
+from dapr_client import DaprStateStore, QUERY_PAGE_SIZE
+from common.responses import conditional_response, json_response, list_response, ndjson_line
+from common.ids import IdAllocator
+from common.query import build_query, resolve_sort
+from common.records import Changes, insert_with_records, update_records
+from common.indexes import with_ids, without_ids, page_ids
+from product_reviews import index_key, summary_key, with_ratings, summary_dict
 
 # Configure logging
 logging.basicConfig(
@@ -22,16 +28,34 @@ logger = logging.getLogger(__name__)
 # Global state store instance
 state_store = None
 
+# Hands out review IDs for creates that do not supply one
+id_allocator = None
+
+# Largest page a client may request from a list endpoint
+MAX_PAGE_SIZE = 1000
+
+# List sort parameter to stored field
+SORT_FIELDS = {
+    "reviewId": "review_id",
+    "productId": "product_id",
+    "rating": "rating",
+}
+
+# Products whose index records a batch create updates at the same time
+BATCH_INDEX_CONCURRENCY = int(os.getenv("BATCH_INDEX_CONCURRENCY", "16"))
+
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # Startup
-    global state_store
+    global state_store, id_allocator
     state_store = DaprStateStore()
+    id_allocator = IdAllocator(state_store)
     logger.info("Reviews service started")
     yield
     # Shutdown
     logger.info("Reviews service shutting down")
+    await state_store.close()
 
 
 # Create FastAPI app
@@ -50,6 +74,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag"],
 )
 
 
@@ -63,34 +88,93 @@ def get_state_store() -> DaprStateStore:
     return state_store
 
 
+async def _insert_review(store: DaprStateStore, review_item: ReviewItem) -> bool:
+    """Save a new review with its product's index and rating summary in one transaction; False if the ID is taken."""
+    product_key = index_key(review_item.productId)
+    rating_key = summary_key(review_item.productId)
+
+    def apply(records: dict) -> Changes:
+        return Changes(
+            {
+                product_key: with_ids(records[product_key], [review_item.reviewId]),
+                rating_key: with_ratings(records[rating_key], added=[review_item.rating])
+            },
+            []
+        )
+
+    return await insert_with_records(store, str(review_item.reviewId), review_item.to_db_dict(),
+                                     [product_key, rating_key], apply)
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint."""
     return {"status": "healthy", "service": "reviews"}
 
 
+@app.get("/metrics")
+async def store_metrics(store: DaprStateStore = Depends(get_state_store)):
+    """State store call counts, errors and latency for this worker."""
+    return store.metrics.snapshot()
+
+
+async def _stream_reviews(store: DaprStateStore, query: dict, page_size: int):
+    """Yield reviews as NDJSON lines, one state query page at a time."""
+    async for result in store.iter_items(query, page_size):
+        try:
+            item = ReviewResponse.dict_from_db(result['value'])
+        except Exception as e:
+            logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
+            continue
+        yield ndjson_line(item)
+
+
 @app.get("/reviews", response_model=ReviewListResponse)
 async def list_reviews(
+    request: Request,
+    productId: Optional[int] = Query(None, description="Only reviews of this product"),
+    customerId: Optional[int] = Query(None, description="Only reviews written by this customer"),
+    sort: Optional[str] = Query(None, description="Field to sort by: " + ", ".join(SORT_FIELDS)),
+    sort_order: str = Query("asc", alias="order", pattern="^(asc|desc)$", description="Sort direction"),
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of reviews to return"),
+    cursor: Optional[str] = Query(None, description="nextCursor from a previous page"),
+    stream: bool = Query(False, description="Stream every review as NDJSON, fetching limit items per page"),
     store: DaprStateStore = Depends(get_state_store)
 ):
-    """Get all reviews."""
+    """List reviews matching the optional filters, or one page of them when limit or cursor is given."""
+    # Filters and sort are evaluated by the state store, not in this service
+    query = build_query(
+        {
+            "product_id": productId,
+            "customer_id": customerId
+        },
+        resolve_sort(sort, SORT_FIELDS),
+        sort_order == "desc"
+    )
+    
+    if stream:
+        return StreamingResponse(
+            _stream_reviews(store, query, limit or QUERY_PAGE_SIZE),
+            media_type="application/x-ndjson"
+        )
+    
     start_time = time.time()
     
     try:
-        # Simple query with empty filter to get all items
-        query = {
-            "filter": {}
-        }
+        # Page limits the result when requested
+        if limit or cursor:
+            query["page"] = {"limit": limit or QUERY_PAGE_SIZE}
+            if cursor:
+                query["page"]["token"] = cursor
         
         # Execute the query
-        results, _ = await store.query_items(query)
+        results, next_cursor = await store.query_items(query)
         
-        # Convert results to ReviewResponse objects
+        # Map stored items straight to response dicts
         items = []
         for result in results:
             try:
-                review_item = ReviewItem.from_db_dict(result['value'])
-                items.append(ReviewResponse.from_review_item(review_item))
+                items.append(ReviewResponse.dict_from_db(result['value']))
             except Exception as e:
                 logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
                 continue
@@ -98,7 +182,7 @@ async def list_reviews(
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Retrieved {len(items)} reviews in {elapsed:.2f}ms")
         
-        return ReviewListResponse(items=items, total=len(items))
+        return list_response(items, next_cursor, request)
         
     except Exception as e:
         elapsed = (time.time() - start_time) * 1000
@@ -109,6 +193,99 @@ async def list_reviews(
         )
 
 
+@app.get("/products/{product_id}/reviews", response_model=ReviewListResponse)
+async def list_product_reviews(
+    request: Request,
+    product_id: int,
+    limit: Optional[int] = Query(None, ge=1, le=MAX_PAGE_SIZE, description="Maximum number of reviews to return"),
+    cursor: Optional[str] = Query(None, description="nextCursor from a previous page"),
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """List a product's reviews in review ID order with one index read and one bulk get."""
+    start_time = time.time()
+    
+    try:
+        index = await store.get_item(index_key(product_id)) or {}
+        review_ids, next_cursor = page_ids(index, limit, cursor)
+        
+        reviews = await store.get_items([str(review_id) for review_id in review_ids]) if review_ids else {}
+        
+        # Map stored items straight to response dicts
+        items = []
+        for review_id in review_ids:
+            data = reviews.get(str(review_id))
+            if data is None:
+                logger.warning(f"Review {review_id} is in the index of product {product_id} but was not found")
+                continue
+            items.append(ReviewResponse.dict_from_db(data))
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Retrieved {len(items)} reviews for product {product_id} in {elapsed:.2f}ms")
+        
+        return list_response(items, next_cursor, request)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error listing reviews for product {product_id}: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to list product reviews: {str(e)}"
+        )
+
+
+@app.get("/reviews/summary", response_model=ReviewSummaryListResponse)
+async def get_review_summaries(
+    productIds: List[int] = Query(..., min_length=1, max_length=MAX_PAGE_SIZE, description="Products to summarize"),
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """Get the rating summaries of several products with one bulk get."""
+    start_time = time.time()
+    
+    try:
+        # Duplicates are answered once, in first-seen order
+        product_ids = list(dict.fromkeys(productIds))
+        summaries = await store.get_items([summary_key(product_id) for product_id in product_ids])
+        items = [summary_dict(product_id, summaries.get(summary_key(product_id))) for product_id in product_ids]
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Retrieved {len(items)} rating summaries in {elapsed:.2f}ms")
+        
+        return json_response({"items": items, "total": len(items)})
+        
+    except Exception as e:
+        logger.error(f"Error retrieving rating summaries: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve rating summaries: {str(e)}"
+        )
+
+
+@app.get("/reviews/summary/{product_id}", response_model=ReviewSummaryResponse)
+async def get_review_summary(
+    request: Request,
+    product_id: int,
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """Get a product's review count, average rating and rating histogram from its summary record."""
+    start_time = time.time()
+    
+    try:
+        summary, etag = await store.get_item_with_etag(summary_key(product_id))
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Retrieved rating summary for product {product_id} in {elapsed:.2f}ms")
+        
+        return conditional_response(request, summary_dict(product_id, summary), etag)
+        
+    except Exception as e:
+        logger.error(f"Error retrieving rating summary: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to retrieve rating summary: {str(e)}"
+        )
+
+
 @app.post("/reviews", response_model=ReviewResponse, status_code=status.HTTP_201_CREATED)
 async def create_review(
     request: ReviewCreateRequest,
@@ -118,42 +295,35 @@ async def create_review(
     start_time = time.time()
     
     try:
-        # Use provided review ID or generate a unique one
-        if request.reviewId:
-            review_id = request.reviewId
-            # Check if ID already exists
-            existing = await store.get_item(str(review_id))
-            if existing:
+        # Use provided review ID or allocate one
+        review_id = request.reviewId or await id_allocator.next_id()
+        while True:
+            review_item = ReviewItem(
+                reviewId=review_id,
+                productId=request.productId,
+                customerId=request.customerId,
+                rating=request.rating,
+                reviewText=request.reviewText if request.reviewText is not None else ""
+            )
+            
+            # Inserted only if the ID is free, together with the product's index; an existing review is reported rather than overwritten
+            if await _insert_review(store, review_item):
+                break
+            if request.reviewId:
                 raise HTTPException(
-                    status_code=status.HTTP_400_BAD_REQUEST,
+                    status_code=status.HTTP_409_CONFLICT,
                     detail=f"Review with ID {review_id} already exists"
                 )
-        else:
-            # Generate a unique review ID
-            review_id = random.randint(4001, 999999)
-            # Check if ID already exists
-            existing = await store.get_item(str(review_id))
-            while existing:
-                review_id = random.randint(4001, 999999)
-                existing = await store.get_item(str(review_id))
-        
-        # Create review item
-        review_item = ReviewItem(
-            reviewId=review_id,
-            productId=request.productId,
-            customerId=request.customerId,
-            rating=request.rating,
-            reviewText=request.reviewText if request.reviewText is not None else ""
-        )
-        
-        # Save to state store
-        await store.save_item(str(review_id), review_item.to_db_dict())
+            # Only reachable if a client picked an allocated ID explicitly; take the next one
+            review_id = await id_allocator.next_id()
         
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Created review {review_id} for product {request.productId} by customer {request.customerId} in {elapsed:.2f}ms")
         
         return ReviewResponse.from_review_item(review_item)
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error creating review: {str(e)}")
         raise HTTPException(
@@ -162,16 +332,143 @@ async def create_review(
         )
 
 
+@app.post("/reviews:batch", response_model=ReviewBatchResponse, status_code=status.HTTP_201_CREATED)
+async def create_reviews_batch(
+    request: ReviewBatchRequest,
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """
+    Create many reviews with one state transaction per product.
+
+    Each product's new reviews are inserted with first-write upserts in the
+    transaction that updates its index and rating summary. Reviews whose ID
+    exists, even if a concurrent request created it after the batch
+    started, are skipped rather than overwritten.
+    """
+    start_time = time.time()
+    
+    try:
+        # Generate IDs for the items that did not supply one
+        missing_count = sum(1 for item in request.items if not item.reviewId)
+        generated_ids = iter(await id_allocator.allocate(missing_count))
+        
+        reviews = {}
+        for item in request.items:
+            review_id = item.reviewId or next(generated_ids)
+            review_item = ReviewItem(
+                reviewId=review_id,
+                productId=item.productId,
+                customerId=item.customerId,
+                rating=item.rating,
+                reviewText=item.reviewText if item.reviewText is not None else ""
+            )
+            reviews[str(review_id)] = review_item.to_db_dict()
+        
+        by_product = {}
+        for key, review in reviews.items():
+            by_product.setdefault(review["product_id"], {})[key] = review
+        
+        semaphore = asyncio.Semaphore(BATCH_INDEX_CONCURRENCY)
+        
+        async def save_product_reviews(product_id: int, product_reviews: dict) -> List[str]:
+            product_key = index_key(product_id)
+            rating_key = summary_key(product_id)
+            
+            def apply(records: dict) -> Changes:
+                new = {key: review for key, review in product_reviews.items() if records[key] is None}
+                if not new:
+                    return Changes({}, [], [])
+                return Changes(
+                    {
+                        **new,
+                        product_key: with_ids(records[product_key], [review["review_id"] for review in new.values()]),
+                        rating_key: with_ratings(records[rating_key], added=[review["rating"] for review in new.values()])
+                    },
+                    [],
+                    list(new)
+                )
+            
+            async with semaphore:
+                return await update_records(store, [product_key, rating_key], apply, items=list(product_reviews))
+        
+        inserted = set()
+        for keys in await asyncio.gather(*(
+            save_product_reviews(product_id, product_reviews)
+            for product_id, product_reviews in by_product.items()
+        )):
+            inserted.update(keys)
+        created = [int(key) for key in reviews if key in inserted]
+        skipped = [int(key) for key in reviews if key not in inserted]
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Batch created {len(created)} reviews ({len(skipped)} skipped) in {elapsed:.2f}ms")
+        
+        return ReviewBatchResponse(created=created, skipped=skipped)
+        
+    except Exception as e:
+        logger.error(f"Error creating review batch: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to create review batch: {str(e)}"
+        )
+
+
+@app.post("/reviews:reindex", response_model=ReviewReindexResponse)
+async def reindex_reviews(
+    store: DaprStateStore = Depends(get_state_store)
+):
+    """
+    Rebuild every product's review index and rating summary from a paged scan of all reviews.
+
+    Needed once for reviews written before these records existed. They are
+    overwritten without ETag checks, so run it while no reviews are written.
+    """
+    start_time = time.time()
+    
+    try:
+        by_product = {}
+        ratings = {}
+        reviewed = 0
+        async for result in store.iter_items({"filter": {}}):
+            try:
+                review = result['value']
+                by_product.setdefault(review["product_id"], []).append(review["review_id"])
+                ratings.setdefault(review["product_id"], []).append(review["rating"])
+                reviewed += 1
+            except Exception as e:
+                logger.warning(f"Failed to parse item with key {result['key']}: {str(e)}")
+                continue
+        
+        records = {}
+        for product_id, review_ids in by_product.items():
+            records[index_key(product_id)] = with_ids({}, review_ids)
+            records[summary_key(product_id)] = with_ratings({}, added=ratings[product_id])
+        await store.save_items(records)
+        
+        elapsed = (time.time() - start_time) * 1000
+        logger.info(f"Reindexed {reviewed} reviews of {len(by_product)} products in {elapsed:.2f}ms")
+        
+        return ReviewReindexResponse(products=len(by_product), reviews=reviewed)
+        
+    except Exception as e:
+        logger.error(f"Error reindexing reviews: {str(e)}")
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Failed to reindex reviews: {str(e)}"
+        )
+
+
 @app.get("/reviews/{review_id}", response_model=ReviewResponse)
 async def get_review(
     review_id: int,
+    request: Request,
     store: DaprStateStore = Depends(get_state_store)
 ):
     """Get a specific review by its ID."""
     start_time = time.time()
     
     try:
-        data = await store.get_item(str(review_id))
+        data, etag = await store.get_item_with_etag(str(review_id))
         
         if not data:
             raise HTTPException(
@@ -179,12 +476,10 @@ async def get_review(
                 detail=f"Review {review_id} not found"
             )
         
-        review_item = ReviewItem.from_db_dict(data)
-        
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Retrieved review {review_id} in {elapsed:.2f}ms")
         
-        return ReviewResponse.from_review_item(review_item)
+        return conditional_response(request, ReviewResponse.dict_from_db(data), etag)
         
     except HTTPException:
         raise
@@ -215,18 +510,33 @@ async def update_review(
                 detail=f"Review {review_id} not found"
             )
         
-        review_item = ReviewItem.from_db_dict(data)
+        # Save in one transaction with the rating change in the product's summary
+        key = str(review_id)
+        rating_key = summary_key(data["product_id"])
         
-        # Update fields if provided
-        if request.rating is not None:
-            review_item.rating = request.rating
-        # For reviewText, we need to check if the field was provided in the request
-        # The validator converts empty strings to None, so we update if the field exists
-        if hasattr(request, 'reviewText') and 'reviewText' in request.__fields_set__:
-            review_item.reviewText = request.reviewText
+        def apply(records: dict) -> Changes:
+            if records[key] is None:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Review {review_id} not found"
+                )
+            review_item = ReviewItem.from_db_dict(records[key])
+            old_rating = review_item.rating
+            
+            # Update fields if provided
+            if request.rating is not None:
+                review_item.rating = request.rating
+            # For reviewText, we need to check if the field was provided in the request
+            # The validator converts empty strings to None, so we update if the field exists
+            if hasattr(request, 'reviewText') and 'reviewText' in request.__fields_set__:
+                review_item.reviewText = request.reviewText
+            
+            upserts = {key: review_item.to_db_dict()}
+            if review_item.rating != old_rating:
+                upserts[rating_key] = with_ratings(records[rating_key], added=[review_item.rating], removed=[old_rating])
+            return Changes(upserts, [], review_item)
         
-        # Save back to state store
-        await store.save_item(str(review_id), review_item.to_db_dict())
+        review_item = await update_records(store, [rating_key], apply, items=[key])
         
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Updated review {review_id} in {elapsed:.2f}ms")
@@ -261,8 +571,23 @@ async def delete_review(
                 detail=f"Review {review_id} not found"
             )
         
-        # Delete from state store
-        await store.delete_item(str(review_id))
+        # Delete in one transaction with the removal from the product's index and rating summary
+        key = str(review_id)
+        product_key = index_key(data["product_id"])
+        rating_key = summary_key(data["product_id"])
+        
+        def apply(records: dict) -> Changes:
+            if records[key] is None:
+                return Changes({}, [])
+            return Changes(
+                {
+                    product_key: without_ids(records[product_key], [review_id]),
+                    rating_key: with_ratings(records[rating_key], removed=[records[key]["rating"]])
+                },
+                [key]
+            )
+        
+        await update_records(store, [product_key, rating_key], apply, items=[key])
         
         elapsed = (time.time() - start_time) * 1000
         logger.info(f"Deleted review {review_id} in {elapsed:.2f}ms")
@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import Optional, List
+from typing import Optional, List, Dict
 
 
 class ReviewItem(BaseModel):
@@ -85,7 +85,52 @@ class ReviewResponse(BaseModel):
             reviewText=item.reviewText if item.reviewText is not None else ""
         )
 
+    @staticmethod
+    def dict_from_db(data: dict) -> dict:
+        """Map a stored review straight to its response JSON shape, without pydantic validation."""
+        return {
+            "reviewId": data["review_id"],
+            "productId": data["product_id"],
+            "customerId": data["customer_id"],
+            "rating": data["rating"],
+            "reviewText": data.get("review_text", "") or ""  # Handle null values
+        }
+
 
 class ReviewListResponse(BaseModel):
     items: List[ReviewResponse]
-    total: int
\ No newline at end of file
+    total: int
+    nextCursor: Optional[str] = Field(None, description="Cursor for the next page, if more items may exist")
+
+
+class ReviewBatchRequest(BaseModel):
+    items: List[ReviewCreateRequest] = Field(..., min_items=1, max_items=10000, description="Reviews to create")
+
+    @validator('items')
+    def validate_unique_ids(cls, v):
+        review_ids = [item.reviewId for item in v if item.reviewId]
+        if len(review_ids) != len(set(review_ids)):
+            raise ValueError('Duplicate review IDs in batch')
+        return v
+
+
+class ReviewBatchResponse(BaseModel):
+    created: List[int] = Field(..., description="IDs of created reviews, in request order")
+    skipped: List[int] = Field(..., description="Requested IDs that already existed and were left unchanged")
+
+
+class ReviewReindexResponse(BaseModel):
+    products: int = Field(..., description="Number of products whose index was rebuilt")
+    reviews: int = Field(..., description="Number of reviews indexed")
+
+
+class ReviewSummaryResponse(BaseModel):
+    productId: int
+    reviewCount: int = Field(..., description="Number of reviews of the product")
+    averageRating: Optional[float] = Field(None, description="Average rating, or null without reviews")
+    ratingHistogram: Dict[str, int] = Field(..., description="Number of reviews per rating from 1 to 5")
+
+
+class ReviewSummaryListResponse(BaseModel):
+    items: List[ReviewSummaryResponse]
+    total: int
@@ -0,0 +1,47 @@
+from typing import Iterable, Optional
+
+from common.state import META_KEY_PREFIX
+
+
+def index_key(product_id: int) -> str:
+    """Key of the record listing a product's review IDs (see common.indexes), stored next to the reviews."""
+    return f"{META_KEY_PREFIX}product-reviews:{product_id}"
+
+
+def summary_key(product_id: int) -> str:
+    """Key of the record holding a product's rating sum, count and histogram."""
+    return f"{META_KEY_PREFIX}rating-summary:{product_id}"
+
+
+def with_ratings(summary: dict, added: Iterable[int] = (), removed: Iterable[int] = ()) -> dict:
+    """
+    Return a copy of a product's rating summary with ratings added and removed.
+
+    The summary holds the rating sum, the review count and a histogram of
+    the ratings 1 to 5, so that it can be maintained from deltas alone.
+    """
+    histogram = list(summary.get("histogram", [0] * 5))
+    total = summary.get("sum", 0)
+    count = summary.get("count", 0)
+    for rating in added:
+        histogram[rating - 1] += 1
+        total += rating
+        count += 1
+    for rating in removed:
+        histogram[rating - 1] -= 1
+        total -= rating
+        count -= 1
+    return {"sum": total, "count": count, "histogram": histogram}
+
+
+def summary_dict(product_id: int, summary: Optional[dict]) -> dict:
+    """Map a stored rating summary to its response JSON shape; a missing summary has no reviews."""
+    summary = summary or {}
+    count = summary.get("count", 0)
+    histogram = summary.get("histogram", [0] * 5)
+    return {
+        "productId": product_id,
+        "reviewCount": count,
+        "averageRating": round(summary.get("sum", 0) / count, 2) if count else None,
+        "ratingHistogram": {str(rating): histogram[rating - 1] for rating in range(1, 6)}
+    }
@@ -0,0 +1,139 @@
+"""Tests for the reviews service's writes and the product index and rating summary they maintain."""
+import asyncio
+
+import pytest
+
+import main
+from models import ReviewItem, ReviewResponse
+from product_reviews import index_key, summary_key
+
+
+def _creates(*bodies):
+    return [("POST", "/reviews", body) for body in bodies]
+
+
+def test_concurrent_creates_of_one_id_insert_once(app_store, app_requests):
+    # Reviews of different products share no index record whose ETag could catch the race
+    first = {"reviewId": 7, "productId": 1, "customerId": 1, "rating": 5}
+    second = {"reviewId": 7, "productId": 2, "customerId": 1, "rating": 1}
+    responses = asyncio.run(app_requests(*_creates(first, second)))
+
+    assert sorted(response.status_code for response in responses) == [201, 409]
+    review = asyncio.run(app_store.get_item("7"))
+    indexes = asyncio.run(app_store.get_items([index_key(1), index_key(2)]))
+    summaries = asyncio.run(app_store.get_items([summary_key(1), summary_key(2)]))
+    # Only the product of the stored review lists it and counts its rating
+    assert [index.get("ids") for index in indexes.values()].count([7]) == 1
+    assert indexes[index_key(review["product_id"])]["ids"] == [7]
+    assert sum(summary.get("count", 0) for summary in summaries.values()) == 1
+
+
+def test_concurrent_creates_for_one_product_are_all_indexed(app_store, app_requests):
+    bodies = [{"reviewId": review_id, "productId": 1, "customerId": 1, "rating": 4} for review_id in range(1, 6)]
+    responses = asyncio.run(app_requests(*_creates(*bodies)))
+
+    assert [response.status_code for response in responses] == [201] * 5
+    assert asyncio.run(app_store.get_item(index_key(1)))["ids"] == [1, 2, 3, 4, 5]
+    assert asyncio.run(app_store.get_item(summary_key(1)))["count"] == 5
+
+
+def test_batch_create_skips_existing_ids(app_store, app_requests):
+    asyncio.run(app_requests(*_creates({"reviewId": 1, "productId": 1, "customerId": 1, "rating": 5})))
+
+    response, = asyncio.run(app_requests(("POST", "/reviews:batch", {"items": [
+        {"reviewId": 1, "productId": 1, "customerId": 2, "rating": 1},
+        {"productId": 1, "customerId": 3, "rating": 3},
+        {"productId": 2, "customerId": 3, "rating": 4},
+    ]})))
+
+    assert response.status_code == 201
+    assert response.json()["skipped"] == [1]
+    assert len(response.json()["created"]) == 2
+    assert asyncio.run(app_store.get_item("1"))["rating"] == 5
+    assert asyncio.run(app_store.get_item(summary_key(1)))["count"] == 2
+    assert len(asyncio.run(app_store.get_item(index_key(1)))["ids"]) == 2
+
+
+def test_batch_create_racing_a_single_create_inserts_once(app_store, app_requests, state_client, monkeypatch):
+    get_bulk_state = state_client.get_bulk_state
+    raced = []
+
+    async def create_after_read(store_name, keys, **kwargs):
+        response = await get_bulk_state(store_name, keys, **kwargs)
+        if "7" in keys and not raced:
+            # A single create inserts review 7 right after the batch read its ID as free
+            raced.append(True)
+            await main._insert_review(app_store, ReviewItem(reviewId=7, productId=2, customerId=1, rating=1))
+        return response
+
+    monkeypatch.setattr(state_client, "get_bulk_state", create_after_read)
+    response, = asyncio.run(app_requests(("POST", "/reviews:batch", {"items": [
+        {"reviewId": 7, "productId": 1, "customerId": 1, "rating": 5},
+        {"reviewId": 8, "productId": 1, "customerId": 1, "rating": 3},
+    ]})))
+
+    assert response.json()["created"] == [8]
+    assert response.json()["skipped"] == [7]
+    assert asyncio.run(app_store.get_item("7"))["product_id"] == 2
+    assert asyncio.run(app_store.get_item(index_key(1)))["ids"] == [8]
+    assert asyncio.run(app_store.get_item(index_key(2)))["ids"] == [7]
+    summaries = asyncio.run(app_store.get_items([summary_key(1), summary_key(2)]))
+    assert [summary["count"] for summary in summaries.values()] == [1, 1]
+
+
+def test_fast_path_matches_the_response_model():
+    review = ReviewItem(reviewId=1, productId=2, customerId=3, rating=4, reviewText="Good")
+    assert ReviewResponse.dict_from_db(review.to_db_dict()) == ReviewResponse.from_review_item(review).model_dump(mode="json")
+
+
+def test_summary_follows_concurrent_creates_updates_and_deletes(app_store, app_requests):
+    asyncio.run(app_requests(*_creates(*(
+        {"reviewId": review_id, "productId": 1, "customerId": 1, "rating": 3} for review_id in range(1, 5)
+    ))))
+    responses = asyncio.run(app_requests(
+        ("PUT", "/reviews/1", {"rating": 5}),
+        ("PUT", "/reviews/2", {"rating": 1}),
+        ("DELETE", "/reviews/3", None),
+        ("POST", "/reviews", {"reviewId": 5, "productId": 1, "customerId": 2, "rating": 4}),
+    ))
+
+    assert [response.status_code for response in responses] == [200, 200, 204, 201]
+    (summary,) = asyncio.run(app_requests(("GET", "/reviews/summary/1", None)))
+    assert summary.json() == {
+        "productId": 1,
+        "reviewCount": 4,
+        "averageRating": 3.25,
+        "ratingHistogram": {"1": 1, "2": 0, "3": 1, "4": 1, "5": 1},
+    }
+
+
+def test_concurrent_updates_of_one_review_count_its_rating_once(app_store, app_requests):
+    asyncio.run(app_requests(*_creates({"reviewId": 1, "productId": 1, "customerId": 1, "rating": 3})))
+    asyncio.run(app_requests(*(("PUT", "/reviews/1", {"rating": rating}) for rating in (1, 2, 4, 5))))
+
+    rating = asyncio.run(app_store.get_item("1"))["rating"]
+    summary = asyncio.run(app_store.get_item(summary_key(1)))
+    assert summary["count"] == 1
+    assert summary["sum"] == rating
+    assert summary["histogram"][rating - 1] == 1
+
+
+def test_summary_without_reviews_has_no_average(app_store, app_requests):
+    (response,) = asyncio.run(app_requests(("GET", "/reviews/summary/9", None)))
+
+    assert response.status_code == 200
+    assert response.json()["reviewCount"] == 0
+    assert response.json()["averageRating"] is None
+
+
+def test_reindex_rebuilds_summaries_from_the_reviews(app_store, app_requests):
+    asyncio.run(app_requests(*_creates(
+        {"reviewId": 1, "productId": 1, "customerId": 1, "rating": 2},
+        {"reviewId": 2, "productId": 1, "customerId": 1, "rating": 4},
+    )))
+    asyncio.run(app_store.save_items({summary_key(1): {}, index_key(1): {}}))
+    (response,) = asyncio.run(app_requests(("POST", "/reviews:reindex", None)))
+
+    assert response.json() == {"products": 1, "reviews": 2}
+    assert asyncio.run(app_store.get_item(summary_key(1))) == {"sum": 6, "count": 2, "histogram": [0, 1, 0, 1, 0]}
+    assert asyncio.run(app_store.get_item(index_key(1)))["ids"] == [1, 2]
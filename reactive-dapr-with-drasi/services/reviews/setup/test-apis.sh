@@ -83,7 +83,25 @@ if check_status "200" "$http_code" "Get review" "$body"; then
 fi
 
 echo ""
-echo "4. Updating Review"
+echo "4. Listing Reviews for Product"
+echo "------------------------------"
+response=$(make_request_with_retry "GET" "$BASE_URL/products/1001/reviews" "")
+http_code=$(echo "$response" | tail -1)
+body=$(echo "$response" | sed '$d')
+
+if check_status "200" "$http_code" "List product reviews" "$body"; then
+    # The new review must be found through the product's index
+    if echo "$body" | grep -q "\"reviewId\":$REVIEW_ID"; then
+        print_test_result "Verify review in product index" "true"
+        ((TESTS_PASSED++))
+    else
+        print_test_result "Verify review in product index" "false" "Review $REVIEW_ID not listed for product 1001"
+        ((TESTS_FAILED++))
+    fi
+fi
+
+echo ""
+echo "5. Updating Review"
 echo "------------------"
 UPDATE_REVIEW='{
     "rating": 4,
@@ -115,7 +133,7 @@ if check_status "200" "$http_code" "Update review" "$body"; then
 fi
 
 echo ""
-echo "5. Testing Empty Review Text"
+echo "6. Testing Empty Review Text"
 echo "----------------------------"
 EMPTY_TEXT_REVIEW='{
     "rating": 3,
@@ -139,7 +157,7 @@ if check_status "200" "$http_code" "Update with empty text" "$body"; then
 fi
 
 echo ""
-echo "6. Testing Invalid Rating"
+echo "7. Testing Invalid Rating"
 echo "-------------------------"
 INVALID_RATING='{"rating": 6}'
 
@@ -155,16 +173,16 @@ body=$(echo "$response" | sed '$d')
 check_status "422" "$http_code" "Invalid rating (<1)" "$body"
 
 echo ""
-echo "7. Testing 404 for Non-existent Review"
-echo "---------------------------------------"
+echo "8. Testing 404 for Non-existent Review"
+echo "--------------------------------------"
 response=$(make_request_with_retry "GET" "$BASE_URL/reviews/999999999" "")
 http_code=$(echo "$response" | tail -1)
 body=$(echo "$response" | sed '$d')
 check_status "404" "$http_code" "Get non-existent review" "$body"
 
 echo ""
-echo "8. Creating Review Without Text"
-echo "--------------------------------"
+echo "9. Creating Review Without Text"
+echo "-------------------------------"
 NO_TEXT_REVIEW='{
     "productId": 1002,
     "customerId": 998,
@@ -188,8 +206,8 @@ if check_status "201" "$http_code" "Create review without text" "$body"; then
 fi
 
 echo ""
-echo "9. Deleting Test Reviews"
-echo "------------------------"
+echo "10. Deleting Test Reviews"
+echo "-------------------------"
 response=$(make_request_with_retry "DELETE" "$BASE_URL/reviews/$REVIEW_ID" "")
 http_code=$(echo "$response" | tail -1)
 body=$(echo "$response" | sed '$d')
@@ -203,7 +221,7 @@ if [ ! -z "$NO_TEXT_REVIEW_ID" ]; then
 fi
 
 echo ""
-echo "10. Verifying Deletion"
+echo "11. Verifying Deletion"
 echo "----------------------"
 response=$(make_request_with_retry "GET" "$BASE_URL/reviews/$REVIEW_ID" "")
 http_code=$(echo "$response" | tail -1)